@@ -5,7 +5,8 @@ Analyze professor feedback from Sprint 4 retrospectives
 import os
 from pathlib import Path
 import re
-from app.parser import extract_text
+from app.cache import ExtractionCache
+from app.parser import iter_extracted_texts
 from collections import defaultdict
 
 
@@ -164,20 +165,23 @@ def main():
         "/home/iambillmccann/repositories/retro-grading-agent/data/sprint-4-103",
     ]
 
+    cache = ExtractionCache()
     all_feedback = []
 
     for sprint_dir in sprint_dirs:
         if not os.path.exists(sprint_dir):
             continue
 
-        for file_path in Path(sprint_dir).iterdir():
-            if file_path.is_file():
-                try:
-                    text = extract_text(str(file_path))
-                    feedback_points = analyze_feedback_sections(text)
-                    all_feedback.extend(feedback_points)
-                except Exception as e:
-                    print(f"Error processing {file_path.name}: {e}")
+        files = sorted(path for path in Path(sprint_dir).iterdir() if path.is_file())
+        # Sorted so each category lists its feedback in the same order every run.
+        extracted = sorted(
+            iter_extracted_texts(files, cache=cache), key=lambda item: item[0]
+        )
+        for file_path, text in extracted:
+            if isinstance(text, Exception):
+                print(f"Error processing {file_path.name}: {text}")
+                continue
+            all_feedback.extend(analyze_feedback_sections(text))
 
     print(f"Extracted {len(all_feedback)} feedback points")
 
@@ -0,0 +1,169 @@
+"""
+backends.py
+
+Where grading requests go. `grade_with_prompt` builds a chat completion body
+and hands it to the active backend:
+
+    OpenAIBackend   the OpenAI API, or any OpenAI-compatible server given its
+                    base URL (a proxy, a self-hosted model, app.mock_server)
+    FakeBackend     in-process and deterministic: no network and no API key,
+                    for tests, CI and load-testing the rest of the pipeline
+
+The backend is chosen with `--backend`/`--base-url` on the CLI, or the
+GRADER_BACKEND environment variable (OPENAI_BASE_URL is still honoured by the
+SDK itself for the default backend).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Callable
+
+BACKEND_NAMES = ("openai", "fake")
+
+
+class ChatResult:
+    """The assistant text of one completion, with its token usage and headers."""
+
+    def __init__(self, content: str, usage: dict | None = None, headers=None):
+        self.content = content
+        self.usage = usage
+        # Feeds the adaptive limiter (see app.ratelimit.call_with_retry_async).
+        self.headers = headers
+
+
+def _usage_dict(response) -> dict | None:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+
+class OpenAIBackend:
+    """Chat completions through the OpenAI SDK.
+
+    Without a `base_url` the shared clients from `app.grader` are used;
+    with one, the backend makes its own clients for that server. Errors are
+    the SDK's, so app.ratelimit retries them as usual.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url: str | None = None, api_key: str | None = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self._client = None
+        self._async_client = None
+
+    def _client_kwargs(self) -> dict:
+        return {
+            "api_key": self.api_key or os.getenv("OPENAI_API_KEY") or "unused",
+            "base_url": self.base_url,
+            "max_retries": 0,
+        }
+
+    def client(self):
+        from app import grader
+
+        if self.base_url is None and self.api_key is None:
+            return grader.get_client()
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(**self._client_kwargs())
+        return self._client
+
+    def async_client(self):
+        from app import grader
+
+        if self.base_url is None and self.api_key is None:
+            return grader.get_async_client()
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(**self._client_kwargs())
+        return self._async_client
+
+    def cache_namespace(self, model: str) -> str:
+        """Model label for cache keys; another server's answers are kept apart."""
+        return model if self.base_url is None else f"{model}@{self.base_url}"
+
+    def complete(self, body: dict) -> ChatResult:
+        response = self.client().chat.completions.create(**body)
+        return ChatResult(response.choices[0].message.content, _usage_dict(response))
+
+    async def acomplete(self, body: dict) -> ChatResult:
+        raw = await self.async_client().chat.completions.with_raw_response.create(
+            **body
+        )
+        response = raw.parse()
+        return ChatResult(
+            response.choices[0].message.content, _usage_dict(response), raw.headers
+        )
+
+
+class FakeBackend:
+    """Deterministic in-process stand-in for the model.
+
+    Each request is answered by `responder(body)` (the mock server's fixed
+    grade by default) after `latency` seconds, with usage estimated the same
+    way the mock server does. Nothing is ever retried or rate limited.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self, responder: Callable[[dict], str] | None = None, latency: float = 0.0
+    ):
+        from app.mock_server import default_responder
+
+        self.responder = responder or default_responder
+        self.latency = latency
+        self.calls = 0
+
+    def client(self):
+        raise ValueError(
+            "The fake backend cannot run Batch API jobs; point --base-url at "
+            "`python -m app.mock_server` instead."
+        )
+
+    def cache_namespace(self, model: str) -> str:
+        return f"fake:{model}"
+
+    def _answer(self, body: dict) -> ChatResult:
+        from app.mock_server import chat_completion
+
+        self.calls += 1
+        content = self.responder(body)
+        usage = chat_completion(body, content, f"fake-{self.calls}")["usage"]
+        return ChatResult(content, usage, {})
+
+    def complete(self, body: dict) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(body)
+
+    async def acomplete(self, body: dict) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(body)
+
+
+def make_backend(name: str | None = None, base_url: str | None = None):
+    """Build a backend by name (default: GRADER_BACKEND, else "openai")."""
+    name = name or os.getenv("GRADER_BACKEND") or "openai"
+    if name == "openai":
+        return OpenAIBackend(base_url=base_url)
+    if name == "fake":
+        if base_url:
+            raise ValueError("--base-url only applies to the openai backend.")
+        return FakeBackend()
+    raise ValueError(
+        f"Unknown grader backend {name!r}; expected one of: {', '.join(BACKEND_NAMES)}"
+    )
@@ -0,0 +1,115 @@
+"""
+batch.py
+
+Offline grading through the OpenAI Batch API: submissions are rendered into a
+JSONL request file, submitted as one batch, polled, and the output file is
+mapped back to filenames via each request's `custom_id`.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from app import grader
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_requests(texts: dict[str, str], prompt_path: str) -> list[dict]:
+    """Render one batch request line per submission, keyed by filename."""
+    prompt = grader.load_prompt(prompt_path)
+    return [
+        {
+            "custom_id": filename,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": grader.build_chat_request(text, prompt),
+        }
+        for filename, text in texts.items()
+    ]
+
+
+def write_batch_file(requests: list[dict], output_file: str) -> Path:
+    path = Path(output_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request) + "\n")
+    return path
+
+
+def submit_batch(batch_file: str, client: OpenAI | None = None) -> str:
+    """Upload a JSONL request file and start a batch; returns the batch id."""
+    client = client or grader.get_backend().client()
+    with open(batch_file, "rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    return batch.id
+
+
+def wait_for_batch(
+    batch_id: str,
+    client: OpenAI | None = None,
+    poll_interval: float = 30,
+    timeout: float | None = None,
+):
+    """Poll a batch until it reaches a terminal status and return it."""
+    client = client or grader.get_backend().client()
+    started = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        if timeout is not None and time.monotonic() - started > timeout:
+            raise TimeoutError(
+                f"Batch {batch_id} still '{batch.status}' after {timeout:.0f}s"
+            )
+        time.sleep(poll_interval)
+
+
+def collect_batch_results(
+    batch, prompt_source: str, client: OpenAI | None = None
+) -> dict[str, dict | str]:
+    """Map each `custom_id` to its parsed grading result, or to an error message.
+
+    Results are validated against `prompt_source` like online replies; a
+    reply missing rubric keys becomes an error message, since a batch cannot
+    re-ask.
+    """
+    client = client or grader.get_backend().client()
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} finished with status '{batch.status}'")
+
+    results: dict[str, dict | str] = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record["custom_id"]
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                error = record.get("error") or response.get("body", {}).get("error")
+                results[custom_id] = f"Batch request failed: {error}"
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            try:
+                results[custom_id] = grader.parse_grading_response(
+                    content, prompt_source
+                )
+            except ValueError as e:
+                results[custom_id] = str(e)
+    return results
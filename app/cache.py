@@ -0,0 +1,307 @@
+"""
+cache.py
+
+Persistent on-disk caches shared by the grading entry points.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import zstandard
+
+DEFAULT_CACHE_DIR = Path("results") / ".cache"
+
+
+class GradingCache:
+    """Content-addressed SQLite cache of parsed model grading results.
+
+    Entries are keyed on a hash of the extracted submission text, the prompt
+    template contents, the model name and the temperature, so any change to
+    one of those is a miss. Entries older than `max_age_days` are ignored and
+    pruned, and the least recently used entries are evicted once the stored
+    results exceed `max_bytes`.
+
+    With `refresh=True` lookups always miss but new results are still stored,
+    which re-grades everything and overwrites stale entries.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_CACHE_DIR / "grading.sqlite",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_days: float = 90,
+        refresh: bool = False,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.refresh = refresh
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS grading_results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(text: str, prompt_template: str, model: str, temperature: float) -> str:
+        digest = hashlib.sha256()
+        for part in (text, prompt_template, model, repr(temperature)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        if self.refresh:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM grading_results WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            result, created_at = row
+            if now - created_at > self.max_age_seconds:
+                self._conn.execute("DELETE FROM grading_results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE grading_results SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self._conn.commit()
+        return json.loads(result)
+
+    def put(self, key: str, result: dict) -> None:
+        payload = json.dumps(result)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO grading_results
+                    (key, result, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, payload, len(payload), now, now),
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then least recently used ones over `max_bytes`."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM grading_results WHERE created_at < ?",
+                (time.time() - self.max_age_seconds,),
+            )
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM grading_results"
+            ).fetchone()
+            if total > self.max_bytes:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM grading_results ORDER BY accessed_at"
+                ).fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._conn.executemany(
+                    "DELETE FROM grading_results WHERE key = ?", stale
+                )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ExtractionCache:
+    """SQLite store of zstd-compressed text extracted from submission files.
+
+    A file is first matched on (path, size, mtime); if that changed, its
+    contents are hashed and looked up by content hash, so an edited file is
+    re-extracted while a renamed or copied one is still a hit. `variant`
+    separates text produced by different extractor versions or settings, and
+    other per-file results derived from the contents (such as feedback
+    analyses) are stored under their own variants. The
+    least recently used texts are evicted once the compressed store exceeds
+    `max_bytes`, together with index entries for files that no longer exist
+    or whose texts are all gone.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_CACHE_DIR / "extraction.sqlite",
+        max_bytes: int = 256 * 1024 * 1024,
+        compression_level: int = 10,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._hashes: dict[str, str] = {}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS file_index (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS extracted_text (
+                content_hash TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                text BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (content_hash, variant)
+            );
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def hash_file(file_path: str | Path) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def content_hash(self, file_path: str | Path) -> str:
+        """Return the content hash of a file, reusing the indexed one if unchanged."""
+        resolved = str(Path(file_path).resolve())
+        stat = Path(resolved).stat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, content_hash FROM file_index WHERE path = ?",
+                (resolved,),
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        content_hash = self.hash_file(resolved)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO file_index (path, size, mtime_ns, content_hash)
+                VALUES (?, ?, ?, ?)
+                """,
+                (resolved, stat.st_size, stat.st_mtime_ns, content_hash),
+            )
+            self._conn.commit()
+        return content_hash
+
+    def lookup(self, file_path: str | Path, variant: str = "") -> str | None:
+        content_hash = self.content_hash(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT text FROM extracted_text
+                WHERE content_hash = ? AND variant = ?
+                """,
+                (content_hash, variant),
+            ).fetchone()
+            if row is None:
+                # A miss is normally followed by store(); spare it the rehash.
+                self._hashes[str(file_path)] = content_hash
+                return None
+            self._conn.execute(
+                """
+                UPDATE extracted_text SET accessed_at = ?
+                WHERE content_hash = ? AND variant = ?
+                """,
+                (time.time(), content_hash, variant),
+            )
+            self._conn.commit()
+        return zstandard.ZstdDecompressor().decompress(row[0]).decode("utf-8")
+
+    def store(self, file_path: str | Path, text: str, variant: str = "") -> None:
+        content_hash = self._hashes.pop(str(file_path), None) or self.content_hash(
+            file_path
+        )
+        blob = zstandard.ZstdCompressor(level=self.compression_level).compress(
+            text.encode("utf-8")
+        )
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO extracted_text
+                    (content_hash, variant, text, size, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (content_hash, variant, blob, len(blob), time.time()),
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used texts until the store fits in `max_bytes`.
+
+        The file index is pruned at the same time: paths that were renamed or
+        deleted, and paths whose content no longer has any stored text.
+        """
+        with self._lock:
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM extracted_text"
+            ).fetchone()
+            if total <= self.max_bytes:
+                return
+            rows = self._conn.execute(
+                """
+                SELECT content_hash, variant, size FROM extracted_text
+                ORDER BY accessed_at
+                """
+            ).fetchall()
+            stale = []
+            for content_hash, variant, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((content_hash, variant))
+                total -= size
+            self._conn.executemany(
+                "DELETE FROM extracted_text WHERE content_hash = ? AND variant = ?",
+                stale,
+            )
+            self._conn.execute(
+                """
+                DELETE FROM file_index WHERE content_hash NOT IN
+                    (SELECT content_hash FROM extracted_text)
+                """
+            )
+            missing = [
+                (path,)
+                for (path,) in self._conn.execute("SELECT path FROM file_index")
+                if not Path(path).exists()
+            ]
+            self._conn.executemany("DELETE FROM file_index WHERE path = ?", missing)
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,186 @@
+"""
+estimate.py
+
+Pre-flight token, cost and wall-clock estimates for a grading run. Nothing in
+this module calls the model API.
+"""
+
+from __future__ import annotations
+
+import math
+import statistics
+from functools import lru_cache
+from pathlib import Path
+
+from app.cache import ExtractionCache, GradingCache
+from app.grader import build_chat_request, grading_cache_key, load_prompt
+from app.parser import iter_extracted_texts
+from app.sections import condense
+
+# USD per 1M tokens, output tokens/second and context window. Prices change;
+# update this table when the billing page does.
+MODEL_PROFILES = {
+    "gpt-4-turbo": {"input": 10.00, "output": 30.00, "tps": 35, "context": 128_000},
+    "gpt-4o": {"input": 2.50, "output": 10.00, "tps": 80, "context": 128_000},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60, "tps": 100, "context": 128_000},
+    "gpt-4.1": {"input": 2.00, "output": 8.00, "tps": 80, "context": 1_047_576},
+    "gpt-4.1-mini": {"input": 0.40, "output": 1.60, "tps": 100, "context": 1_047_576},
+    "gpt-3.5-turbo": {"input": 0.50, "output": 1.50, "tps": 100, "context": 16_385},
+}
+
+# Typical size of a grading JSON reply and fixed per-request overhead.
+DEFAULT_OUTPUT_TOKENS = 350
+REQUEST_OVERHEAD_SECONDS = 1.0
+PREFILL_TOKENS_PER_SECOND = 5_000
+
+# Chat formatting overhead per message and for priming the reply.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+OUTLIER_MEDIAN_FACTOR = 3
+MIN_TEXT_CHARS = 200
+
+
+@lru_cache(maxsize=None)
+def _encoding_for(model: str):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception:
+        # Encoding files could not be loaded (e.g. offline); fall back below.
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str) -> tuple[int, bool]:
+    """Return (token count, exact) for `text`.
+
+    When tiktoken has no encoding available the count is approximated at four
+    characters per token and `exact` is False.
+    """
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return math.ceil(len(text) / 4), False
+    return len(encoding.encode(text, disallowed_special=())), True
+
+
+def count_message_tokens(messages: list[dict], model: str) -> tuple[int, bool]:
+    total = TOKENS_PER_REPLY
+    exact = True
+    for message in messages:
+        tokens, message_exact = count_tokens(message["content"], model)
+        total += tokens + TOKENS_PER_MESSAGE
+        exact = exact and message_exact
+    return total, exact
+
+
+def estimate_request_seconds(prompt_tokens: int, output_tokens: int, model: str) -> float:
+    tps = MODEL_PROFILES.get(model, {}).get("tps", 50)
+    return (
+        REQUEST_OVERHEAD_SECONDS
+        + prompt_tokens / PREFILL_TOKENS_PER_SECOND
+        + output_tokens / tps
+    )
+
+
+def estimate_run(
+    files: list[Path],
+    prompt_path: str,
+    model: str,
+    concurrency: int = 1,
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+    cache: GradingCache | None = None,
+    extraction_cache: ExtractionCache | None = None,
+    workers: int | None = None,
+    sections: bool = False,
+) -> dict:
+    """Extract and render every file and estimate what grading it would cost.
+
+    With `sections`, each text is first condensed as `--sections` would send
+    it (see app.sections). Files whose result is already in `cache` are
+    counted as free. Outliers are
+    files whose prompt is more than three times the median or beyond 75% of the
+    model's context window; files with almost no text are flagged as well.
+    """
+    prompt = load_prompt(prompt_path)
+    profile = MODEL_PROFILES.get(model)
+    rows = []
+    parse_errors = []
+    exact = True
+
+    texts = dict(
+        iter_extracted_texts(files, workers=workers, cache=extraction_cache)
+    )
+    for file in files:
+        text = texts[Path(file)]
+        if isinstance(text, Exception):
+            parse_errors.append({"filename": file.name, "error": str(text)})
+            continue
+        if sections:
+            text = condense(text, prompt.source)[0]
+
+        messages = build_chat_request(text, prompt)["messages"]
+        prompt_tokens, counted_exactly = count_message_tokens(messages, model)
+        exact = exact and counted_exactly
+        cached = (
+            cache is not None
+            and cache.get(grading_cache_key(text, prompt.source)) is not None
+        )
+        rows.append(
+            {
+                "filename": file.name,
+                "text_chars": len(text),
+                "prompt_tokens": prompt_tokens,
+                "cached": cached,
+                "flags": [],
+            }
+        )
+
+    billable = [row for row in rows if not row["cached"]]
+    median_tokens = statistics.median(r["prompt_tokens"] for r in rows) if rows else 0
+    context_limit = profile["context"] * 0.75 if profile else None
+    for row in rows:
+        if median_tokens and row["prompt_tokens"] > OUTLIER_MEDIAN_FACTOR * median_tokens:
+            row["flags"].append(
+                f"{row['prompt_tokens'] / median_tokens:.1f}x median prompt size"
+            )
+        if context_limit and row["prompt_tokens"] > context_limit:
+            row["flags"].append("near the model context window")
+        if row["text_chars"] < MIN_TEXT_CHARS:
+            row["flags"].append("little or no extractable text")
+
+    input_tokens = sum(row["prompt_tokens"] for row in billable)
+    total_output_tokens = output_tokens * len(billable)
+    cost = None
+    if profile:
+        cost = (
+            input_tokens * profile["input"] + total_output_tokens * profile["output"]
+        ) / 1_000_000
+    request_seconds = sum(
+        estimate_request_seconds(row["prompt_tokens"], output_tokens, model)
+        for row in billable
+    )
+
+    return {
+        "model": model,
+        "concurrency": concurrency,
+        "total_files": len(files),
+        "files": rows,
+        "parse_errors": parse_errors,
+        "cached_files": len(rows) - len(billable),
+        "requests": len(billable),
+        "input_tokens": input_tokens,
+        "output_tokens": total_output_tokens,
+        "exact_token_counts": exact,
+        "median_prompt_tokens": median_tokens,
+        "max_prompt_tokens": max((r["prompt_tokens"] for r in rows), default=0),
+        "estimated_cost_usd": cost,
+        "estimated_seconds": request_seconds / max(1, min(concurrency, len(billable))),
+        "outliers": [row for row in rows if row["flags"]],
+    }
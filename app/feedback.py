@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 from collections import defaultdict
+import hashlib
+import json
 from pathlib import Path
 import re
 
-from app.parser import extract_text
+from app.cache import ExtractionCache
+from app.parser import EXTRACTION_VARIANT, collect_input_files, iter_extracted_texts
 
 LIKE_PATTERNS = [
     r"\bi liked\b",
@@ -89,6 +92,137 @@ THEME_KEYWORDS = {
     "Technical debt concerns": ["technical debt", "messy", "refactor", "vibe coding"],
 }
 
+MIN_FEEDBACK_LINE_CHARS = 18
+
+# Lines are lowercased before matching, so the patterns run without
+# re.IGNORECASE (which makes every alternative several times slower). These
+# are the lowercase characters IGNORECASE would still have equated with i/s.
+_CASE_FOLD_FIXES = str.maketrans({"\u0131": "i", "\u017f": "s"})
+
+
+def _build_line_scanner() -> re.Pattern:
+    """Compile the exclude, like and improve patterns into one regex.
+
+    The leading lookahead stops only where some pattern starts; each optional
+    lookahead after it records, as a named group, whether its category matches
+    at that position. Iterating over the matches therefore finds every
+    category in a single scan of the line.
+    """
+    categories = {
+        "exclude": EXCLUDE_LINE.pattern,
+        "like": "|".join(LIKE_PATTERNS),
+        "improve": "|".join(IMPROVE_PATTERNS),
+    }
+    any_start = "|".join(categories.values())
+    captures = "".join(
+        f"(?:(?=(?P<{group}>{pattern})))?" for group, pattern in categories.items()
+    )
+    return re.compile(f"(?=(?:{any_start})){captures}")
+
+
+LINE_SCANNER = _build_line_scanner()
+
+# (keyword, theme) pairs. Plain substring tests are faster here than a regex
+# alternation, which `re` tries one keyword at a time at every position.
+THEME_KEYWORD_INDEX = [
+    (keyword, theme)
+    for theme, keywords in THEME_KEYWORDS.items()
+    for keyword in keywords
+]
+
+
+def classify_feedback_line(line_lower: str) -> tuple[bool, bool] | None:
+    """Return (liked, wants improvement) for a lowercased line.
+
+    Returns None for lines about ratings or teammates, which are not course
+    feedback.
+    """
+    if not line_lower.isascii():
+        line_lower = line_lower.translate(_CASE_FOLD_FIXES)
+    liked = improve = False
+    for match in LINE_SCANNER.finditer(line_lower):
+        if match["exclude"] is not None:
+            return None
+        liked = liked or match["like"] is not None
+        improve = improve or match["improve"] is not None
+    return liked, improve
+
+
+def feedback_line_themes(line_lower: str) -> list[str]:
+    """Themes whose keywords appear in a lowercased line, in THEME_KEYWORDS order."""
+    found = {theme for keyword, theme in THEME_KEYWORD_INDEX if keyword in line_lower}
+    return [theme for theme in THEME_KEYWORDS if theme in found]
+
+
+def _analysis_variant() -> str:
+    # Per-file analyses are cached next to extracted text under this variant;
+    # editing any pattern, keyword or the extractor invalidates them.
+    rules = [
+        LIKE_PATTERNS,
+        IMPROVE_PATTERNS,
+        EXCLUDE_LINE.pattern,
+        THEME_KEYWORDS,
+        MIN_FEEDBACK_LINE_CHARS,
+        EXTRACTION_VARIANT,
+    ]
+    digest = hashlib.sha256(json.dumps(rules).encode("utf-8")).hexdigest()
+    return f"feedback-{digest[:16]}"
+
+
+ANALYSIS_VARIANT = _analysis_variant()
+
+
+def analyze_feedback_text(text: str) -> dict:
+    """Partial analysis of one document: its like/improve lines and their themes."""
+    likes = []
+    improvements = []
+    for line in text.replace("\u200b", "").splitlines():
+        line = line.strip()
+        if len(line) < MIN_FEEDBACK_LINE_CHARS:
+            continue
+        line_lower = line.lower()
+        classified = classify_feedback_line(line_lower)
+        if classified is None or not any(classified):
+            continue
+        liked, improve = classified
+        entry = {"text": line, "themes": feedback_line_themes(line_lower)}
+        if liked:
+            likes.append(entry)
+        if improve:
+            improvements.append(entry)
+    return {"likes": likes, "improvements": improvements}
+
+
+def _iter_file_analyses(
+    files: list[Path], cache: ExtractionCache | None, workers: int | None
+):
+    """Yield (path, partial analysis or exception), reusing cached analyses.
+
+    Files whose contents were analysed before (under the same rules) are
+    answered from `cache`; the rest are extracted in parallel and analysed as
+    each one arrives, and their partials are stored for next time.
+    """
+    pending = []
+    for file_path in files:
+        cached = (
+            cache.lookup(file_path, variant=ANALYSIS_VARIANT)
+            if cache is not None
+            else None
+        )
+        if cached is None:
+            pending.append(file_path)
+        else:
+            yield file_path, json.loads(cached)
+
+    for file_path, text in iter_extracted_texts(pending, workers=workers, cache=cache):
+        if isinstance(text, Exception):
+            yield file_path, text
+            continue
+        partial = analyze_feedback_text(text)
+        if cache is not None:
+            cache.store(file_path, json.dumps(partial), variant=ANALYSIS_VARIANT)
+        yield file_path, partial
+
 
 def _dedup_feedback_lines(items: list[dict]) -> list[dict]:
     seen = set()
@@ -101,63 +235,48 @@ def _dedup_feedback_lines(items: list[dict]) -> list[dict]:
     return deduped
 
 
-def _collect_input_files(path: Path) -> list[Path]:
-    if path.is_file() and path.suffix.lower() in {".docx", ".pdf", ".txt"}:
-        return [path]
-    if path.is_dir():
-        return sorted(
-            list(path.glob("*.docx"))
-            + list(path.glob("*.pdf"))
-            + list(path.glob("*.txt"))
-        )
-    return []
-
-
-def analyze_professor_feedback(path: str) -> dict:
-    like_re = re.compile("|".join(LIKE_PATTERNS), re.IGNORECASE)
-    improve_re = re.compile("|".join(IMPROVE_PATTERNS), re.IGNORECASE)
+def analyze_professor_feedback(
+    path: str, cache: ExtractionCache | None = None, workers: int | None = None
+) -> dict:
+    """Summarise student feedback about the course across a folder.
 
+    Each file is reduced to a small partial analysis (see
+    `analyze_feedback_text`), computed in parallel and cached by content hash
+    when `cache` is given, so rerunning after a few submissions are added only
+    analyses the new files. Partials are merged in filename order.
+    """
     input_path = Path(path)
-    files = _collect_input_files(input_path)
+    files = collect_input_files(input_path)
     likes = []
     improvements = []
     processed = 0
     parse_errors = []
     files_with_feedback = set()
+    line_themes: dict[str, list[str]] = {}
+
+    partials = dict(_iter_file_analyses(files, cache, workers))
 
     for file_path in files:
         processed += 1
-        try:
-            text = extract_text(str(file_path))
-        except Exception as exc:
-            parse_errors.append({"filename": file_path.name, "error": str(exc)})
+        partial = partials.pop(file_path)
+        if isinstance(partial, Exception):
+            parse_errors.append({"filename": file_path.name, "error": str(partial)})
             continue
 
-        normalized = re.sub(r"\u200b", "", text)
-        lines = [line.strip() for line in normalized.splitlines() if line.strip()]
-
-        for line in lines:
-            if len(line) < 18:
-                continue
-            line_lower = line.lower()
-            if EXCLUDE_LINE.search(line_lower):
-                continue
-            if like_re.search(line_lower):
-                likes.append({"filename": file_path.name, "text": line})
-                files_with_feedback.add(file_path.name)
-            if improve_re.search(line_lower):
-                improvements.append({"filename": file_path.name, "text": line})
-                files_with_feedback.add(file_path.name)
+        for key, items in (("likes", likes), ("improvements", improvements)):
+            for entry in partial[key]:
+                items.append({"filename": file_path.name, "text": entry["text"]})
+                line_themes[entry["text"]] = entry["themes"]
+        if partial["likes"] or partial["improvements"]:
+            files_with_feedback.add(file_path.name)
 
     likes = _dedup_feedback_lines(likes)
     improvements = _dedup_feedback_lines(improvements)
 
     theme_files = defaultdict(set)
     for item in likes + improvements:
-        line_lower = item["text"].lower()
-        for theme, keywords in THEME_KEYWORDS.items():
-            if any(keyword in line_lower for keyword in keywords):
-                theme_files[theme].add(item["filename"])
+        for theme in line_themes[item["text"]]:
+            theme_files[theme].add(item["filename"])
 
     theme_counts = [
         {"theme": theme, "file_count": len(files_by_theme)}
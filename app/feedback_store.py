@@ -0,0 +1,258 @@
+"""
+feedback_store.py
+
+Cross-term SQLite index of feedback-summary results. Every `--feedback-summary`
+run ingests its like/improve lines, their themes and the term label, and the
+query mode answers full-text and theme questions across semesters from the
+index (FTS5) instead of re-parsing archived cohort folders.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from pathlib import Path
+
+from app.feedback import feedback_line_themes
+
+DEFAULT_STORE_PATH = Path("results") / "feedback.sqlite"
+
+SENTIMENTS = {"likes": "like", "improvements": "improve"}
+
+
+class FeedbackStore:
+    """Indexed store of feedback lines, one set of rows per term label.
+
+    Ingesting a term replaces whatever was stored for that term before, so
+    rerunning a summary keeps the index current without touching other terms.
+    Lines are indexed with SQLite FTS5 (porter stemming, so "deadline" also
+    finds "deadlines"); themes are stored per line.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY,
+                input_path TEXT NOT NULL,
+                total_files INTEGER NOT NULL,
+                files_with_feedback INTEGER NOT NULL,
+                ingested_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS feedback_lines (
+                id INTEGER PRIMARY KEY,
+                term TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS feedback_lines_term
+                ON feedback_lines (term, sentiment);
+            CREATE TABLE IF NOT EXISTS line_themes (
+                line_id INTEGER NOT NULL,
+                theme TEXT NOT NULL,
+                PRIMARY KEY (line_id, theme)
+            );
+            CREATE INDEX IF NOT EXISTS line_themes_theme ON line_themes (theme);
+            CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts
+                USING fts5(text, tokenize = 'porter unicode61');
+            """
+        )
+        self._conn.commit()
+
+    def ingest(self, analysis: dict, term: str) -> int:
+        """Store an `analyze_professor_feedback` result; returns the line count."""
+        with self._conn:
+            self._delete_term(term)
+            self._conn.execute(
+                """
+                INSERT INTO terms
+                    (term, input_path, total_files, files_with_feedback, ingested_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    term,
+                    analysis["input_path"],
+                    analysis["total_files"],
+                    analysis["files_with_feedback_signal"],
+                    time.time(),
+                ),
+            )
+            count = 0
+            for key, sentiment in SENTIMENTS.items():
+                for item in analysis[key]:
+                    cursor = self._conn.execute(
+                        """
+                        INSERT INTO feedback_lines (term, filename, sentiment, text)
+                        VALUES (?, ?, ?, ?)
+                        """,
+                        (term, item["filename"], sentiment, item["text"]),
+                    )
+                    line_id = cursor.lastrowid
+                    self._conn.execute(
+                        "INSERT INTO feedback_fts (rowid, text) VALUES (?, ?)",
+                        (line_id, item["text"]),
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO line_themes (line_id, theme) VALUES (?, ?)",
+                        [
+                            (line_id, theme)
+                            for theme in feedback_line_themes(item["text"].lower())
+                        ],
+                    )
+                    count += 1
+        return count
+
+    def _delete_term(self, term: str) -> None:
+        stale = "SELECT id FROM feedback_lines WHERE term = ?"
+        self._conn.execute(
+            f"DELETE FROM feedback_fts WHERE rowid IN ({stale})", (term,)
+        )
+        self._conn.execute(
+            f"DELETE FROM line_themes WHERE line_id IN ({stale})", (term,)
+        )
+        self._conn.execute("DELETE FROM feedback_lines WHERE term = ?", (term,))
+        self._conn.execute("DELETE FROM terms WHERE term = ?", (term,))
+
+    def terms(self) -> list[dict]:
+        rows = self._conn.execute(
+            """
+            SELECT term, input_path, total_files, files_with_feedback, ingested_at
+            FROM terms ORDER BY term
+            """
+        ).fetchall()
+        keys = (
+            "term",
+            "input_path",
+            "total_files",
+            "files_with_feedback",
+            "ingested_at",
+        )
+        return [dict(zip(keys, row)) for row in rows]
+
+    @staticmethod
+    def _filters(
+        query: str | None,
+        theme: str | None,
+        sentiment: str | None,
+        term: str | None,
+    ) -> tuple[list[str], list]:
+        clauses = []
+        params = []
+        if query:
+            clauses.append(
+                "l.id IN (SELECT rowid FROM feedback_fts WHERE feedback_fts MATCH ?)"
+            )
+            params.append(query)
+        if theme:
+            clauses.append(
+                "l.id IN (SELECT line_id FROM line_themes WHERE theme LIKE ?)"
+            )
+            params.append(f"%{theme}%")
+        if sentiment:
+            clauses.append("l.sentiment = ?")
+            params.append(sentiment)
+        if term:
+            clauses.append("l.term LIKE ?")
+            params.append(f"%{term}%")
+        return clauses, params
+
+    def _select(self, sql: str, params: list) -> list[tuple]:
+        try:
+            return self._conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            # Malformed FTS5 query syntax surfaces here.
+            raise ValueError(f"Invalid feedback query: {e}") from e
+
+    def search(
+        self,
+        query: str | None = None,
+        theme: str | None = None,
+        sentiment: str | None = None,
+        term: str | None = None,
+        limit: int = 20,
+    ) -> list[dict]:
+        """Matching lines, best full-text matches first (newest terms first otherwise).
+
+        `query` uses FTS5 syntax (`deadline OR rushed`, `"too many"`); `theme`
+        and `term` match case-insensitive substrings of the theme name and
+        term label; `sentiment` is "like" or "improve".
+        """
+        clauses, params = self._filters(None, theme, sentiment, term)
+        if query:
+            source = "feedback_fts f JOIN feedback_lines l ON l.id = f.rowid"
+            clauses.insert(0, "feedback_fts MATCH ?")
+            params.insert(0, query)
+            order = "f.rank"
+        else:
+            source = "feedback_lines l"
+            order = "l.term DESC"
+        where = " AND ".join(clauses) or "1"
+        rows = self._select(
+            f"""
+            SELECT l.term, l.filename, l.sentiment, l.text FROM {source}
+            WHERE {where} ORDER BY {order}, l.id LIMIT ?
+            """,
+            params + [limit],
+        )
+        keys = ("term", "filename", "sentiment", "text")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def count_by_term(
+        self,
+        query: str | None = None,
+        theme: str | None = None,
+        sentiment: str | None = None,
+        term: str | None = None,
+    ) -> list[dict]:
+        """Matching lines and distinct students per term, with each term's size."""
+        clauses, params = self._filters(query, theme, sentiment, term)
+        where = " AND ".join(clauses) or "1"
+        rows = self._select(
+            f"""
+            SELECT l.term, COUNT(*), COUNT(DISTINCT l.filename), t.total_files
+            FROM feedback_lines l JOIN terms t ON t.term = l.term
+            WHERE {where} GROUP BY l.term ORDER BY l.term
+            """,
+            params,
+        )
+        keys = ("term", "lines", "students", "total_files")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def theme_counts(
+        self, term_groups: list[str] | None = None
+    ) -> dict[str, list[dict]]:
+        """Students per theme for each term group, most frequent first.
+
+        Each group is a substring of term labels (e.g. "2025" pools every 2025
+        term); without groups every stored term is its own group.
+        """
+        exact = not term_groups
+        groups = term_groups or [row["term"] for row in self.terms()]
+        counts = {}
+        for group in groups:
+            rows = self._conn.execute(
+                f"""
+                SELECT th.theme, COUNT(DISTINCT l.term || '/' || l.filename) AS students
+                FROM line_themes th JOIN feedback_lines l ON l.id = th.line_id
+                WHERE l.term {"=" if exact else "LIKE"} ?
+                GROUP BY th.theme ORDER BY students DESC, th.theme
+                """,
+                (group if exact else f"%{group}%",),
+            ).fetchall()
+            counts[group] = [
+                {"theme": theme, "file_count": students} for theme, students in rows
+            ]
+        return counts
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "FeedbackStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
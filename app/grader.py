@@ -2,54 +2,469 @@
 grader.py
 
 This module uses the OpenAI SDK (>=1.0.0) to evaluate text using a provided prompt template.
+Requests go through a pluggable backend (see app.backends): the OpenAI API by
+default, any OpenAI-compatible server, or an in-process fake.
+
+With a cascade model configured (CASCADE_MODEL or `set_cascade_model`), each
+submission is first graded by that cheaper model and only sent on to the
+primary model when the first answer is not good enough to keep: unparseable
+JSON, rubric keys missing, a borderline score, or low self-reported
+confidence. Rows then carry a `graded_by` column naming the model that
+produced them.
+
+Responses are requested as JSON (`response_format`, see RESPONSE_FORMAT),
+repaired locally when they are nearly JSON, and checked against the keys the
+prompt asks for (app.structured). A response that still is not usable gets
+one targeted re-ask before the file fails.
+
+The SDK, the .env file and the clients are loaded on first use, so commands
+that never call the model do not pay for them.
 """
 
 import os
-import json
-import re
-from openai import OpenAI
-from dotenv import load_dotenv
+import string
+from functools import lru_cache
+from pathlib import Path
+from app import metrics
+from app.backends import make_backend
+from app.cache import GradingCache
+from app.structured import (
+    ResponseError,
+    reask_request,
+    repair_json,
+    response_format,
+    validate_result,
+)
+from app.ratelimit import AdaptiveLimiter, call_with_retry, call_with_retry_async
+
+DEFAULT_MODEL = "gpt-4-turbo"
+temperature = 0.2
+
+# Cascade first passes are kept unless the score is one of these...
+DEFAULT_BORDERLINE_SCORES = "2,3,4"
+# ...or the model's own confidence in its grade is below this.
+DEFAULT_MIN_CONFIDENCE = 0.7
+CONFIDENCE_KEY = "grading_confidence"
+DEFAULT_RESPONSE_FORMAT = "json_object"
+# JSON mode is refused unless the messages mention JSON; added for prompts
+# that do not.
+JSON_INSTRUCTION = "Reply with a single JSON object."
+CONFIDENCE_INSTRUCTION = (
+    f'Also include a "{CONFIDENCE_KEY}" key: a number from 0 to 1 for how '
+    "confident you are that this grade is correct. Use a low value when the "
+    "submission is ambiguous or the rubric is hard to apply."
+)
+
+# Created by get_client()/get_async_client() (the async client backs concurrent
+# directory runs). Retries are handled by app.ratelimit, so the SDK's own
+# retries are disabled.
+client = None
+async_client = None
+# Chosen by get_backend() from the environment unless set_backend() was called.
+backend = None
+# First-pass model for cascade grading; falls back to CASCADE_MODEL when None.
+cascade_model = None
+# One of app.structured.RESPONSE_FORMATS; falls back to RESPONSE_FORMAT when None.
+response_format_mode = None
+
+
+@lru_cache(maxsize=None)
+def _load_env() -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def get_model() -> str:
+    _load_env()
+    return os.getenv("OPENAI_MODEL", DEFAULT_MODEL)
+
+
+def get_client():
+    global client
+    if client is None:
+        from openai import OpenAI
+
+        _load_env()
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return client
+
+
+def get_async_client():
+    global async_client
+    if async_client is None:
+        from openai import AsyncOpenAI
+
+        _load_env()
+        async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return async_client
+
+
+def get_backend():
+    global backend
+    if backend is None:
+        _load_env()
+        backend = make_backend()
+    return backend
+
+
+def set_backend(new_backend) -> None:
+    global backend
+    backend = new_backend
+
+
+def get_cascade_model() -> str | None:
+    _load_env()
+    return cascade_model or os.getenv("CASCADE_MODEL") or None
+
 
-# Load environment variables
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-model = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
+def set_cascade_model(model: str | None) -> None:
+    global cascade_model
+    cascade_model = model
 
-# Initialize OpenAI client
-client = OpenAI(api_key=api_key)
+
+def get_response_format() -> str:
+    _load_env()
+    return (
+        response_format_mode
+        or os.getenv("RESPONSE_FORMAT")
+        or DEFAULT_RESPONSE_FORMAT
+    )
+
+
+def set_response_format(mode: str | None) -> None:
+    global response_format_mode
+    response_format_mode = mode
+
+
+def _borderline_scores() -> set[str]:
+    spec = os.getenv("CASCADE_BORDERLINE_SCORES", DEFAULT_BORDERLINE_SCORES)
+    return {score.strip() for score in spec.split(",") if score.strip()}
 
 
-def grade_with_prompt(text: str, prompt_path: str) -> dict:
+def _min_confidence() -> float:
+    return float(os.getenv("CASCADE_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE))
+
+
+def __getattr__(name: str):
+    # `grader.model` still works, resolved when first asked for.
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class PromptTemplate:
+    """A grading prompt split around its single `{text}` placeholder.
+
+    Everything before `{text}` is the rubric prefix, which is identical for
+    every submission and is sent as the system message so the provider can
+    reuse its prompt cache; the student text and anything after the
+    placeholder form the user message.
     """
-    Sends the provided text to OpenAI using the specified prompt template.
-    The prompt should include a `{text}` placeholder.
+
+    def __init__(self, source: str, name: str = "prompt"):
+        self.source = source
+        self.name = name
+        prefix, suffix, found = [], [], 0
+        try:
+            for literal, field, spec, conversion in string.Formatter().parse(source):
+                (suffix if found else prefix).append(literal)
+                if field is None:
+                    continue
+                if field != "text" or spec or conversion:
+                    raise ValueError(
+                        f"Prompt {name} has an unsupported placeholder {{{field}}}; "
+                        "only {text} is filled in (escape other braces as {{ }})."
+                    )
+                found += 1
+        except ValueError as e:
+            if "unsupported placeholder" in str(e):
+                raise
+            raise ValueError(f"Prompt {name} is not a valid template: {e}") from e
+        if found != 1:
+            raise ValueError(
+                f"Prompt {name} must contain exactly one {{text}} placeholder "
+                f"(found {found})."
+            )
+        self.prefix = "".join(prefix)
+        self.suffix = "".join(suffix)
+
+    def render(self, text: str) -> str:
+        return self.prefix + text + self.suffix
+
+    def messages(self, text: str) -> list[dict]:
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": text + self.suffix},
+        ]
+
+
+@lru_cache(maxsize=32)
+def _load_prompt(path: str, mtime_ns: int, size: int) -> PromptTemplate:
+    with open(path, "r", encoding="utf-8") as f:
+        return PromptTemplate(f.read(), name=Path(path).name)
+
+
+def load_prompt(prompt_path: str) -> PromptTemplate:
+    """Read and validate a prompt file once; reloaded only if the file changes."""
+    resolved = Path(prompt_path).resolve()
+    stat = resolved.stat()
+    return _load_prompt(str(resolved), stat.st_mtime_ns, stat.st_size)
+
+
+def load_prompt_template(prompt_path: str) -> str:
+    return load_prompt(prompt_path).source
+
+
+def model_label() -> str:
+    """The model as cache keys and run journals see it (includes the backend).
+
+    A cascade is labelled `cheap>primary` plus its escalation cut-offs, so its
+    results are kept apart from single-model runs and from cascades that would
+    have escalated differently. The response format is appended
+    (`model[json_object]`), since it changes what the model is asked for.
+    """
+    backend = get_backend()
+    label = backend.cache_namespace(get_model())
+    cascade = get_cascade_model()
+    if cascade:
+        borderline = ",".join(sorted(_borderline_scores()))
+        label = (
+            f"{backend.cache_namespace(cascade)}>{label}"
+            f"(borderline={borderline};min_confidence={_min_confidence():g})"
+        )
+    return f"{label}[{get_response_format()}]"
+
+
+def grading_cache_key(text: str, prompt_template: str) -> str:
+    return GradingCache.make_key(text, prompt_template, model_label(), temperature)
+
+
+def build_chat_request(
+    text: str, prompt: PromptTemplate, model: str | None = None
+) -> dict:
+    """Chat completion parameters shared by live calls and batch request files.
+
+    In JSON mode, a prompt that never mentions JSON gets JSON_INSTRUCTION as a
+    second system message, after the rubric prefix.
+    """
+    mode = get_response_format()
+    body = {
+        "model": model or get_model(),
+        "messages": prompt.messages(text),
+        "temperature": temperature,
+    }
+    if mode == "json_object" and "json" not in prompt.source.lower():
+        body["messages"].insert(1, {"role": "system", "content": JSON_INSTRUCTION})
+    output_format = response_format(prompt.source, mode)
+    if output_format is not None:
+        body["response_format"] = output_format
+    return body
+
+
+def build_cascade_request(text: str, prompt: PromptTemplate, model: str) -> dict:
+    """First-pass request: the usual one, also asking for a confidence value.
+
+    The extra instruction goes after the rubric prefix so the provider's
+    prompt cache still covers the prefix.
+    """
+    body = build_chat_request(text, prompt, model)
+    body["messages"].insert(1, {"role": "system", "content": CONFIDENCE_INSTRUCTION})
+    return body
+
+
+def escalation_reason(result: dict) -> str | None:
+    """Why a valid first-pass result should still go to the primary model.
+
+    "borderline_score" or "low_confidence", or None to keep it. Responses
+    that fail validation are escalated by their ResponseError kind instead.
+    """
+    if "score" in result and str(result["score"]).strip() in _borderline_scores():
+        return "borderline_score"
+    confidence = result.get(CONFIDENCE_KEY)
+    if isinstance(confidence, (int, float)) and confidence < _min_confidence():
+        return "low_confidence"
+    return None
+
+
+def parse_grading_response(content: str, prompt_source: str) -> dict:
+    # Repairs near-JSON (fences, prose, trailing commas, truncation) and checks
+    # the prompt's keys; raises ResponseError, a ValueError, when unusable.
+    result = repair_json(content)[0]
+    validate_result(result, prompt_source)
+    return result
+
+
+def _cached_result(cache: GradingCache | None, key: str) -> dict | None:
+    if cache is None:
+        return None
+    with metrics.span("cache") as span:
+        cached = cache.get(key)
+        span["hit"] = cached is not None
+    return cached
+
+
+def _render(text: str, prompt: PromptTemplate, cascade: str | None = None) -> dict:
+    with metrics.span("render", chars=len(text)):
+        if cascade:
+            return build_cascade_request(text, prompt, cascade)
+        return build_chat_request(text, prompt)
+
+
+def _counting_attempts(fn, span: dict):
+    # Retried callables are re-invoked per attempt, so this counts retries too.
+    def attempt():
+        span["attempts"] = span.get("attempts", 0) + 1
+        return fn()
+
+    return attempt
+
+
+def _parse(
+    content: str, prompt: PromptTemplate, first_pass: bool = False
+) -> dict | None:
+    """Repair and validate a response (raising ResponseError if unusable).
+
+    For a cascade first pass, returns None instead when the result should be
+    escalated, with the reason recorded on the parse span.
+    """
+    with metrics.span("parse") as span:
+        try:
+            result, span["repaired"] = repair_json(content)
+            validate_result(result, prompt.source)
+            reason = escalation_reason(result) if first_pass else None
+        except ResponseError as e:
+            if not first_pass:
+                raise
+            reason = e.kind
+        if reason:
+            span["escalated"] = reason
+            return None
+    result.pop(CONFIDENCE_KEY, None)
+    return result
+
+
+def grade_with_prompt(
+    text: str, prompt_path: str, cache: GradingCache | None = None, backend=None
+) -> dict:
+    """
+    Sends the provided text to the model using the specified prompt template.
+    The prompt should include a `{text}` placeholder. Rate limits and transient
+    errors are retried with backoff (see app.ratelimit).
 
     Args:
         text (str): The input student text to grade.
         prompt_path (str): Path to the prompt file with a {text} placeholder.
+        cache (GradingCache, optional): Result cache consulted before calling
+            the model; fresh results are stored in it.
+        backend (optional): Backend to send the request to (default:
+            `get_backend()`).
 
     Returns:
         dict: The parsed response from the model.
     """
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        prompt_template = f.read()
+    prompt = load_prompt(prompt_path)
+    key = grading_cache_key(text, prompt.source)
+    cached = _cached_result(cache, key)
+    if cached is not None:
+        return cached
 
-    prompt = prompt_template.format(text=text)
+    backend = backend or get_backend()
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
+    def complete(body: dict, tier: str) -> str:
+        with metrics.span(
+            "model_call", backend=backend.name, model=body["model"], tier=tier
+        ) as span:
+            completion = call_with_retry(
+                _counting_attempts(lambda: backend.complete(body), span)
+            )
+            span.update(completion.usage or {})
+        return completion.content
 
-    content = response.choices[0].message.content
+    result = None
+    cascade = get_cascade_model()
+    if cascade:
+        content = complete(_render(text, prompt, cascade), "cascade")
+        result = _parse(content, prompt, first_pass=True)
+        graded_by = cascade
+    if result is None:
+        body = _render(text, prompt)
+        content = complete(body, "primary")
+        try:
+            result = _parse(content, prompt)
+        except ResponseError as e:
+            result = _parse(complete(reask_request(body, content, e), "reask"), prompt)
+        graded_by = get_model()
+    if cascade:
+        result["graded_by"] = graded_by
 
-    # Strip Markdown-style ```json blocks if present
-    cleaned = re.sub(r"^```json\s*|\s*```$", "", content.strip(), flags=re.MULTILINE)
+    if cache is not None:
+        cache.put(key, result)
+    return result
 
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        raise ValueError(
-            f"Model response could not be parsed as JSON:\n{e}\nRaw content:\n{content}"
-        )
+
+async def grade_with_prompt_async(
+    text: str,
+    prompt_path: str,
+    cache: GradingCache | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    backend=None,
+) -> dict:
+    """
+    Async counterpart of `grade_with_prompt`, so several submissions can be in
+    flight at once.
+
+    Args:
+        text (str): The input student text to grade.
+        prompt_path (str): Path to the prompt file with a {text} placeholder.
+        cache (GradingCache, optional): Result cache consulted before calling
+            the model; fresh results are stored in it.
+        limiter (AdaptiveLimiter, optional): Shared limit on in-flight requests,
+            adjusted from every success and rate-limit response.
+        backend (optional): Backend to send the request to (default:
+            `get_backend()`).
+
+    Returns:
+        dict: The parsed response from the model.
+    """
+    prompt = load_prompt(prompt_path)
+    key = grading_cache_key(text, prompt.source)
+    cached = _cached_result(cache, key)
+    if cached is not None:
+        return cached
+
+    backend = backend or get_backend()
+
+    async def complete(body: dict, tier: str) -> str:
+        # Includes time spent waiting for a limiter slot and backing off.
+        with metrics.span(
+            "model_call", backend=backend.name, model=body["model"], tier=tier
+        ) as span:
+            completion = await call_with_retry_async(
+                _counting_attempts(lambda: backend.acomplete(body), span),
+                limiter=limiter,
+            )
+            span.update(completion.usage or {})
+        return completion.content
+
+    result = None
+    cascade = get_cascade_model()
+    if cascade:
+        content = await complete(_render(text, prompt, cascade), "cascade")
+        result = _parse(content, prompt, first_pass=True)
+        graded_by = cascade
+    if result is None:
+        body = _render(text, prompt)
+        content = await complete(body, "primary")
+        try:
+            result = _parse(content, prompt)
+        except ResponseError as e:
+            content = await complete(reask_request(body, content, e), "reask")
+            result = _parse(content, prompt)
+        graded_by = get_model()
+    if cascade:
+        result["graded_by"] = graded_by
+
+    if cache is not None:
+        cache.put(key, result)
+    return result
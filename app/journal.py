@@ -0,0 +1,85 @@
+"""
+journal.py
+
+Checkpoint journal for grading runs, so an interrupted run can be resumed
+without paying again for files that were already graded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from app.cache import ExtractionCache
+
+DEFAULT_JOURNAL_DIR = Path("results") / ".journal"
+
+
+def run_key(input_path: str | Path, prompt_template: str, model: str) -> str:
+    digest = hashlib.sha256()
+    for part in (str(Path(input_path).resolve()), prompt_template, model):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RunJournal:
+    """Append-only JSON Lines log of the files a run has graded.
+
+    One journal exists per (input folder, prompt contents, model). Each line
+    holds a filename, the content hash of the file when it was graded and the
+    result. Opening with `resume=False` starts the journal over; with
+    `resume=True` earlier entries are loaded and `completed()` returns the
+    stored result for files whose contents have not changed since.
+    """
+
+    def __init__(
+        self,
+        input_path: str | Path,
+        prompt_template: str,
+        model: str,
+        resume: bool = False,
+        directory: str | Path = DEFAULT_JOURNAL_DIR,
+    ):
+        key = run_key(input_path, prompt_template, model)
+        name = Path(input_path).resolve().name or "run"
+        self.path = Path(directory) / f"{name}-{key[:16]}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._entries: dict[str, dict] = {}
+
+        if resume and self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash mid-write can leave a truncated last line.
+                        continue
+                    self._entries[entry["filename"]] = entry
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._file.tell() and not self.path.read_bytes().endswith(b"\n"):
+            self._file.write("\n")
+
+    def completed(self, file_path: str | Path) -> dict | None:
+        entry = self._entries.get(Path(file_path).name)
+        if entry is None or entry["content_hash"] != ExtractionCache.hash_file(
+            file_path
+        ):
+            return None
+        return entry["result"]
+
+    def record(self, file_path: str | Path, result: dict) -> None:
+        entry = {
+            "filename": Path(file_path).name,
+            "content_hash": ExtractionCache.hash_file(file_path),
+            "result": result,
+        }
+        self._entries[entry["filename"]] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,227 @@
+"""
+metrics.py
+
+Per-file timing spans for grading runs. A run installs a `RunMetrics`
+collector; extraction, the grading cache, prompt rendering, the model call,
+JSON parsing and output writing each record a span tagged with the file being
+graded, along with token usage, attempts and cache hits where they apply.
+The run ends with a per-stage summary and, on request, a JSON Lines or
+Prometheus textfile export.
+
+Recording is a no-op while no collector is installed, so library callers
+(tests, analyze_feedback.py) pay nothing.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import threading
+from collections import Counter
+import time
+from pathlib import Path
+
+STAGES = ["extract", "sections", "cache", "render", "model_call", "parse", "write", "file"]
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+PROMETHEUS_PREFIX = "retro_grader"
+
+_current_file: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "current_file", default=None
+)
+collector: RunMetrics | None = None
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+class RunMetrics:
+    """Spans recorded during one run; safe to use from threads and tasks."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.wall_s: float | None = None
+        self.spans: list[dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, duration_s: float, file: str | None = None, **attrs):
+        span = {
+            "file": file if file is not None else _current_file.get(),
+            "stage": stage,
+            "duration_s": round(duration_s, 6),
+            **attrs,
+        }
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self) -> None:
+        self.wall_s = time.perf_counter() - self._started
+
+    def summary(self) -> dict:
+        """Per-stage totals and percentiles plus run-wide counters."""
+        with self._lock:
+            spans = list(self.spans)
+        wall_s = self.wall_s
+        if wall_s is None:
+            wall_s = time.perf_counter() - self._started
+
+        stages = {}
+        for stage in STAGES + sorted({s["stage"] for s in spans} - set(STAGES)):
+            durations = [s["duration_s"] for s in spans if s["stage"] == stage]
+            if not durations:
+                continue
+            total = sum(durations)
+            stages[stage] = {
+                "count": len(durations),
+                "total_s": round(total, 6),
+                "mean_s": round(total / len(durations), 6),
+                "p50_s": _percentile(durations, 0.5),
+                "p95_s": _percentile(durations, 0.95),
+                "max_s": max(durations),
+            }
+
+        model_calls = [s for s in spans if s["stage"] == "model_call"]
+        file_spans = [s for s in spans if s["stage"] == "file"]
+        cache_spans = [s for s in spans if s["stage"] in ("cache", "extract")]
+        return {
+            "started_at": self.started_at,
+            "wall_s": round(wall_s, 6),
+            "files": len(file_spans),
+            "failed_files": sum(1 for s in file_spans if s.get("error")),
+            "stages": stages,
+            "tokens": {
+                field: sum(s.get(field) or 0 for s in model_calls)
+                for field in TOKEN_FIELDS
+            },
+            "model_calls": len(model_calls),
+            "retries": sum(max(0, s.get("attempts", 1) - 1) for s in model_calls),
+            # Responses fixed up locally, and re-asked after repair failed.
+            "repairs": sum(
+                1 for s in spans if s["stage"] == "parse" and s.get("repaired")
+            ),
+            "reasks": sum(1 for s in model_calls if s.get("tier") == "reask"),
+            # Cascade first passes sent on to the primary model, by reason.
+            "escalations": dict(
+                Counter(s["escalated"] for s in spans if s.get("escalated"))
+            ),
+            "cache_hits": {
+                stage: sum(
+                    1 for s in cache_spans if s["stage"] == stage and s.get("hit")
+                )
+                for stage in ("cache", "extract")
+            },
+            "slowest_files": [
+                {"file": s["file"], "duration_s": s["duration_s"]}
+                for s in sorted(
+                    file_spans, key=lambda s: s["duration_s"], reverse=True
+                )[:5]
+            ],
+        }
+
+    def write_jsonl(self, path: str | Path) -> None:
+        """One line per span, then a final `{"summary": ...}` line."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span) + "\n")
+            f.write(json.dumps({"summary": self.summary()}) + "\n")
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """Write a node_exporter textfile-collector file (atomically replaced)."""
+        summary = self.summary()
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Time spent per grading stage, per file.",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for stage, row in summary["stages"].items():
+            for quantile, key in (("0.5", "p50_s"), ("0.95", "p95_s")):
+                labels = f'stage="{stage}",quantile="{quantile}"'
+                lines.append(f"{p}_stage_seconds{{{labels}}} {row[key]}")
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {row["total_s"]}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {row["count"]}')
+        lines += [
+            f"# HELP {p}_tokens_total Tokens reported by the model, by kind.",
+            f"# TYPE {p}_tokens_total counter",
+        ]
+        for field, value in summary["tokens"].items():
+            kind = field.removesuffix("_tokens")
+            lines.append(f'{p}_tokens_total{{kind="{kind}"}} {value}')
+        lines += [
+            f"# HELP {p}_model_calls_total Model calls, excluding retries.",
+            f"# TYPE {p}_model_calls_total counter",
+            f"{p}_model_calls_total {summary['model_calls']}",
+            f"# HELP {p}_retries_total Extra model call attempts after failures.",
+            f"# TYPE {p}_retries_total counter",
+            f"{p}_retries_total {summary['retries']}",
+            f"# HELP {p}_cache_hits_total Cache hits by cache.",
+            f"# TYPE {p}_cache_hits_total counter",
+        ]
+        for cache, hits in summary["cache_hits"].items():
+            name = "grading" if cache == "cache" else "extraction"
+            lines.append(f'{p}_cache_hits_total{{cache="{name}"}} {hits}')
+        lines += [
+            f"# HELP {p}_files_total Files processed in the run, by outcome.",
+            f"# TYPE {p}_files_total counter",
+            f'{p}_files_total{{outcome="graded"}} '
+            f"{summary['files'] - summary['failed_files']}",
+            f'{p}_files_total{{outcome="failed"}} {summary["failed_files"]}',
+            f"# HELP {p}_run_seconds Wall-clock duration of the run.",
+            f"# TYPE {p}_run_seconds gauge",
+            f"{p}_run_seconds {summary['wall_s']}",
+            f"# HELP {p}_run_timestamp_seconds When the run started.",
+            f"# TYPE {p}_run_timestamp_seconds gauge",
+            f"{p}_run_timestamp_seconds {summary['started_at']:.3f}",
+        ]
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp_path.replace(path)
+
+
+def set_collector(metrics: RunMetrics | None) -> None:
+    global collector
+    collector = metrics
+
+
+def record(stage: str, duration_s: float, file: str | None = None, **attrs) -> None:
+    if collector is not None:
+        collector.record(stage, duration_s, file=file, **attrs)
+
+
+@contextlib.contextmanager
+def span(stage: str, file: str | None = None, **attrs):
+    """Time the block as one span; the yielded dict takes extra attributes.
+
+    An exception inside the block is recorded as `error` and re-raised.
+    """
+    if collector is None:
+        yield {}
+        return
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as exc:
+        attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        collector.record(stage, time.perf_counter() - start, file=file, **attrs)
+
+
+@contextlib.contextmanager
+def file_context(file_path: str | Path):
+    """Tag spans recorded in this block (and tasks it starts) with the file."""
+    token = _current_file.set(Path(file_path).name)
+    try:
+        yield
+    finally:
+        _current_file.reset(token)
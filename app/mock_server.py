@@ -0,0 +1,530 @@
+"""
+mock_server.py
+
+A small local stand-in for the OpenAI endpoints the grader uses (chat
+completions, Files and Batches), so runs can be exercised with no network
+access. Point the grader at it with `--base-url http://127.0.0.1:<port>/v1`
+(or `OPENAI_BASE_URL`).
+
+Chat completions can misbehave on purpose, to measure concurrency and retry
+behaviour offline: a latency distribution, request/token-per-minute limits
+answered with 429 and rate-limit headers, injected 429/5xx responses, and
+malformed (non-JSON) grades.
+
+Usage:
+    python -m app.mock_server --port 8089
+    python -m app.mock_server --latency lognormal:0.8,0.5 --rpm 120 --tpm 60000 \
+        --error-rate 0.02 --malformed-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import html
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+DEFAULT_GRADE = {
+    "student_name": "Mock Student",
+    "score": 5,
+    "breakdown": [],
+    "students_with_poor_ratings": [],
+}
+
+PACKED_SUBMISSION = re.compile(r'^<submission filename="([^"]*)">$', re.MULTILINE)
+
+
+def default_responder(body: dict) -> str:
+    """Return the assistant message content for a chat completion request.
+
+    DEFAULT_GRADE, plus an empty value for any other key the rubric (the
+    system messages) asks for, so every prompt gets a complete answer. A
+    packed request (see app.packing) gets one such grade per submission.
+    """
+    from app.structured import output_schema
+
+    rubric = "\n".join(
+        message.get("content") or ""
+        for message in body.get("messages", [])
+        if message.get("role") == "system"
+    )
+    grade = dict(DEFAULT_GRADE)
+    for key, python_type in output_schema(rubric).items():
+        grade.setdefault(key, python_type() if python_type else "")
+    submissions = PACKED_SUBMISSION.findall(body["messages"][-1].get("content") or "")
+    if submissions:
+        return json.dumps(
+            {"grades": [{"filename": html.unescape(name), **grade} for name in submissions]}
+        )
+    return json.dumps(grade)
+
+
+def estimate_prompt_tokens(body: dict) -> int:
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    return max(1, prompt_chars // 4)
+
+
+def chat_completion(body: dict, content: str, completion_id: str) -> dict:
+    prompt_tokens = estimate_prompt_tokens(body)
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock-model"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def parse_latency(spec: str | float | None) -> Callable[[random.Random], float]:
+    """Build a latency sampler (seconds) from a spec.
+
+    `0.2` or `fixed:0.2`, `uniform:LOW,HIGH`, `normal:MEAN,STDDEV`,
+    `lognormal:MEDIAN,SIGMA` (long-tailed, like real model calls) or
+    `exp:MEAN`. Samples are never negative.
+    """
+    if spec is None:
+        return lambda rng: 0.0
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    try:
+        values = [float(value) for value in args.split(",")]
+    except ValueError:
+        raise ValueError(f"Invalid latency spec {spec!r}") from None
+    samplers = {
+        ("fixed", 1): lambda rng: values[0],
+        ("uniform", 2): lambda rng: rng.uniform(values[0], values[1]),
+        ("normal", 2): lambda rng: rng.gauss(values[0], values[1]),
+        ("lognormal", 2): lambda rng: rng.lognormvariate(
+            math.log(values[0]), values[1]
+        ),
+        ("exp", 1): lambda rng: rng.expovariate(1 / values[0]),
+    }
+    sampler = samplers.get((kind, len(values)))
+    if sampler is None:
+        raise ValueError(f"Invalid latency spec {spec!r}")
+    return lambda rng: max(0.0, sampler(rng))
+
+
+def malformed_content(content: str, variant: int) -> str:
+    """Near-JSON the way models get it wrong: prose, trailing commas, truncation."""
+    variants = [
+        f"Here is the grade you asked for:\n{content}\nLet me know if you need more.",
+        content.rstrip("}").rstrip() + ",}",
+        content[: max(1, len(content) // 2)],
+    ]
+    return variants[variant % len(variants)]
+
+
+class RateWindow:
+    """Requests and tokens admitted in the last minute, for one limit pair."""
+
+    def __init__(self, requests_per_minute: int | None, tokens_per_minute: int | None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._admitted: collections.deque[tuple[float, int]] = collections.deque()
+        self._tokens = 0
+
+    def _expire(self, now: float) -> None:
+        while self._admitted and now - self._admitted[0][0] >= 60:
+            self._tokens -= self._admitted.popleft()[1]
+
+    def admit(self, tokens: int, now: float) -> tuple[bool, dict]:
+        """Record the request if it fits; returns (admitted, rate-limit headers)."""
+        self._expire(now)
+        over_requests = (
+            self.requests_per_minute is not None
+            and len(self._admitted) + 1 > self.requests_per_minute
+        )
+        over_tokens = (
+            self.tokens_per_minute is not None
+            and self._tokens + tokens > self.tokens_per_minute
+        )
+        admitted = not (over_requests or over_tokens)
+        if admitted:
+            self._admitted.append((now, tokens))
+            self._tokens += tokens
+        reset = 60 - (now - self._admitted[0][0]) if self._admitted else 0.0
+
+        headers = {}
+        for kind, limit, used in (
+            ("requests", self.requests_per_minute, len(self._admitted)),
+            ("tokens", self.tokens_per_minute, self._tokens),
+        ):
+            if limit is None:
+                continue
+            headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+            headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, limit - used))
+            headers[f"x-ratelimit-reset-{kind}"] = f"{reset:.3f}s"
+        if not admitted:
+            headers["retry-after-ms"] = str(max(1, round(reset * 1000)))
+        return admitted, headers
+
+
+class MockOpenAIServer:
+    """Threaded HTTP server implementing chat completions, Files and Batches.
+
+    Batches complete on the first status poll after creation; `polls_to_complete`
+    raises that to exercise the polling loop. Every chat completion and every
+    request line in a batch is answered through `responder`.
+
+    Chat completions (not batches) can also be made slow and unreliable:
+    `latency` is a spec for `parse_latency`; `requests_per_minute` and
+    `tokens_per_minute` are enforced over a sliding minute with 429s carrying
+    Retry-After and x-ratelimit headers; `rate_limit_rate` and `error_rate`
+    inject 429s and 500/502/503s at random; `malformed_rate` replaces the
+    content with near-JSON. `seed` makes the injected behaviour repeatable,
+    and `stats` counts what happened.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        responder: Callable[[dict], str] = default_responder,
+        polls_to_complete: int = 1,
+        latency: str | float | None = None,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        rate_limit_rate: float = 0.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.responder = responder
+        self.polls_to_complete = polls_to_complete
+        self.sample_latency = parse_latency(latency)
+        self.rate_window = RateWindow(requests_per_minute, tokens_per_minute)
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.stats = dict.fromkeys(
+            [
+                "requests",
+                "completed",
+                "rate_limited",
+                "server_errors",
+                "malformed",
+                "in_flight",
+                "peak_in_flight",
+            ],
+            0,
+        )
+        self.files: dict[str, dict] = {}
+        self.batches: dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _next_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}-mock-{next(self._ids)}"
+
+    def _chat(self, body: dict) -> tuple[int, dict, dict]:
+        """Answer one chat completion: (status, payload, extra headers)."""
+        tokens = estimate_prompt_tokens(body)
+        with self._lock:
+            self.stats["requests"] += 1
+            admitted, headers = self.rate_window.admit(tokens, time.monotonic())
+            draw = self._rng.random()
+            malformed = self._rng.random() < self.malformed_rate
+            delay = self.sample_latency(self._rng)
+            status = self._rng.choice([500, 502, 503])
+            if not admitted or draw < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                headers.setdefault("retry-after-ms", "250")
+                return (
+                    429,
+                    {
+                        "error": {
+                            "message": "Rate limit reached (mock server).",
+                            "type": "requests",
+                            "code": "rate_limit_exceeded",
+                        }
+                    },
+                    headers,
+                )
+            self.stats["in_flight"] += 1
+            self.stats["peak_in_flight"] = max(
+                self.stats["peak_in_flight"], self.stats["in_flight"]
+            )
+
+        time.sleep(delay)
+        with self._lock:
+            self.stats["in_flight"] -= 1
+            if draw < self.rate_limit_rate + self.error_rate:
+                self.stats["server_errors"] += 1
+                return (
+                    status,
+                    {"error": {"message": "The server had an error (mock server)."}},
+                    headers,
+                )
+            self.stats["completed"] += 1
+            if malformed:
+                self.stats["malformed"] += 1
+                variant = self.stats["malformed"]
+
+        content = self.responder(body)
+        if malformed:
+            content = malformed_content(content, variant)
+        return 200, chat_completion(body, content, self._next_id("chatcmpl")), headers
+
+    def _store_file(self, filename: str, content: bytes, purpose: str) -> dict:
+        file_id = self._next_id("file")
+        record = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        self.files[file_id] = {"meta": record, "content": content}
+        return record
+
+    def _create_batch(self, payload: dict) -> dict:
+        batch_id = self._next_id("batch")
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": payload["endpoint"],
+            "errors": None,
+            "input_file_id": payload["input_file_id"],
+            "completion_window": payload.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "_polls": 0,
+        }
+        self.batches[batch_id] = batch
+        return batch
+
+    def _run_batch(self, batch: dict) -> None:
+        source = self.files[batch["input_file_id"]]["content"].decode("utf-8")
+        output_lines = []
+        for line in source.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            content = self.responder(request["body"])
+            output_lines.append(
+                json.dumps(
+                    {
+                        "id": self._next_id("batch_req"),
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "request_id": self._next_id("req"),
+                            "body": chat_completion(
+                                request["body"], content, self._next_id("chatcmpl")
+                            ),
+                        },
+                        "error": None,
+                    }
+                )
+            )
+        output = self._store_file(
+            "batch_output.jsonl", ("\n".join(output_lines) + "\n").encode(), "batch_output"
+        )
+        batch["status"] = "completed"
+        batch["output_file_id"] = output["id"]
+        batch["request_counts"] = {
+            "total": len(output_lines),
+            "completed": len(output_lines),
+            "failed": 0,
+        }
+
+    def _public_batch(self, batch: dict) -> dict:
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(
+                self, status: int, payload: dict, headers: dict | None = None
+            ) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _not_found(self) -> None:
+                self._send_json(
+                    404, {"error": {"message": f"No route for {self.path}"}}
+                )
+
+            def _read_body(self) -> bytes:
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length)
+
+            def do_POST(self):
+                body = self._read_body()
+                if self.path == "/v1/chat/completions":
+                    self._send_json(*server._chat(json.loads(body)))
+                elif self.path == "/v1/files":
+                    message = BytesParser(policy=HTTP).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                        + body
+                    )
+                    fields = {}
+                    for part in message.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        fields[name] = part
+                    upload = fields["file"]
+                    record = server._store_file(
+                        upload.get_filename() or "upload.jsonl",
+                        upload.get_payload(decode=True),
+                        fields["purpose"].get_content().strip(),
+                    )
+                    self._send_json(200, record)
+                elif self.path == "/v1/batches":
+                    batch = server._create_batch(json.loads(body))
+                    self._send_json(200, server._public_batch(batch))
+                else:
+                    self._not_found()
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                    batch = server.batches.get(parts[2])
+                    if batch is None:
+                        return self._not_found()
+                    if batch["status"] == "in_progress":
+                        batch["_polls"] += 1
+                        if batch["_polls"] >= server.polls_to_complete:
+                            server._run_batch(batch)
+                    self._send_json(200, server._public_batch(batch))
+                elif (
+                    parts[:2] == ["v1", "files"]
+                    and len(parts) == 4
+                    and parts[3] == "content"
+                    and parts[2] in server.files
+                ):
+                    content = server.files[parts[2]]["content"]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                else:
+                    self._not_found()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a local OpenAI-compatible stand-in server."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument(
+        "--latency",
+        help="Chat completion latency: seconds, or uniform:LOW,HIGH, normal:MEAN,SD, "
+        "lognormal:MEDIAN,SIGMA, exp:MEAN.",
+    )
+    parser.add_argument("--rpm", type=int, help="Requests per minute before 429s.")
+    parser.add_argument(
+        "--tpm", type=int, help="Prompt tokens per minute before 429s (chars/4)."
+    )
+    parser.add_argument(
+        "--rate-limit-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with a random 429.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with 500/502/503.",
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of completions whose content is not valid JSON.",
+    )
+    parser.add_argument("--seed", type=int, help="Seed for latency and injection.")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        args.host,
+        args.port,
+        latency=args.latency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+output.py
+
+CSV/JSON result layout and a streaming writer that persists each graded row
+as soon as it is available.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import re
+import textwrap
+from pathlib import Path
+
+ORDERED_HW2 = [
+    "filename",
+    "claims",
+    "assumptions",
+    "refused",
+    "oracles",
+    "confidence",
+    "score",
+    "feedback",
+]
+ORDERED_RETRO = [
+    "filename",
+    "student_name",
+    "score",
+    "overall_thoughts",
+    "personal_contributions",
+    "things_that_went_well",
+    "things_that_could_be_improved",
+    "teammate_ratings",
+    "breakdown",
+    "students_with_poor_ratings",
+]
+
+# `"key": ...` lines of a JSON example in the prompt, or `- key (type)` bullets.
+JSON_TEMPLATE_KEY = re.compile(r'^\s*"([A-Za-z_][A-Za-z0-9_]*)"\s*:', re.MULTILINE)
+BULLET_KEY = re.compile(r"^\s*-\s*([a-z_][a-z0-9_]*)\s*\(", re.MULTILINE)
+
+
+def order_fieldnames(fieldnames: set[str]) -> list[str]:
+    """Order CSV columns using the hw2/retro layouts, then the rest alphabetically."""
+    if set(ORDERED_HW2).issubset(fieldnames):
+        extra = sorted(fieldnames - set(ORDERED_HW2))
+        return ORDERED_HW2 + extra
+    elif {"filename", "student_name", "score"}.issubset(fieldnames):
+        base = [name for name in ORDERED_RETRO if name in fieldnames]
+        extra = sorted(fieldnames - set(base))
+        return base + extra
+    return sorted(fieldnames)  # Sort for consistent column order
+
+
+def expected_output_fields(prompt_template: str) -> list[str]:
+    """Keys the prompt asks the model to return, in the order it lists them.
+
+    A JSON example object takes precedence over `- key (type)` bullet lists.
+    Returns an empty list when the prompt declares neither.
+    """
+    keys = JSON_TEMPLATE_KEY.findall(prompt_template) or BULLET_KEY.findall(
+        prompt_template
+    )
+    return list(dict.fromkeys(keys))
+
+
+def _durable_write(file_obj, text: str) -> None:
+    file_obj.write(text)
+    file_obj.flush()
+    os.fsync(file_obj.fileno())
+
+
+class ResultStreamWriter:
+    """Append graded rows to JSON Lines and CSV files as results arrive.
+
+    Rows are added with their position in the input list and released in that
+    order, so concurrent runs still produce deterministic files; only rows
+    waiting on an earlier, unfinished file are buffered. Each released row is
+    flushed and fsynced, so an interrupted run keeps everything written so far.
+
+    The CSV header is declared up front from `fieldnames` (plus `filename`). If
+    a row brings keys outside that schema, the CSV is rebuilt from the JSON
+    Lines file with the widened header on `close()`. A JSON array file, when
+    requested, is produced from the JSON Lines file on `close()` as well.
+    """
+
+    def __init__(
+        self,
+        fieldnames: list[str],
+        csv_path: str | None = None,
+        jsonl_path: str | None = None,
+        json_path: str | None = None,
+    ):
+        if not jsonl_path:
+            base = csv_path or json_path
+            if not base:
+                raise ValueError("ResultStreamWriter needs at least one output path")
+            jsonl_path = str(Path(base).with_suffix(".jsonl"))
+
+        self.csv_path = csv_path
+        self.jsonl_path = jsonl_path
+        self.json_path = json_path
+        self.fieldnames = order_fieldnames({"filename", *fieldnames})
+        self.rows_written = 0
+        self._next_index = 0
+        self._pending: dict[int, dict | None] = {}
+        self._extra_fields: set[str] = set()
+
+        Path(jsonl_path).parent.mkdir(parents=True, exist_ok=True)
+        self._jsonl = open(jsonl_path, "w", encoding="utf-8")
+        self._csv = None
+        if csv_path:
+            Path(csv_path).parent.mkdir(parents=True, exist_ok=True)
+            self._csv = open(csv_path, "w", newline="", encoding="utf-8")
+            self._csv_writer = csv.DictWriter(
+                self._csv, fieldnames=self.fieldnames, extrasaction="ignore"
+            )
+            self._csv_writer.writeheader()
+            self._csv.flush()
+
+    def add(self, index: int, row: dict | None) -> None:
+        """Record the result for input position `index` (None if it failed)."""
+        self._pending[index] = row
+        while self._next_index in self._pending:
+            ready = self._pending.pop(self._next_index)
+            self._next_index += 1
+            if ready is not None:
+                self._write(ready)
+
+    def _write(self, row: dict) -> None:
+        _durable_write(self._jsonl, json.dumps(row) + "\n")
+        if self._csv:
+            self._extra_fields.update(set(row) - set(self.fieldnames))
+            self._csv_writer.writerow(row)
+            self._csv.flush()
+            os.fsync(self._csv.fileno())
+        self.rows_written += 1
+
+    def _rows(self):
+        with open(self.jsonl_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def close(self) -> None:
+        # Anything still buffered belongs after a file that never reported back.
+        for index in sorted(self._pending):
+            if self._pending[index] is not None:
+                self._write(self._pending[index])
+        self._pending.clear()
+        self._jsonl.close()
+        if self._csv:
+            self._csv.close()
+
+        if self.rows_written == 0:
+            for path in (self.csv_path, self.jsonl_path):
+                if path:
+                    Path(path).unlink(missing_ok=True)
+            return
+
+        if self.csv_path and self._extra_fields:
+            self.fieldnames = order_fieldnames(
+                set(self.fieldnames) | self._extra_fields
+            )
+            tmp_path = f"{self.csv_path}.tmp"
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                writer.writeheader()
+                writer.writerows(self._rows())
+            os.replace(tmp_path, self.csv_path)
+
+        if self.json_path:
+            Path(self.json_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.json_path, "w", encoding="utf-8") as f:
+                f.write("[\n")
+                for position, row in enumerate(self._rows()):
+                    if position:
+                        f.write(",\n")
+                    f.write(textwrap.indent(json.dumps(row, indent=2), "  "))
+                f.write("\n]")
+
+    def __enter__(self) -> "ResultStreamWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,234 @@
+"""
+packing.py
+
+Grading several short submissions in one request. For short papers the
+rubric is often longer than the student text, so sending it once per file
+mostly pays for the rubric again. Packing groups submissions (in input order)
+under a prompt-token budget, sends the rubric once with every submission
+wrapped in a `<submission filename="...">` block, and asks for a keyed JSON
+array of grades back.
+
+Every returned grade is validated like a single-file reply (app.structured);
+files whose grade is missing or invalid are left for the caller to grade on
+their own.
+"""
+
+from __future__ import annotations
+
+from html import escape
+
+from app import grader, metrics
+from app.cache import GradingCache
+from app.estimate import count_message_tokens, count_tokens
+from app.grader import PromptTemplate
+from app.ratelimit import AdaptiveLimiter, call_with_retry_async
+from app.structured import (
+    ResponseError,
+    repair_json,
+    response_format,
+    response_model,
+    validate_result,
+)
+
+# Prompt tokens per packed request (rubric included) and submissions per
+# request; the second cap keeps the reply well under the output token limit.
+DEFAULT_PACK_TOKENS = 8_000
+DEFAULT_PACK_SIZE = 8
+PACKED_KEY = "grades"
+# Tokens for the <submission> wrapper around each text.
+SUBMISSION_OVERHEAD_TOKENS = 12
+
+PACK_INSTRUCTION = (
+    "This request contains {count} separate submissions, each inside a "
+    '<submission filename="..."> block. Grade each one on its own, exactly '
+    "as the instructions above describe. Reply with only a JSON object of the "
+    'form {{"' + PACKED_KEY + '": [...]}} holding one grade object per '
+    'submission, in the same order, each with a "filename" key set to the '
+    "submission's filename."
+)
+
+
+def render_submission(filename: str, text: str, prompt: PromptTemplate) -> str:
+    return (
+        f'<submission filename="{escape(filename)}">\n'
+        f"{text}{prompt.suffix}\n</submission>"
+    )
+
+
+def pack_submissions(
+    texts: dict[str, str],
+    prompt: PromptTemplate,
+    model: str,
+    max_tokens: int = DEFAULT_PACK_TOKENS,
+    max_size: int = DEFAULT_PACK_SIZE,
+) -> list[list[str]]:
+    """Group filenames into packs whose prompt stays within `max_tokens`.
+
+    Packs are filled in input order. A submission too large to share a
+    request ends up in a pack of its own.
+    """
+    rubric_tokens, _ = count_message_tokens(
+        [
+            {"content": prompt.prefix},
+            {"content": PACK_INSTRUCTION.format(count=max_size)},
+            {"content": ""},
+        ],
+        model,
+    )
+    packs: list[list[str]] = []
+    used = 0
+    for filename, text in texts.items():
+        tokens = count_tokens(text + prompt.suffix, model)[0]
+        tokens += SUBMISSION_OVERHEAD_TOKENS
+        if packs and len(packs[-1]) < max_size and used + tokens <= max_tokens:
+            packs[-1].append(filename)
+            used += tokens
+        else:
+            packs.append([filename])
+            used = rubric_tokens + tokens
+    return packs
+
+
+def _packed_response_format(prompt: PromptTemplate) -> dict | None:
+    mode = grader.get_response_format()
+    if mode != "json_schema":
+        return response_format(prompt.source, mode)
+    item = response_model(prompt.source).model_json_schema()
+    item["properties"] = {"filename": {"type": "string"}, **item["properties"]}
+    item["required"] = ["filename", *item.get("required", [])]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "grades",
+            "schema": {
+                "type": "object",
+                "properties": {PACKED_KEY: {"type": "array", "items": item}},
+                "required": [PACKED_KEY],
+            },
+        },
+    }
+
+
+def build_packed_request(texts: dict[str, str], prompt: PromptTemplate) -> dict:
+    """One chat request grading every submission in `texts` (filename -> text).
+
+    The rubric stays the first system message, byte-identical to single-file
+    requests, so the provider's prompt cache covers it either way.
+    """
+    body = {
+        "model": grader.get_model(),
+        "messages": [
+            {"role": "system", "content": prompt.prefix},
+            {
+                "role": "system",
+                "content": PACK_INSTRUCTION.format(count=len(texts)),
+            },
+            {
+                "role": "user",
+                "content": "\n\n".join(
+                    render_submission(filename, text, prompt)
+                    for filename, text in texts.items()
+                ),
+            },
+        ],
+        "temperature": grader.temperature,
+    }
+    output_format = _packed_response_format(prompt)
+    if output_format is not None:
+        body["response_format"] = output_format
+    return body
+
+
+def parse_packed_response(
+    content: str, filenames: list[str], prompt: PromptTemplate
+) -> dict[str, dict]:
+    """The valid grades in a packed reply, by filename.
+
+    Accepts `{"grades": [...]}` or a bare array. Grades for unknown or
+    repeated filenames, and grades failing validation, are dropped.
+    """
+    # A cut-off reply keeps the grades that were written out in full.
+    value, _ = repair_json(content, max_cut_depth=2)
+    if isinstance(value, dict):
+        value = value.get(PACKED_KEY)
+    if not isinstance(value, list):
+        raise ResponseError(
+            f"Packed response has no {PACKED_KEY!r} array:\n{content}",
+            kind="unparseable",
+            problem=f'it had no "{PACKED_KEY}" array',
+        )
+    grades = {}
+    for item in value:
+        if not isinstance(item, dict):
+            continue
+        filename = item.pop("filename", None)
+        if filename not in filenames or filename in grades:
+            continue
+        try:
+            validate_result(item, prompt.source)
+        except ResponseError:
+            continue
+        grades[filename] = item
+    return grades
+
+
+def packed_cache_key(text: str, prompt: PromptTemplate) -> str:
+    # Packed grades are kept apart from grades of the file on its own.
+    return GradingCache.make_key(
+        text, prompt.source, f"{grader.model_label()}+packed", grader.temperature
+    )
+
+
+async def grade_pack_async(
+    texts: dict[str, str],
+    prompt: PromptTemplate,
+    cache: GradingCache | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    backend=None,
+) -> dict[str, dict]:
+    """Grade `texts` (filename -> text) in one request; returns the grades by filename.
+
+    Cached grades, packed or from grading the file on its own, are reused
+    and left out of the request. Files missing from the result did not come
+    back usable and should be graded individually.
+    """
+    grades = {}
+    pending = {}
+    for filename, text in texts.items():
+        cached = None
+        if cache is not None:
+            cached = cache.get(packed_cache_key(text, prompt)) or cache.get(
+                grader.grading_cache_key(text, prompt.source)
+            )
+        if cached is not None:
+            grades[filename] = cached
+        else:
+            pending[filename] = text
+    if not pending:
+        return grades
+
+    backend = backend or grader.get_backend()
+    body = build_packed_request(pending, prompt)
+    with metrics.span(
+        "model_call", backend=backend.name, tier="packed", files=len(pending)
+    ) as span:
+
+        def attempt():
+            span["attempts"] = span.get("attempts", 0) + 1
+            return backend.acomplete(body)
+
+        completion = await call_with_retry_async(attempt, limiter=limiter)
+        span.update(completion.usage or {})
+
+    with metrics.span("parse", files=len(pending)) as span:
+        try:
+            graded = parse_packed_response(completion.content, list(pending), prompt)
+        except ResponseError:
+            graded = {}
+        span["missing"] = len(pending) - len(graded)
+    for filename, result in graded.items():
+        if cache is not None:
+            cache.put(packed_cache_key(pending[filename], prompt), result)
+        grades[filename] = result
+    return grades
+
@@ -1,16 +1,223 @@
-from docx import Document
-import fitz  # PyMuPDF
+from __future__ import annotations
+
+import contextlib
+import os
+import time
+import warnings
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
 
+from app import metrics
+
+if TYPE_CHECKING:
+    from app.cache import ExtractionCache
+
+# Bump when extractor output changes so cached text is not reused.
+EXTRACTOR_VERSION = "3"
+
+SUPPORTED_EXTENSIONS = {".docx", ".pdf", ".txt"}
+
+
+def _env_limit(name: str, default: int) -> int | None:
+    # Read from the environment so process-pool workers see the same limits;
+    # 0 turns a limit off. A bad value must not break every entry point at
+    # import time, so it falls back to the default with a warning.
+    raw = os.getenv(name, "").strip()
+    try:
+        value = int(raw) if raw else default
+    except ValueError:
+        warnings.warn(
+            f"Ignoring {name}={raw!r}: expected a whole number (0 for no limit); "
+            f"using the default of {default}.",
+            stacklevel=2,
+        )
+        value = default
+    return value if value > 0 else None
+
+
+# A long scanned appendix should not become a huge prompt: PDFs stop after
+# this many pages or characters of text, whichever comes first.
+PDF_MAX_PAGES = _env_limit("PDF_MAX_PAGES", 100)
+PDF_MAX_CHARS = _env_limit("PDF_MAX_CHARS", 250_000)
+
+# Starts the marker left where a PDF was cut off.
+TRUNCATION_MARKER = "[... truncated "
+
+# Cache variant for extracted text; the PDF limits change what is extracted.
+EXTRACTION_VARIANT = f"{EXTRACTOR_VERSION}/pdf:{PDF_MAX_PAGES}:{PDF_MAX_CHARS}"
+
+
+# lxml, python-docx and PyMuPDF are imported on first use; they dominate
+# startup time.
+
+
+_DOCX_BODY = "word/document.xml"
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+# Run content with a fixed text equivalent, as python-docx renders it.
+_DOCX_RUN_TEXT = {
+    f"{_W}tab": "\t",
+    f"{_W}ptab": "\t",
+    f"{_W}cr": "\n",
+    f"{_W}noBreakHyphen": "-",
+}
+
+
+def iter_docx_lines(file_path: str) -> Iterator[str]:
+    """Yield the text of a .docx body in document order, one line at a time.
+
+    Streams `word/document.xml` with lxml instead of building python-docx's
+    object model. Each paragraph is a line; each table row is one line of its
+    cells joined with " | " (paragraphs within a cell joined with a space,
+    nested tables flattened into their cell). Text boxes are included once,
+    skipping their legacy `mc:Fallback` copies.
+    """
+    from lxml import etree
+
+    with zipfile.ZipFile(file_path) as archive, archive.open(_DOCX_BODY) as xml:
+        depth = 0
+        skip = 0
+        paragraphs: list[list[str]] = []
+        # One list of cells per open row, one list of paragraphs per open cell.
+        rows: list[list[str]] = []
+        cells: list[list[str]] = []
+        for event, elem in etree.iterparse(xml, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                depth += 1
+                if tag == _MC_FALLBACK:
+                    skip += 1
+                elif skip:
+                    pass
+                elif tag == f"{_W}p":
+                    paragraphs.append([])
+                elif tag == f"{_W}tr":
+                    rows.append([])
+                elif tag == f"{_W}tc":
+                    cells.append([])
+                continue
+
+            depth -= 1
+            if tag == _MC_FALLBACK:
+                skip -= 1
+            elif skip:
+                pass
+            elif tag == f"{_W}t":
+                if paragraphs:
+                    paragraphs[-1].append(elem.text or "")
+            elif tag in _DOCX_RUN_TEXT:
+                if paragraphs:
+                    paragraphs[-1].append(_DOCX_RUN_TEXT[tag])
+            elif tag == f"{_W}br":
+                if paragraphs and elem.get(f"{_W}type") in (None, "textWrapping"):
+                    paragraphs[-1].append("\n")
+            elif tag == f"{_W}p":
+                text = "".join(paragraphs.pop())
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    # Includes text box paragraphs, which come out as their
+                    # own line just before the paragraph holding them.
+                    yield text
+            elif tag == f"{_W}tc":
+                cell = " ".join(t for t in cells.pop() if t.strip())
+                rows[-1].append(cell)
+            elif tag == f"{_W}tr":
+                row = " | ".join(rows.pop())
+                if cells:
+                    cells[-1].append(row)
+                elif row.strip(" |"):
+                    yield row
+
+            # Drop finished top-level body elements so memory stays flat.
+            if depth == 2:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+
+def _extract_docx_with_python_docx(file_path: str) -> str:
+    from docx import Document
 
-def extract_text_from_docx(file_path: str) -> str:
     doc = Document(file_path)
     return "\n".join([para.text for para in doc.paragraphs])
 
 
+def extract_text_from_docx(file_path: str) -> str:
+    from lxml import etree
+
+    try:
+        return "\n".join(iter_docx_lines(file_path))
+    except (KeyError, zipfile.BadZipFile, etree.LxmlError):
+        # No word/document.xml (or unreadable XML): let python-docx resolve
+        # the main part, or raise its usual error.
+        return _extract_docx_with_python_docx(file_path)
+
+
+def iter_pdf_pages(
+    file_path: str, max_pages: int | None = None
+) -> Iterator[tuple[int, int, str | None, float]]:
+    """Yield `(page_number, page_count, text, seconds)` one page at a time.
+
+    Only the current page is loaded, and the document is closed when the
+    generator finishes or is closed. `text` is None for pages without any
+    fonts (scans, figures), which are skipped without running text extraction.
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(file_path) as doc:
+        total = doc.page_count
+        for number in range(min(total, max_pages or total)):
+            start = time.perf_counter()
+            page = doc.load_page(number)
+            text = page.get_text() if page.get_fonts() else None
+            del page
+            yield number + 1, total, text, time.perf_counter() - start
+
+
+def extract_pdf(
+    file_path: str,
+    max_pages: int | None = None,
+    max_chars: int | None = None,
+) -> tuple[str, dict]:
+    """Extract up to `max_pages` pages / `max_chars` characters of a PDF.
+
+    Returns the text, ending in a truncation marker when a limit was hit,
+    and a dict of page counts and per-page extraction times.
+    """
+    parts = []
+    chars = 0
+    details = {"pages": 0, "image_only_pages": 0, "truncated": False, "page_s": []}
+    with contextlib.closing(iter_pdf_pages(file_path, max_pages)) as pages:
+        for number, total, text, seconds in pages:
+            details["pages"] = total
+            details["page_s"].append(round(seconds, 6))
+            if text is None:
+                details["image_only_pages"] += 1
+                continue
+            if max_chars is not None and chars + len(text) > max_chars:
+                parts.append(text[: max(0, max_chars - chars)])
+                parts.append(
+                    f"{TRUNCATION_MARKER}at {max_chars} characters on page "
+                    f"{number} of {total} ...]"
+                )
+                details["truncated"] = True
+                break
+            parts.append(text)
+            chars += len(text) + 1
+        else:
+            if max_pages is not None and details["pages"] > max_pages:
+                parts.append(
+                    f"{TRUNCATION_MARKER}after page {max_pages} of {details['pages']} ...]"
+                )
+                details["truncated"] = True
+    return "\n".join(parts), details
+
+
 def extract_text_from_pdf(file_path: str) -> str:
-    doc = fitz.open(file_path)
-    return "\n".join([page.get_text() for page in doc])
+    return extract_pdf(file_path, PDF_MAX_PAGES, PDF_MAX_CHARS)[0]
 
 
 def extract_text_from_txt(file_path: str) -> str:
@@ -18,13 +225,138 @@ def extract_text_from_txt(file_path: str) -> str:
         return f.read()
 
 
-def extract_text(file_path: str) -> str:
+def _extractor_for(file_path: str):
     ext = Path(file_path).suffix.lower()
     if ext == ".docx":
-        return extract_text_from_docx(file_path)
+        return extract_text_from_docx
     elif ext == ".pdf":
-        return extract_text_from_pdf(file_path)
+        return extract_text_from_pdf
     elif ext == ".txt":
-        return extract_text_from_txt(file_path)
+        return extract_text_from_txt
     else:
         raise ValueError(f"Unsupported file type: {ext}")
+
+
+def _extract_uncached(file_path: str) -> tuple[str, dict]:
+    # PDFs also report page counts and per-page timings for the extract span.
+    extractor = _extractor_for(file_path)
+    if extractor is extract_text_from_pdf:
+        return extract_pdf(file_path, PDF_MAX_PAGES, PDF_MAX_CHARS)
+    return extractor(file_path), {}
+
+
+def _timed_extract(file_path: str) -> tuple[str, float, dict]:
+    # Timed in the worker so pool runs report per-file extraction time.
+    start = time.perf_counter()
+    text, details = _extract_uncached(file_path)
+    return text, time.perf_counter() - start, details
+
+
+def _uses_cache(file_path: str, cache: ExtractionCache | None) -> bool:
+    # Plain text is as cheap to reread as to fetch from the cache.
+    return cache is not None and Path(file_path).suffix.lower() != ".txt"
+
+
+def extract_text(file_path: str, cache: ExtractionCache | None = None) -> str:
+    _extractor_for(file_path)
+    with metrics.span("extract", file=Path(file_path).name) as span:
+        text = None
+        if _uses_cache(file_path, cache):
+            text = cache.lookup(file_path, variant=EXTRACTION_VARIANT)
+            span["hit"] = text is not None
+        if text is None:
+            text, details = _extract_uncached(file_path)
+            span.update(details)
+            if _uses_cache(file_path, cache):
+                cache.store(file_path, text, variant=EXTRACTION_VARIANT)
+        span["chars"] = len(text)
+    return text
+
+
+def iter_extracted_texts(
+    paths: Iterable[str | Path],
+    workers: int | None = None,
+    cache: ExtractionCache | None = None,
+) -> Iterator[tuple[Path, str | Exception]]:
+    """Extract many files in a process pool, yielding results as they complete.
+
+    Yields `(path, text)` for each extracted file and `(path, exception)` for
+    files that could not be read, in completion order. Cache hits are yielded
+    first without touching the pool. `workers` defaults to the CPU count; with
+    one worker (or one file left to extract) everything runs in-process.
+    """
+    pending = []
+    for path in map(Path, paths):
+        start = time.perf_counter()
+        try:
+            _extractor_for(str(path))
+            text = (
+                cache.lookup(path, variant=EXTRACTION_VARIANT)
+                if _uses_cache(str(path), cache)
+                else None
+            )
+        except Exception as exc:
+            yield path, exc
+            continue
+        if text is None:
+            pending.append(path)
+        else:
+            metrics.record(
+                "extract",
+                time.perf_counter() - start,
+                file=path.name,
+                hit=True,
+                chars=len(text),
+            )
+            yield path, text
+
+    def finished(
+        path: Path, text: str, seconds: float, details: dict
+    ) -> tuple[Path, str]:
+        metrics.record(
+            "extract", seconds, file=path.name, hit=False, chars=len(text), **details
+        )
+        if _uses_cache(str(path), cache):
+            cache.store(path, text, variant=EXTRACTION_VARIANT)
+        return path, text
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        for path in pending:
+            try:
+                text, seconds, details = _timed_extract(str(path))
+            except Exception as exc:
+                yield path, exc
+                continue
+            yield finished(path, text, seconds, details)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(_timed_extract, str(path)): path for path in pending}
+        not_done = set(futures)
+        while not_done:
+            done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = futures[future]
+                try:
+                    text, seconds, details = future.result()
+                except Exception as exc:
+                    yield path, exc
+                    continue
+                yield finished(path, text, seconds, details)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def collect_input_files(path: Path) -> list[Path]:
+    """Return the supported submission files at `path`, sorted by name."""
+    if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS:
+        return [path]
+    if path.is_dir():
+        return sorted(
+            list(path.glob("*.docx"))
+            + list(path.glob("*.pdf"))
+            + list(path.glob("*.txt"))
+        )
+    return []
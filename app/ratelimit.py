@@ -0,0 +1,224 @@
+"""
+ratelimit.py
+
+Retry and adaptive concurrency control for model calls. Retries honour the
+server's Retry-After / rate-limit reset headers and otherwise back off
+exponentially with jitter; an AIMD limiter shrinks the number of in-flight
+requests when the API pushes back and grows it again while calls succeed.
+
+openai and tenacity are imported inside the functions that need them so that
+importing this module stays cheap.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = 6
+MAX_BACKOFF_SECONDS = 60
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Fraction of the org's request/token budget left at which the limiter stops growing.
+HEADROOM_FRACTION = 0.05
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> float | None:
+    """Parse OpenAI reset durations such as `"20ms"`, `"1s"` or `"6m0s"`."""
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers) -> float | None:
+    """How long the server asked us to wait, from response headers."""
+    if headers is None:
+        return None
+    if value := headers.get("retry-after-ms"):
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    if value := headers.get("retry-after"):
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    # Without Retry-After, wait for whichever exhausted budget resets.
+    waits = []
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}", ""))
+            if reset is not None:
+                waits.append(reset)
+    return max(waits) if waits else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    import openai
+
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    import openai
+
+    return isinstance(exc, openai.APIStatusError) and exc.status_code == 429
+
+
+class wait_retry_after:
+    """Tenacity wait strategy: as long as the server asked, else full-jitter
+    exponential backoff (0.5s, 1s, 2s, ... capped at `max_wait`)."""
+
+    def __init__(self, max_wait: float = MAX_BACKOFF_SECONDS, multiplier: float = 0.5):
+        self.max_wait = max_wait
+        self.multiplier = multiplier
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        response = getattr(exc, "response", None)
+        requested = retry_after_seconds(getattr(response, "headers", None))
+        if requested is not None:
+            # A little jitter keeps parallel requests from retrying in lockstep.
+            return min(self.max_wait, requested + random.uniform(0, 0.25))
+        ceiling = self.multiplier * 2 ** (retry_state.attempt_number - 1)
+        return random.uniform(0, min(self.max_wait, ceiling))
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent model requests, used as an async context manager.
+
+    Each success adds `1 / limit` (about one extra slot per round of requests)
+    unless the rate-limit headers show the org is nearly out of requests or
+    tokens; each 429 multiplies the limit by `decrease_factor`. Decreases are
+    applied at most once per `cooldown` seconds so a burst of 429s from the
+    same round only halves the limit once.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int | None = None,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        self.minimum = minimum
+        self.maximum = max(maximum or initial, initial)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._limit = float(max(minimum, initial))
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._condition: asyncio.Condition | None = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, headers=None) -> None:
+        if headers is not None and self._near_budget(headers):
+            return
+        self._limit = min(self.maximum, self._limit + 1 / self._limit)
+
+    def on_rate_limited(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.minimum, self._limit * self.decrease_factor)
+
+    @staticmethod
+    def _near_budget(headers) -> bool:
+        for kind in ("requests", "tokens"):
+            try:
+                remaining = float(headers.get(f"x-ratelimit-remaining-{kind}"))
+                limit = float(headers.get(f"x-ratelimit-limit-{kind}"))
+            except (TypeError, ValueError):
+                continue
+            if limit and remaining / limit < HEADROOM_FRACTION:
+                return True
+        return False
+
+
+def call_with_retry(fn: Callable[[], T], max_attempts: int = MAX_ATTEMPTS) -> T:
+    from tenacity import Retrying, retry_if_exception, stop_after_attempt
+
+    for attempt in Retrying(
+        retry=retry_if_exception(is_retryable),
+        wait=wait_retry_after(),
+        stop=stop_after_attempt(max_attempts),
+        reraise=True,
+    ):
+        with attempt:
+            return fn()
+
+
+async def call_with_retry_async(
+    fn: Callable[[], Awaitable[T]],
+    limiter: AdaptiveLimiter | None = None,
+    max_attempts: int = MAX_ATTEMPTS,
+) -> T:
+    """Await `fn()` with retries, each attempt holding a slot of `limiter`.
+
+    The slot is released while backing off, and every outcome is reported to
+    the limiter. `fn` should return a raw response exposing `.headers` so
+    successful calls can feed the remaining-budget headers to the limiter.
+    """
+    from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt
+
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception(is_retryable),
+        wait=wait_retry_after(),
+        stop=stop_after_attempt(max_attempts),
+        reraise=True,
+    ):
+        with attempt:
+            try:
+                if limiter is None:
+                    result = await fn()
+                else:
+                    async with limiter:
+                        result = await fn()
+            except Exception as exc:
+                if limiter is not None and is_rate_limited(exc):
+                    limiter.on_rate_limited()
+                raise
+            if limiter is not None:
+                limiter.on_success(getattr(result, "headers", None))
+            return result
@@ -0,0 +1,251 @@
+"""
+rubric.py
+
+Declarative rubrics for rule-based grading of JSON submissions. A rubric is a
+YAML file listing checks with their point weights (see app/rubrics/); it is
+compiled once into a pipeline of validators with precompiled regexes and
+frozen key sets, which then grades each submission in a single pass.
+
+Check types:
+    filename  `rules`: regexes the file stem must match, in order; the first
+              miss costs the points and reports its `message`.
+    json      Parse the file. Failing ends grading for that file.
+    keys      `required` keys; `allow_extra` (default false) permits others.
+    values    `keys` that must be non-empty. `partial: {max_empty, points}`
+              gives partial credit when only a few are empty.
+    field     One `key` checked for `type` (string, integer, number, boolean,
+              list, object) and/or a `pattern` the whole value must match.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import orjson
+import yaml
+
+RUBRICS_DIR = Path(__file__).parent / "rubrics"
+DEFAULT_RUBRIC = RUBRICS_DIR / "discord_github.yaml"
+
+JSON_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "list": (list,),
+    "object": (dict,),
+}
+
+
+def load_json(file_path: Path):
+    """
+    Parse a submission with orjson, falling back to the json module on failure.
+
+    The fallback reads the file the way `open(..., encoding="utf-8")` would
+    (universal newlines), so anything orjson rejects is accepted or reported
+    exactly as `json.load` would.
+    """
+    raw = Path(file_path).read_bytes()
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        text = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        return json.loads(text)
+
+
+def _is_empty(value) -> bool:
+    return not value or (isinstance(value, str) and not value.strip())
+
+
+class Submission:
+    """What the checks see: the file, and its parsed JSON once loaded."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = None
+
+    @property
+    def fields(self) -> dict:
+        return self.data if isinstance(self.data, dict) else {}
+
+
+class Check:
+    """One rubric line: `grade()` returns (points earned, feedback or None)."""
+
+    stops_on_failure = False
+
+    def __init__(self, spec: dict):
+        self.label = spec.get("label")
+        self.points = spec.get("points", 1)
+
+    def grade(self, submission: Submission) -> tuple[int, str | None]:
+        raise NotImplementedError
+
+    def feedback(self, message: str) -> str:
+        return f"{self.label}: {message}" if self.label else message
+
+
+class FilenameCheck(Check):
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.rules = [
+            (re.compile(rule["pattern"]), rule["message"]) for rule in spec["rules"]
+        ]
+
+    def grade(self, submission):
+        stem = submission.path.stem
+        for pattern, message in self.rules:
+            if not pattern.search(stem):
+                return 0, self.feedback(message)
+        return self.points, None
+
+
+class JsonCheck(Check):
+    stops_on_failure = True
+
+    def grade(self, submission):
+        try:
+            submission.data = load_json(submission.path)
+        except json.JSONDecodeError as e:
+            return 0, self.feedback(f"Invalid JSON: {str(e)}")
+        except Exception as e:
+            return 0, self.feedback(f"Error reading file: {str(e)}")
+        return self.points, None
+
+
+class KeysCheck(Check):
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.required = frozenset(spec["required"])
+        self.allow_extra = spec.get("allow_extra", False)
+
+    def grade(self, submission):
+        actual = submission.fields.keys()
+        missing = self.required - actual
+        extra = set() if self.allow_extra else actual - self.required
+        if not missing and not extra:
+            return self.points, None
+
+        parts = []
+        if missing:
+            parts.append(f"Missing keys: {', '.join(sorted(missing))}")
+        if extra:
+            parts.append(f"Extra keys: {', '.join(sorted(extra))}")
+        return 0, self.feedback("; ".join(parts))
+
+
+class ValuesCheck(Check):
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.keys = tuple(spec["keys"])
+        partial = spec.get("partial") or {}
+        self.partial_max_empty = partial.get("max_empty", 0)
+        self.partial_points = partial.get("points", 0)
+
+    def grade(self, submission):
+        fields = submission.fields
+        empty = [key for key in self.keys if _is_empty(fields.get(key, ""))]
+        if not empty:
+            return self.points, None
+        points = self.partial_points if len(empty) <= self.partial_max_empty else 0
+        return points, self.feedback(f"Empty or missing values: {', '.join(empty)}")
+
+
+class FieldCheck(Check):
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.key = spec["key"]
+        self.type_name = spec.get("type")
+        if self.type_name is not None and self.type_name not in JSON_TYPES:
+            raise ValueError(f"Unknown field type {self.type_name!r} for {self.key}")
+        self.types = JSON_TYPES.get(self.type_name)
+        self.pattern = re.compile(spec["pattern"]) if "pattern" in spec else None
+        self.message = spec.get("message")
+
+    def grade(self, submission):
+        fields = submission.fields
+        if self.key not in fields:
+            return 0, self.feedback(f"{self.key} is missing")
+        value = fields[self.key]
+        if self.types and (
+            not isinstance(value, self.types)
+            or (isinstance(value, bool) and bool not in self.types)
+        ):
+            return 0, self.feedback(
+                self.message or f"{self.key} should be of type {self.type_name}"
+            )
+        if self.pattern and not self.pattern.fullmatch(str(value)):
+            return 0, self.feedback(
+                self.message or f"{self.key} does not match the expected format"
+            )
+        return self.points, None
+
+
+CHECK_TYPES = {
+    "filename": FilenameCheck,
+    "json": JsonCheck,
+    "keys": KeysCheck,
+    "values": ValuesCheck,
+    "field": FieldCheck,
+}
+
+
+class Rubric:
+    """A compiled rubric: grades one submission file into a CSV-ready row."""
+
+    def __init__(self, spec: dict):
+        self.name = spec.get("name", "rubric")
+        self.columns = list(spec.get("columns", []))
+        self.unique = list(spec.get("unique", []))
+        # Shared IDs are read from the graded row, which only has `columns`.
+        unknown = [field for field in self.unique if field not in self.columns]
+        if unknown:
+            raise ValueError(
+                f"Rubric {self.name} lists unique fields that are not columns: "
+                f"{', '.join(unknown)}"
+            )
+        self.checks = []
+        for check_spec in spec["checks"]:
+            check_type = check_spec.get("check")
+            if check_type not in CHECK_TYPES:
+                raise ValueError(f"Unknown rubric check {check_type!r} in {self.name}")
+            self.checks.append(CHECK_TYPES[check_type](check_spec))
+        self.max_points = sum(check.points for check in self.checks)
+        self.fieldnames = ["filename", *self.columns, "score", "feedback"]
+
+    def grade(self, file_path: Path) -> dict:
+        file_path = Path(file_path)
+        submission = Submission(file_path)
+        result = {"filename": file_path.name, **dict.fromkeys(self.columns, "")}
+        points = 0
+        feedback = []
+
+        for check in self.checks:
+            earned, message = check.grade(submission)
+            points += earned
+            if message:
+                feedback.append(message)
+                if check.stops_on_failure:
+                    break
+        else:
+            if isinstance(submission.data, dict):
+                for column in self.columns:
+                    result[column] = str(submission.data.get(column, "")).strip()
+
+        result["score"] = points
+        result["feedback"] = "; ".join(feedback) if feedback else "Perfect!"
+        return result
+
+
+def compile_rubric(spec: dict) -> Rubric:
+    return Rubric(spec)
+
+
+@lru_cache(maxsize=None)
+def load_rubric(path: str | Path = DEFAULT_RUBRIC) -> Rubric:
+    """Read and compile a YAML rubric (cached per path)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return compile_rubric(yaml.safe_load(f))
@@ -0,0 +1,204 @@
+"""
+sections.py
+
+Local, deterministic segmentation of retrospective submissions, to send the
+model only what the rubric grades. Headings ("3. Things that went well", "What
+didn't go well –", "Teammate ratings:") split a submission into the sections
+the retrospective prompts ask for; "Name – 4 stars" lines are filed as
+ratings, even without a heading. A line only counts as a heading when it is
+numbered, ends with ":", or holds nothing but the heading phrase, so sentences
+such as "I would rate Bo a 2" stay content. Headings are kept as each
+section's label. The opening name/date/team lines are kept as the header.
+Instruction lines pasted from the assignment are dropped, and so are sections
+the prompt does not grade (professor feedback, for prompts that do not ask for
+it). Text under no recognised heading is kept.
+
+Segmentation is only trusted when enough distinct sections are found;
+otherwise the full text is sent unchanged.
+"""
+
+from __future__ import annotations
+
+import re
+
+# Label -> (heading pattern, phrase showing the prompt grades this section).
+# Checked in order: "did not go well" must win over "went well".
+SECTIONS = {
+    "overall_thoughts": (
+        r"overall thoughts|how (?:your|our|the) team executed|\boverall\b",
+        "overall thoughts",
+    ),
+    "personal_contributions": (
+        r"personal contributions?|\bmy (?:own )?contributions?",
+        "personal contributions",
+    ),
+    "could_be_improved": (
+        r"did ?n[o']t go well|not go well|could (?:be|have been) improved|"
+        r"\bimprovements?\b|went wrong|\bto improve\b",
+        "improve",
+    ),
+    "went_well": (r"went well|\bgo well\b|\bpositives\b", "went well"),
+    "professor_feedback": (
+        r"professor|instructor|course feedback|class better",
+        "professor",
+    ),
+    "teammate_ratings": (r"\bratings?\b|\bstars?\b|\brate\b", "rating"),
+}
+SECTION_TITLES = {
+    "header": "Header",
+    "other": "Other",
+    "overall_thoughts": "Overall thoughts",
+    "personal_contributions": "Personal contributions",
+    "could_be_improved": "Things that could be improved",
+    "went_well": "Things that went well",
+    "professor_feedback": "Professor feedback",
+    "teammate_ratings": "Teammate ratings",
+}
+HEADING_PATTERNS = {
+    label: re.compile(pattern, re.IGNORECASE)
+    for label, (pattern, _) in SECTIONS.items()
+}
+NUMBERED = re.compile(r"^\s*(?:\d{1,2}|[a-g])[.)]\s+", re.IGNORECASE)
+MARKER = re.compile(r"^\s*(?:(?:\d{1,2}|[a-g])[.)]|[-•*▪◦])\s*", re.IGNORECASE)
+HEADING_END = re.compile(r"[\s:\-–—.…]+$")
+# Words a bare heading may have around its phrase ("Things that went well").
+HEADING_FILLER = {
+    "things", "thing", "that", "what", "which", "the", "my", "our", "team",
+    "teammate", "teammates", "peer", "peers", "areas", "for", "of", "on", "and",
+    "feedback", "section", "sprint",
+}
+RATING_LINE = re.compile(
+    # Not followed by "/": "3/5/24" is a date.
+    r"\b[0-5](?:\.\d)?\s*(?:/\s*5|out of (?:5|five)|stars?)\b(?!/)|[★⭐]",
+    re.IGNORECASE,
+)
+WORD = re.compile(r"[a-z0-9']+")
+
+MAX_HEADING_CHARS = 120
+MAX_HEADER_LINES = 5
+MAX_HEADER_LINE_CHARS = 60
+# "Name – 4 stars, ..." lines; a long paragraph mentioning stars is not one.
+MAX_RATING_LINE_CHARS = 160
+# Instruction lines shorter than this are too generic to match on.
+MIN_BOILERPLATE_WORDS = 5
+# Fewer distinct sections than this and the full text is sent instead.
+MIN_SECTIONS = 3
+
+
+def _words(text: str) -> str:
+    return " ".join(WORD.findall(text.lower()))
+
+
+def _bare_heading(line: str, match: re.Match) -> bool:
+    # Nothing but the heading phrase, a list marker and filler words.
+    rest = HEADING_END.sub("", MARKER.sub("", line[: match.start()]))
+    rest += " " + HEADING_END.sub("", line[match.end() :])
+    return set(WORD.findall(rest.lower())) <= HEADING_FILLER
+
+
+def heading_label(line: str) -> str | None:
+    """The section a heading line opens, or None if it is not a heading."""
+    stripped = line.strip()
+    if not stripped or len(stripped) > MAX_HEADING_CHARS:
+        return None
+    if RATING_LINE.search(stripped) and not stripped.endswith(":"):
+        # "Ben – 5 stars" is a rating, not the ratings heading.
+        return None
+    for label, pattern in HEADING_PATTERNS.items():
+        match = pattern.search(stripped)
+        if match is None:
+            continue
+        if (
+            NUMBERED.match(stripped)
+            or stripped.endswith(":")
+            or _bare_heading(stripped, match)
+        ):
+            return label
+        return None
+    return None
+
+
+def segment(
+    text: str, instructions: str = ""
+) -> list[tuple[str, str | None, str]]:
+    """Split a submission into `(label, heading, text)` sections, in document order.
+
+    Labels are "header", "other" (text under no recognised heading) or a key
+    of SECTIONS; `heading` is the line that opened the section, or None.
+    Lines copied from `instructions` (the assignment text in the prompt) are
+    dropped.
+    """
+    boilerplate = _words(instructions)
+    sections: list[tuple[str, str | None, list[str]]] = []
+    # The header is the run of short lines at the top.
+    label = "header"
+    header_lines = 0
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        heading = heading_label(stripped)
+        if heading is not None:
+            label = heading
+            sections.append((label, stripped, []))
+            continue
+        if label == "header":
+            header_lines += 1
+            if (
+                header_lines > MAX_HEADER_LINES
+                or len(stripped) > MAX_HEADER_LINE_CHARS
+            ):
+                label = "other"
+        words = _words(stripped)
+        if (
+            boilerplate
+            and len(words.split()) >= MIN_BOILERPLATE_WORDS
+            and words in boilerplate
+        ):
+            continue
+        # A rating line outside a ratings section is filed as a rating on its
+        # own; the lines after it stay in the section it appeared in.
+        line_label = label
+        if len(stripped) <= MAX_RATING_LINE_CHARS and RATING_LINE.search(stripped):
+            line_label = "teammate_ratings"
+        if not sections or sections[-1][0] != line_label:
+            sections.append((line_label, None, []))
+        sections[-1][2].append(stripped)
+    return [(label, heading, "\n".join(lines)) for label, heading, lines in sections]
+
+
+def graded_sections(prompt_source: str) -> set[str]:
+    """Sections the prompt's rubric mentions (empty for non-retrospective prompts)."""
+    prompt = prompt_source.lower()
+    return {label for label, (_, phrase) in SECTIONS.items() if phrase in prompt}
+
+
+def condense(text: str, prompt_source: str) -> tuple[str, dict]:
+    """The parts of `text` worth grading with this prompt, under section labels.
+
+    Returns the text to send and a summary dict (`confident`, `sections`
+    found, `chars_before`, `chars_after`). When the prompt grades no known
+    sections or fewer than MIN_SECTIONS are found, the text is returned
+    unchanged with `confident` False.
+    """
+    graded = graded_sections(prompt_source)
+    instructions = prompt_source.split("{text}")[0]
+    sections = segment(text, instructions) if graded else []
+    found = {label for label, _, _ in sections} & set(SECTIONS)
+    summary = {
+        "confident": len(found) >= MIN_SECTIONS,
+        "sections": sorted(found),
+        "chars_before": len(text),
+        "chars_after": len(text),
+    }
+    if not summary["confident"]:
+        return text, summary
+
+    kept = [
+        f"## {heading or SECTION_TITLES[label]}\n{body}".rstrip()
+        for label, heading, body in sections
+        if label in graded or label in ("header", "other")
+    ]
+    condensed = "\n\n".join(kept)
+    summary["chars_after"] = len(condensed)
+    return condensed, summary
@@ -0,0 +1,310 @@
+"""
+structured.py
+
+Getting a usable JSON object out of every grading response.
+
+Requests ask for JSON output (`response_format`), either plain JSON mode or a
+JSON schema derived from the keys and types the prompt asks for. Responses are
+parsed leniently: Markdown fences and prose around the object are dropped,
+trailing commas removed and truncated objects cut back to their last complete
+member, so near-misses do not cost another request. The result is then checked
+against the same schema with pydantic. Only when that fails does the grader
+re-ask, quoting the problem back to the model.
+
+pydantic is imported on first use.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from typing import Any
+
+RESPONSE_FORMATS = ("json_object", "json_schema", "none")
+
+# `"key": value` lines of a JSON example in the prompt, or `- key (type ...)`
+# bullets; the same declarations app.output.expected_output_fields reads.
+JSON_TEMPLATE_FIELD = re.compile(
+    r'^\s*"([A-Za-z_][A-Za-z0-9_]*)"\s*:\s*(.*?),?\s*$', re.MULTILINE
+)
+BULLET_FIELD = re.compile(r"^\s*-\s*([a-z_][a-z0-9_]*)\s*\(([^)]*)", re.MULTILINE)
+BULLET_TYPES = [
+    ("int", int),
+    ("float", float),
+    ("number", float),
+    ("bool", bool),
+    ("list", list),
+    ("array", list),
+    ("object", dict),
+    ("dict", dict),
+    ("str", str),
+]
+REASK_INSTRUCTION = (
+    "Your previous reply could not be used: {problem}. Reply with only the "
+    "corrected JSON object, with every key the instructions ask for."
+)
+
+
+class ResponseError(ValueError):
+    """A model response that is not a usable grading object.
+
+    `kind` is "unparseable", "missing_keys" or "invalid_types"; `problem` is a
+    one-line description suitable for quoting back to the model.
+    """
+
+    def __init__(self, message: str, kind: str, problem: str):
+        super().__init__(message)
+        self.kind = kind
+        self.problem = problem
+
+
+def _skip_string(text: str, start: int) -> int | None:
+    # Index just past the string literal opening at `start` (None if unclosed).
+    index = start + 1
+    while index < len(text):
+        if text[index] == "\\":
+            index += 2
+        elif text[index] == '"':
+            return index + 1
+        else:
+            index += 1
+    return None
+
+
+def _strip_trailing_commas(text: str) -> str:
+    out = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '"':
+            end = _skip_string(text, index)
+            if end is None:
+                out.append(text[index:])
+                break
+            out.append(text[index:end])
+            index = end
+            continue
+        if char == ",":
+            rest = text[index + 1 :].lstrip()
+            if not rest or rest[0] in "}]":
+                index += 1
+                continue
+        out.append(char)
+        index += 1
+    return "".join(out)
+
+
+def _scan(
+    text: str, max_cut_depth: int = 1
+) -> tuple[int | None, list[str], list[int], bool]:
+    """Where the first top-level value ends, plus the state if it never does.
+
+    Returns `(end, open_brackets, cut_points, in_string)`. `end` is None for
+    a truncated value; `cut_points` are the commas after complete members,
+    nested at most `max_cut_depth` deep.
+    """
+    stack: list[str] = []
+    cuts: list[int] = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '"':
+            end = _skip_string(text, index)
+            if end is None:
+                return None, stack, cuts, True
+            index = end
+            continue
+        if char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return index + 1, stack, cuts, False
+        elif char == "," and len(stack) <= max_cut_depth:
+            cuts.append(index)
+        index += 1
+    return None, stack, cuts, False
+
+
+def _close(prefix: str) -> str:
+    _, stack, _, in_string = _scan(prefix)
+    return prefix + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def _ends_complete(prefix: str, max_cut_depth: int) -> bool:
+    # A cut-off value can be closed as it is only when its last member is
+    # whole: a closed string, object or array, not a number that may have
+    # lost digits.
+    _, stack, _, in_string = _scan(prefix, max_cut_depth)
+    return (
+        not in_string
+        and len(stack) <= max_cut_depth
+        and prefix.rstrip().endswith(('"', "}", "]", "true", "false", "null"))
+    )
+
+
+def repair_json(content: str, max_cut_depth: int = 1) -> tuple[Any, bool]:
+    """Parse a model response, fixing common near-JSON; returns `(value, repaired)`.
+
+    Handles ```json fences and prose around the object, trailing commas, and
+    objects cut off mid-way. Those are cut back to their last complete member
+    (at most `max_cut_depth` levels deep; 2 keeps the whole entries of a
+    truncated `{"grades": [...]}`), so a half-written value is dropped, not
+    used. Raises ResponseError("unparseable") when none of that yields JSON.
+    """
+    stripped = content.strip()
+    try:
+        return json.loads(stripped), False
+    except json.JSONDecodeError as e:
+        error = e
+
+    start = min(
+        (i for i in (stripped.find("{"), stripped.find("[")) if i != -1), default=-1
+    )
+    if start != -1:
+        candidate = _strip_trailing_commas(stripped[start:])
+        end, _, cuts, _ = _scan(candidate, max_cut_depth)
+        if end is not None:
+            attempts = [candidate[:end]]
+        else:
+            # Cut off: close it as it is if the last member is whole, else at
+            # each earlier member boundary.
+            attempts = []
+            if _ends_complete(candidate, max_cut_depth):
+                attempts.append(_close(candidate))
+            attempts += [_close(candidate[:cut]) for cut in reversed(cuts)]
+        for attempt in attempts:
+            try:
+                return json.loads(_strip_trailing_commas(attempt)), True
+            except json.JSONDecodeError:
+                continue
+
+    raise ResponseError(
+        f"Model response could not be parsed as JSON:\n{error}\nRaw content:\n{content}",
+        kind="unparseable",
+        problem="it was not valid JSON",
+    )
+
+
+def _literal_type(value: str) -> type | None:
+    if value.startswith('"'):
+        return str
+    if value.startswith("["):
+        return list
+    if value.startswith("{"):
+        return dict
+    if value in ("true", "false"):
+        return bool
+    if re.fullmatch(r"-?\d+", value):
+        return int
+    if re.fullmatch(r"-?\d+\.\d*(?:[eE][-+]?\d+)?", value):
+        return float
+    return None
+
+
+def _bullet_type(description: str) -> type | None:
+    words = description.strip().lower()
+    for prefix, python_type in BULLET_TYPES:
+        if words.startswith(prefix):
+            return python_type
+    return None
+
+
+def output_schema(prompt_source: str) -> dict[str, type | None]:
+    """Keys the prompt asks for, with their type where the prompt says (else None).
+
+    A JSON example object takes precedence over `- key (type)` bullet lists,
+    as in app.output.expected_output_fields.
+    """
+    fields = {
+        key: _literal_type(value.strip())
+        for key, value in JSON_TEMPLATE_FIELD.findall(prompt_source)
+    }
+    if not fields:
+        fields = {
+            key: _bullet_type(description)
+            for key, description in BULLET_FIELD.findall(prompt_source)
+        }
+    return fields
+
+
+@lru_cache(maxsize=32)
+def response_model(prompt_source: str):
+    """A pydantic model for the prompt's output; extra keys are allowed.
+
+    Every declared key is required. Values may be null, and types are
+    checked in pydantic's lax mode, so "5" is still a valid integer score.
+    """
+    from pydantic import ConfigDict, create_model
+
+    fields = {
+        key: ((python_type | None) if python_type else Any, ...)
+        for key, python_type in output_schema(prompt_source).items()
+    }
+    return create_model("Grade", __config__=ConfigDict(extra="allow"), **fields)
+
+
+def response_format(prompt_source: str, mode: str) -> dict | None:
+    """The `response_format` request parameter for `mode` (see RESPONSE_FORMATS)."""
+    if mode == "none":
+        return None
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "grade",
+                "schema": response_model(prompt_source).model_json_schema(),
+            },
+        }
+    if mode == "json_object":
+        return {"type": "json_object"}
+    raise ValueError(
+        f"Unknown response format {mode!r}; expected one of: "
+        f"{', '.join(RESPONSE_FORMATS)}"
+    )
+
+
+def validate_result(result: Any, prompt_source: str) -> None:
+    """Raise ResponseError unless `result` is an object with the prompt's keys."""
+    from pydantic import ValidationError
+
+    if not isinstance(result, dict):
+        raise ResponseError(
+            f"Model response is a JSON {type(result).__name__}, not an object:\n{result}",
+            kind="unparseable",
+            problem="it was not a single JSON object",
+        )
+    try:
+        response_model(prompt_source).model_validate(result)
+    except ValidationError as e:
+        missing = [
+            str(error["loc"][0]) for error in e.errors() if error["type"] == "missing"
+        ]
+        if missing:
+            raise ResponseError(
+                f"Model response is missing keys: {', '.join(missing)}",
+                kind="missing_keys",
+                problem=f"it was missing the keys {', '.join(missing)}",
+            ) from e
+        invalid = ", ".join(
+            f"{error['loc'][0]} ({error['msg'].lower()})" for error in e.errors()
+        )
+        raise ResponseError(
+            f"Model response has invalid values: {invalid}",
+            kind="invalid_types",
+            problem=f"these values had the wrong type: {invalid}",
+        ) from e
+
+
+def reask_request(body: dict, content: str, error: ResponseError) -> dict:
+    """Follow-up request quoting the unusable reply and what was wrong with it."""
+    return {
+        **body,
+        "messages": [
+            *body["messages"],
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": REASK_INSTRUCTION.format(problem=error.problem)},
+        ],
+    }
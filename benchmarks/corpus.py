@@ -0,0 +1,211 @@
+"""
+corpus.py
+
+Synthetic retrospective corpus for benchmarks. Submissions follow the sprint
+retrospective layout (header, overall thoughts, contributions, went well,
+improvements, professor feedback, teammate ratings) and mix in the phrasing
+the feedback analyzer looks for, so every stage has realistic work to do.
+
+Generation is seeded: the same counts, sizes and seed always produce the same
+text, so timings are comparable between runs and machines.
+
+Usage:
+    python -m benchmarks.corpus results/benchmarks/corpus --docx 20 --pdf 10 --txt 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+# Approximate words per submission for each size class.
+SIZES = {"small": 250, "medium": 1200, "large": 6000}
+
+FIRST_NAMES = ["Ana", "Ben", "Chloe", "Dev", "Eli", "Fatima", "Gus", "Hana", "Ivan"]
+LAST_NAMES = ["Ortiz", "Patel", "Nguyen", "Smith", "Kowalski", "Haddad", "Li", "Moreau"]
+
+SECTIONS = [
+    "Overall thoughts",
+    "Personal contributions",
+    "Things that went well",
+    "Things that could be improved",
+    "Feedback for the professor",
+]
+
+FILLER = (
+    "we split the backlog into tickets and reviewed each pull request before "
+    "merging so the main branch stayed green while the sprint moved along and "
+    "the standups kept everyone honest about blockers and progress"
+).split()
+
+FEEDBACK_LINES = [
+    "I liked that the project felt like real-world work for my resume",
+    "I enjoyed the practical side of setting up CI and tests",
+    "The code reviews were valuable and helpful for the whole team",
+    "I wish the demo checklist had been published earlier in the sprint",
+    "The deadline landed right before finals and felt rushed",
+    "The workload was overwhelming with too many features per ticket",
+    "We needed more guidance on the api key and environment setup",
+    "Expectations for grading were unclear until the demo",
+    "Vibe coding left technical debt that was messy to refactor",
+    "Sprints should be longer so the scope fits the time",
+]
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    picked = [rng.choice(FILLER) for _ in range(words)]
+    return " ".join(picked).capitalize() + "."
+
+
+def submission_text(index: int, size: str, seed: int = 0) -> str:
+    """Deterministic retrospective text of roughly `SIZES[size]` words."""
+    rng = random.Random(f"{seed}-{index}-{size}")
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    teammates = rng.sample([n for n in FIRST_NAMES if n not in name], 3)
+    budget = SIZES[size]
+    per_section = max(20, budget // len(SECTIONS))
+
+    lines = [
+        f"Name: {name}",
+        f"Date: 2026-0{1 + index % 9}-1{index % 10}",
+        f"Team: {rng.randint(1, 30)}",
+        f"Sprint: {1 + index % 4}",
+        "",
+    ]
+    for number, heading in enumerate(SECTIONS, start=1):
+        lines.extend([f"{number}. {heading}", ""])
+        written = 0
+        while written < per_section:
+            words = min(per_section - written, rng.randint(25, 60))
+            lines.append(_paragraph(rng, words))
+            written += words
+        if heading.startswith(("Things that", "Feedback")):
+            lines.extend(rng.sample(FEEDBACK_LINES, 3))
+        lines.append("")
+    lines.append(f"{len(SECTIONS) + 1}. Teammate ratings")
+    for teammate in teammates:
+        lines.append(
+            f"{teammate}: {rng.randint(1, 5)} stars - showed up and delivered tickets"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _write_docx(path: Path, text: str) -> None:
+    from docx import Document
+
+    document = Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    document.save(path)
+
+
+def _write_pdf(path: Path, text: str) -> None:
+    import fitz
+
+    document = fitz.open()
+    lines = text.splitlines()
+    per_page = 50
+    for start in range(0, len(lines), per_page):
+        page = document.new_page()
+        page.insert_textbox(
+            page.rect + (50, 50, -50, -50),
+            "\n".join(lines[start : start + per_page]),
+            fontsize=9,
+        )
+    document.save(path)
+    document.close()
+
+
+WRITERS = {
+    ".txt": lambda path, text: path.write_text(text, encoding="utf-8"),
+    ".docx": _write_docx,
+    ".pdf": _write_pdf,
+}
+
+
+def generate_corpus(
+    out_dir: str | Path,
+    docx: int = 10,
+    pdf: int = 10,
+    txt: int = 10,
+    sizes: tuple[str, ...] = ("small", "medium", "large"),
+    seed: int = 0,
+) -> dict:
+    """Write a synthetic corpus to `out_dir` and return its manifest.
+
+    Sizes rotate through `sizes` within each file type. The manifest (also
+    saved as `manifest.json`) records the parameters, so an existing corpus
+    generated with the same ones is reused instead of rewritten.
+    """
+    out_dir = Path(out_dir)
+    params = {
+        "docx": docx,
+        "pdf": pdf,
+        "txt": txt,
+        "sizes": list(sizes),
+        "seed": seed,
+    }
+    manifest_path = out_dir / "manifest.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest["params"] == params and all(
+            (out_dir / f["filename"]).exists() for f in manifest["files"]
+        ):
+            return manifest
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for stale in out_dir.iterdir():
+        if stale.suffix in WRITERS:
+            stale.unlink()
+
+    files = []
+    index = 0
+    for suffix, count in ((".docx", docx), (".pdf", pdf), (".txt", txt)):
+        for n in range(count):
+            size = sizes[n % len(sizes)]
+            text = submission_text(index, size, seed)
+            path = out_dir / f"student-{index:04d}-{size}{suffix}"
+            WRITERS[suffix](path, text)
+            files.append(
+                {
+                    "filename": path.name,
+                    "size": size,
+                    "chars": len(text),
+                    "bytes": path.stat().st_size,
+                }
+            )
+            index += 1
+
+    manifest = {"params": params, "files": files}
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic retrospective corpus for benchmarks."
+    )
+    parser.add_argument("out_dir")
+    parser.add_argument("--docx", type=int, default=10)
+    parser.add_argument("--pdf", type=int, default=10)
+    parser.add_argument("--txt", type=int, default=10)
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        choices=list(SIZES),
+        default=list(SIZES),
+        help="Size classes to rotate through (default: all).",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = generate_corpus(
+        args.out_dir, args.docx, args.pdf, args.txt, tuple(args.sizes), args.seed
+    )
+    print(f"{len(manifest['files'])} files in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
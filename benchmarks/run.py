@@ -0,0 +1,403 @@
+"""
+run.py
+
+Benchmark suite for the grading pipeline. Generates (or reuses) a synthetic
+corpus, times each stage, writes the results as JSON and compares them with a
+saved baseline, exiting non-zero when a stage got slower than the threshold.
+
+Stages:
+    extract_text              per-file extraction (latency percentiles too)
+    analyze_professor_feedback  folder-wide feedback analysis, no cache
+    build_instructor_brief    Markdown brief from that analysis
+    write_results             app.output.ResultStreamWriter streaming rows to
+                              CSV, JSON Lines and a JSON array, as --save --json
+    grade_end_to_end          main.grade_files_concurrently against the
+                              in-process fake backend with fixed latency
+
+Usage:
+    python -m benchmarks.run                       # run and compare
+    python -m benchmarks.run --save-baseline       # run and record as baseline
+    python -m benchmarks.run --docx 40 --pdf 40 --txt 40 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.corpus import SIZES, generate_corpus
+
+DEFAULT_CORPUS_DIR = Path("results") / "benchmarks" / "corpus"
+DEFAULT_OUTPUT = Path("results") / "benchmarks" / "latest.json"
+DEFAULT_BASELINE = Path("benchmarks") / "baseline.json"
+DEFAULT_THRESHOLD = 0.25
+# Differences smaller than this are timer noise, whatever the ratio.
+MIN_DELTA_S = 0.002
+DEFAULT_PROMPT = (
+    Path(__file__).resolve().parent.parent / "app" / "prompts" / "early_sprint_retro.txt"
+)
+
+MOCK_GRADE = {
+    "student_name": "Mock Student",
+    "score": 5,
+    "breakdown": [],
+    "students_with_poor_ratings": [],
+}
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[position]
+
+
+def _summarize(
+    runs: list[float], items: int, latencies: list[float] | None = None
+) -> dict:
+    median = statistics.median(runs)
+    summary = {
+        "items": items,
+        "runs": [round(run, 6) for run in runs],
+        "median_s": round(median, 6),
+        "min_s": round(min(runs), 6),
+        "throughput_per_s": round(items / median, 2) if median else None,
+    }
+    if latencies:
+        summary["latency_p50_ms"] = round(_percentile(latencies, 0.5) * 1000, 3)
+        summary["latency_p95_ms"] = round(_percentile(latencies, 0.95) * 1000, 3)
+    return summary
+
+
+def _time_runs(fn: Callable[[], object], repeat: int) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+@contextlib.contextmanager
+def _quiet():
+    # The CLI helpers report progress with rich.print; keep timings clean.
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_extract_text(files: list[Path], repeat: int) -> dict:
+    from app.parser import extract_text
+
+    runs = []
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for file in files:
+            file_start = time.perf_counter()
+            extract_text(str(file))
+            latencies.append(time.perf_counter() - file_start)
+        runs.append(time.perf_counter() - start)
+    return _summarize(runs, len(files), latencies)
+
+
+def bench_grade_end_to_end(
+    files: list[Path],
+    repeat: int,
+    latency: float,
+    concurrency: int,
+    prompt_path: Path = DEFAULT_PROMPT,
+) -> dict:
+    import app.grader as grader
+    from app.backends import FakeBackend
+    import main
+
+    backend = FakeBackend(lambda body: json.dumps(MOCK_GRADE), latency=latency)
+    saved = grader.backend
+    grader.set_backend(backend)
+    try:
+        with _quiet():
+            runs = _time_runs(
+                lambda: asyncio.run(
+                    main.grade_files_concurrently(files, str(prompt_path), concurrency)
+                ),
+                repeat,
+            )
+    finally:
+        grader.set_backend(saved)
+    summary = _summarize(runs, len(files))
+    summary["model_calls"] = backend.calls
+    summary["mock_latency_s"] = latency
+    summary["concurrency"] = concurrency
+    return summary
+
+
+def run_benchmarks(
+    corpus_dir: str | Path = DEFAULT_CORPUS_DIR,
+    docx: int = 10,
+    pdf: int = 10,
+    txt: int = 10,
+    sizes: tuple[str, ...] = tuple(SIZES),
+    seed: int = 0,
+    repeat: int = 3,
+    workers: int = 1,
+    mock_latency: float = 0.05,
+    concurrency: int = 8,
+) -> dict:
+    """Run every stage against the corpus and return the results document."""
+    from app.feedback import analyze_professor_feedback, build_instructor_brief_markdown
+    from app.output import ResultStreamWriter, expected_output_fields
+
+    corpus_dir = Path(corpus_dir)
+    manifest = generate_corpus(corpus_dir, docx, pdf, txt, sizes, seed)
+    files = [corpus_dir / entry["filename"] for entry in manifest["files"]]
+
+    benchmarks = {"extract_text": bench_extract_text(files, repeat)}
+
+    holder = {}
+
+    def analyze():
+        holder["analysis"] = analyze_professor_feedback(str(corpus_dir), workers=workers)
+
+    benchmarks["analyze_professor_feedback"] = _summarize(
+        _time_runs(analyze, repeat), len(files)
+    )
+    analysis = holder["analysis"]
+    benchmarks["build_instructor_brief"] = _summarize(
+        _time_runs(lambda: build_instructor_brief_markdown(analysis), repeat), 1
+    )
+
+    results = [
+        {
+            "filename": file.name,
+            **MOCK_GRADE,
+            "breakdown": [f"Section {n} is thin" for n in range(3)],
+        }
+        for file in files
+    ]
+    fieldnames = expected_output_fields(DEFAULT_PROMPT.read_text(encoding="utf-8"))
+
+    def write_results(tmp: str):
+        # main adds rows as files finish; input order is the common case.
+        with ResultStreamWriter(
+            fieldnames, csv_path=f"{tmp}/out.csv", json_path=f"{tmp}/out.json"
+        ) as writer:
+            for index, row in enumerate(results):
+                writer.add(index, row)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        benchmarks["write_results"] = _summarize(
+            _time_runs(lambda: write_results(tmp), repeat), len(results)
+        )
+
+    benchmarks["grade_end_to_end"] = bench_grade_end_to_end(
+        files, repeat, mock_latency, concurrency
+    )
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": _environment(),
+        "corpus": manifest["params"],
+        "repeat": repeat,
+        "benchmarks": benchmarks,
+    }
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def compare_results(
+    current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD
+) -> list[dict]:
+    """Compare median times per stage; slower than (1 + threshold)x is a regression.
+
+    Stages whose medians differ by less than `MIN_DELTA_S` are always "ok".
+    """
+    rows = []
+    names = list(current["benchmarks"])
+    names += [name for name in baseline["benchmarks"] if name not in names]
+    for name in names:
+        now = current["benchmarks"].get(name)
+        before = baseline["benchmarks"].get(name)
+        row = {
+            "name": name,
+            "baseline_s": before["median_s"] if before else None,
+            "current_s": now["median_s"] if now else None,
+            "change": None,
+        }
+        if now is None:
+            row["status"] = "missing"
+        elif before is None:
+            row["status"] = "new"
+        else:
+            delta = now["median_s"] - before["median_s"]
+            change = delta / before["median_s"] if before["median_s"] else 0.0
+            row["change"] = round(change, 4)
+            if abs(delta) < MIN_DELTA_S:
+                row["status"] = "ok"
+            elif change > threshold:
+                row["status"] = "regression"
+            elif change < -threshold:
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows: list[dict], threshold: float) -> None:
+    from rich import print
+    from rich.table import Table
+
+    table = Table(title=f"Benchmarks vs baseline (threshold {threshold:.0%})")
+    table.add_column("Stage")
+    table.add_column("Baseline", justify="right")
+    table.add_column("Current", justify="right")
+    table.add_column("Change", justify="right")
+    table.add_column("Status")
+    styles = {"regression": "red", "improved": "green", "missing": "yellow"}
+    for row in rows:
+        table.add_row(
+            row["name"],
+            f"{row['baseline_s'] * 1000:.1f} ms" if row["baseline_s"] is not None else "-",
+            f"{row['current_s'] * 1000:.1f} ms" if row["current_s"] is not None else "-",
+            f"{row['change']:+.1%}" if row["change"] is not None else "-",
+            row["status"],
+            style=styles.get(row["status"]),
+        )
+    print(table)
+
+
+def print_results(results: dict) -> None:
+    from rich import print
+    from rich.table import Table
+
+    table = Table(title=f"Benchmarks ({results['repeat']} runs, median)")
+    table.add_column("Stage")
+    table.add_column("Items", justify="right")
+    table.add_column("Median", justify="right")
+    table.add_column("Throughput", justify="right")
+    table.add_column("p50 / p95")
+    for name, row in results["benchmarks"].items():
+        latency = (
+            f"{row['latency_p50_ms']:.1f} / {row['latency_p95_ms']:.1f} ms"
+            if "latency_p50_ms" in row
+            else ""
+        )
+        table.add_row(
+            name,
+            str(row["items"]),
+            f"{row['median_s'] * 1000:.1f} ms",
+            f"{row['throughput_per_s']:,.1f}/s" if row["throughput_per_s"] else "-",
+            latency,
+        )
+    print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark extraction, feedback analysis, output writing and "
+        "mock-model grading on a synthetic corpus."
+    )
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_DIR))
+    parser.add_argument("--docx", type=int, default=10)
+    parser.add_argument("--pdf", type=int, default=10)
+    parser.add_argument("--txt", type=int, default=10)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Extraction workers for the feedback stage (default: 1, for stable timings).",
+    )
+    parser.add_argument(
+        "--mock-latency",
+        type=float,
+        default=0.05,
+        help="Seconds the mock model takes per request (default: 0.05).",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Slowdown that counts as a regression (default: 0.25 = 25%%).",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Record this run as the baseline instead of comparing against it.",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.corpus,
+        args.docx,
+        args.pdf,
+        args.txt,
+        tuple(args.sizes),
+        args.seed,
+        args.repeat,
+        args.workers,
+        args.mock_latency,
+        args.concurrency,
+    )
+    print_results(results)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one.")
+        return
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline.get("corpus") != results["corpus"]:
+        print("Warning: baseline was recorded on a different corpus.")
+    rows = compare_results(results, baseline, args.threshold)
+    print_comparison(rows, args.threshold)
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,8 @@ import os
 from pathlib import Path
 from collections import Counter
 import re
-from app.parser import extract_text
+from app.cache import ExtractionCache
+from app.parser import iter_extracted_texts
 
 
 def extract_professor_feedback(text):
@@ -39,6 +40,7 @@ def main():
         "/home/iambillmccann/repositories/retro-grading-agent/data/sprint-4-103",
     ]
 
+    cache = ExtractionCache()
     all_feedback = []
     files_processed = 0
 
@@ -46,24 +48,27 @@ def main():
         if not os.path.exists(sprint_dir):
             continue
 
-        for file_path in Path(sprint_dir).iterdir():
-            if file_path.is_file():
-                try:
-                    print(f"Processing {file_path.name}...")
-                    text = extract_text(str(file_path))
-                    feedback = extract_professor_feedback(text)
-
-                    # Also store the full text for manual review
-                    all_feedback.append(
-                        {
-                            "file": file_path.name,
-                            "text": text,
-                            "extracted_feedback": feedback,
-                        }
-                    )
-                    files_processed += 1
-                except Exception as e:
-                    print(f"Error processing {file_path.name}: {e}")
+        files = sorted(path for path in Path(sprint_dir).iterdir() if path.is_file())
+        # Extraction finishes in any order; write rows in filename order.
+        extracted = sorted(
+            iter_extracted_texts(files, cache=cache), key=lambda item: item[0]
+        )
+        for file_path, text in extracted:
+            if isinstance(text, Exception):
+                print(f"Error processing {file_path.name}: {text}")
+                continue
+            print(f"Processing {file_path.name}...")
+            feedback = extract_professor_feedback(text)
+
+            # Also store the full text for manual review
+            all_feedback.append(
+                {
+                    "file": file_path.name,
+                    "text": text,
+                    "extracted_feedback": feedback,
+                }
+            )
+            files_processed += 1
 
     print(f"\nProcessed {files_processed} files")
 
@@ -2,190 +2,145 @@
 """
 Grade JSON assignment submissions based on a rubric.
 
-This script grades student submissions for the Discord/GitHub setup assignment.
+This script grades student submissions against a declarative YAML rubric
+(app/rubric.py). The default is the Discord/GitHub setup assignment in
+app/rubrics/discord_github.yaml; pass --rubric for other JSON assignments.
 
 Usage:
     python grade_json_assignment.py data/cs490-hw1 results/cs490-hw1.csv
     python grade_json_assignment.py data/cs684-hw1 results/cs684-hw1.csv
+    python grade_json_assignment.py data/cs490-hw1 results/cs490-hw1.csv --workers 8
+    python grade_json_assignment.py data/cs490-hw2 results/cs490-hw2.csv --rubric <your-rubric>.yaml
+
+Submissions are validated in a process pool and rows are streamed to the CSV
+in filename order. IDs shared between submissions are written to
+<output>-duplicates.csv.
 """
 
-import json
+import argparse
 import csv
+import os
 import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, Tuple
-
-
-def validate_filename(file_path: Path) -> Tuple[bool, str]:
-    """
-    Validate that the filename follows the pattern [lastname]-[firstname].json
+from typing import Dict, Iterator, List, Optional, Tuple
 
-    Returns:
-        (is_valid, feedback) tuple
-    """
-    filename = file_path.stem  # Get filename without extension
-
-    # Check if it has a dash
-    if "-" not in filename:
-        return False, "Filename does not follow [lastname]-[firstname] pattern"
-
-    # Check if it has exactly one dash (simple validation)
-    parts = filename.split("-")
-    if len(parts) != 2:
-        return (
-            False,
-            "Filename should have exactly one dash between lastname and firstname",
-        )
+from app.rubric import DEFAULT_RUBRIC, load_rubric
 
-    lastname, firstname = parts
+DUPLICATE_FIELDNAMES = ["field", "value", "kind", "count", "filenames"]
 
-    # Check that both parts are non-empty
-    if not lastname or not firstname:
-        return False, "Both lastname and firstname must be provided"
 
-    return True, ""
-
-
-def validate_json_structure(data: dict) -> Tuple[bool, str]:
+def grade_submission(file_path: Path, rubric_path: str | Path = DEFAULT_RUBRIC) -> Dict:
     """
-    Validate that JSON has the correct key names (case-sensitive).
+    Grade a single JSON submission file against a YAML rubric.
+
+    The default rubric (app/rubrics/discord_github.yaml, 5 points total):
+    1. File named correctly (1 point)
+    2. Well-formed JSON (1 point)
+    3. Key names correctly specified (1 point)
+    4. All values supplied (2 points)
 
-    Required keys: name, ucid, discordId, githubId
+    The rubric is compiled once per process and cached.
 
     Returns:
-        (is_valid, feedback) tuple
+        Dictionary with student info, score, and feedback
     """
-    required_keys = {"name", "ucid", "discordId", "githubId"}
-    actual_keys = set(data.keys())
-
-    if actual_keys != required_keys:
-        missing = required_keys - actual_keys
-        extra = actual_keys - required_keys
-
-        feedback_parts = []
-        if missing:
-            feedback_parts.append(f"Missing keys: {', '.join(sorted(missing))}")
-        if extra:
-            feedback_parts.append(f"Extra keys: {', '.join(sorted(extra))}")
+    return load_rubric(rubric_path).grade(file_path)
 
-        return False, "; ".join(feedback_parts)
 
-    return True, ""
-
-
-def validate_values_supplied(data: dict) -> Tuple[int, str]:
+class IdIndex:
     """
-    Validate that all values are provided and non-empty.
+    Hash index from each normalized ID value to the submissions using it.
 
-    Returns:
-        (points_earned, feedback) tuple (0-2 points)
+    Values are compared case-insensitively with surrounding whitespace
+    removed; empty values are ignored. A value shared by submissions whose
+    identity columns (by default name plus the IDs) all match is a
+    "duplicate" (the same student submitting twice, or a copied file);
+    otherwise it is a "collision".
     """
-    required_keys = ["name", "ucid", "discordId", "githubId"]
-    empty_fields = []
 
-    for key in required_keys:
-        value = data.get(key, "")
-        if not value or (isinstance(value, str) and not value.strip()):
-            empty_fields.append(key)
+    def __init__(self, fields: List[str], identity: Optional[List[str]] = None):
+        self.fields = fields
+        self.identity = identity or ["name", *fields]
+        self._by_value: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        self._identity: Dict[str, Tuple[str, ...]] = {}
 
-    if not empty_fields:
-        return 2, ""
-    elif len(empty_fields) <= 2:
-        # Partial credit if only 1-2 fields are empty
-        return 1, f"Empty or missing values: {', '.join(empty_fields)}"
-    else:
-        return 0, f"Empty or missing values: {', '.join(empty_fields)}"
+    @staticmethod
+    def normalize(value: str) -> str:
+        return str(value).strip().casefold()
 
-
-def grade_submission(file_path: Path) -> Dict:
-    """
-    Grade a single JSON submission file.
-
-    Grading rubric (5 points total):
-    1. File named correctly (1 point)
-    2. Well-formed JSON (1 point)
-    3. Key names correctly specified (1 point)
-    4. All values supplied (2 points)
-
-    Returns:
-        Dictionary with student info, score, and feedback
-    """
-    result = {
-        "filename": file_path.name,
-        "name": "",
-        "ucid": "",
-        "discordId": "",
-        "githubId": "",
-        "score": 0,
-        "feedback": [],
-    }
-
-    points = 0
-
-    # 1. Check filename (1 point)
-    filename_valid, filename_feedback = validate_filename(file_path)
-    if filename_valid:
-        points += 1
-    else:
-        result["feedback"].append(f"Filename: {filename_feedback}")
-
-    # 2. Check if JSON is well-formed (1 point)
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        points += 1
-    except json.JSONDecodeError as e:
-        result["feedback"].append(f"Invalid JSON: {str(e)}")
-        result["score"] = points
-        result["feedback"] = (
-            "; ".join(result["feedback"]) if result["feedback"] else "Perfect!"
-        )
-        return result
-    except Exception as e:
-        result["feedback"].append(f"Error reading file: {str(e)}")
-        result["score"] = points
-        result["feedback"] = (
-            "; ".join(result["feedback"]) if result["feedback"] else "Perfect!"
+    def add(self, result: Dict) -> None:
+        filename = result["filename"]
+        self._identity[filename] = tuple(
+            self.normalize(result.get(key, "")) for key in self.identity
         )
-        return result
-
-    # 3. Check key names (1 point)
-    keys_valid, keys_feedback = validate_json_structure(data)
-    if keys_valid:
-        points += 1
-    else:
-        result["feedback"].append(f"Keys: {keys_feedback}")
-
-    # 4. Check values supplied (2 points)
-    values_points, values_feedback = validate_values_supplied(data)
-    points += values_points
-    if values_feedback:
-        result["feedback"].append(f"Values: {values_feedback}")
-
-    # Extract student information if available
-    if isinstance(data, dict):
-        result["name"] = str(data.get("name", "")).strip()
-        result["ucid"] = str(data.get("ucid", "")).strip()
-        result["discordId"] = str(data.get("discordId", "")).strip()
-        result["githubId"] = str(data.get("githubId", "")).strip()
-
-    result["score"] = points
-    result["feedback"] = (
-        "; ".join(result["feedback"]) if result["feedback"] else "Perfect!"
-    )
+        for field in self.fields:
+            value = self.normalize(result[field])
+            if value:
+                self._by_value[(field, value)].append(filename)
+
+    def shared(self) -> List[Dict]:
+        rows = []
+        for (field, value), filenames in self._by_value.items():
+            if len(filenames) < 2:
+                continue
+            identities = {self._identity[filename] for filename in filenames}
+            rows.append(
+                {
+                    "field": field,
+                    "value": value,
+                    "kind": "duplicate" if len(identities) == 1 else "collision",
+                    "count": len(filenames),
+                    "filenames": "; ".join(filenames),
+                }
+            )
+        return sorted(rows, key=lambda row: (row["field"], row["value"]))
+
+
+def iter_graded(
+    json_files: List[Path],
+    workers: int = 1,
+    rubric_path: str | Path = DEFAULT_RUBRIC,
+) -> Iterator[Dict]:
+    """Grade files in a process pool, yielding results in input order."""
+    grade = partial(grade_submission, rubric_path=rubric_path)
+    if workers <= 1 or len(json_files) < 2:
+        yield from map(grade, json_files)
+        return
+    # Submissions are tiny, so hand them out in chunks to amortize IPC.
+    chunksize = max(1, min(256, len(json_files) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(grade, json_files, chunksize=chunksize)
+
 
-    return result
+def duplicates_report_path(output_csv: str) -> Path:
+    output_path = Path(output_csv)
+    return output_path.with_name(f"{output_path.stem}-duplicates.csv")
 
 
-def grade_assignment(input_dir: str, output_csv: str):
+def grade_assignment(
+    input_dir: str,
+    output_csv: str,
+    workers: Optional[int] = None,
+    rubric_path: str | Path = DEFAULT_RUBRIC,
+):
     """
     Grade all JSON submissions in the input directory and write results to CSV.
 
     Args:
         input_dir: Path to directory containing student submissions
         output_csv: Path to output CSV file
+        workers: Worker processes (default: CPU count; 1 grades in-process)
+        rubric_path: YAML rubric to grade against
     """
     input_path = Path(input_dir)
+    try:
+        rubric = load_rubric(rubric_path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error: Could not load rubric '{rubric_path}': {e}")
+        sys.exit(1)
 
     if not input_path.exists():
         print(f"Error: Directory '{input_dir}' does not exist")
@@ -203,58 +158,77 @@ def grade_assignment(input_dir: str, output_csv: str):
         return
 
     print(f"Found {len(json_files)} JSON files to grade...")
+    workers = workers or os.cpu_count() or 1
 
-    # Grade each submission
-    results = []
-    for json_file in json_files:
-        print(f"  Grading {json_file.name}...")
-        result = grade_submission(json_file)
-        results.append(result)
-
-    # Write results to CSV
+    # Grade submissions, streaming each row to the CSV as it arrives
     output_path = Path(output_csv)
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    index = IdIndex(rubric.unique, rubric.columns or None)
+    scores = []
 
     with open(output_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=[
-                "filename",
-                "name",
-                "ucid",
-                "discordId",
-                "githubId",
-                "score",
-                "feedback",
-            ],
-        )
+        writer = csv.DictWriter(f, fieldnames=rubric.fieldnames)
         writer.writeheader()
-        writer.writerows(results)
+        for result in iter_graded(json_files, workers, rubric_path):
+            writer.writerow(result)
+            index.add(result)
+            scores.append(result["score"])
 
     print(f"\nGrading complete! Results written to '{output_csv}'")
-    print(f"Total submissions: {len(results)}")
+    print(f"Total submissions: {len(scores)}")
 
     # Print summary statistics
-    scores = [r["score"] for r in results]
-    perfect_scores = sum(1 for s in scores if s == 5)
+    max_points = rubric.max_points
+    perfect_scores = sum(1 for s in scores if s == max_points)
     avg_score = sum(scores) / len(scores) if scores else 0
 
-    print(f"Perfect scores (5/5): {perfect_scores}/{len(results)}")
-    print(f"Average score: {avg_score:.2f}/5.00")
+    print(f"Perfect scores ({max_points}/{max_points}): {perfect_scores}/{len(scores)}")
+    print(f"Average score: {avg_score:.2f}/{max_points:.2f}")
 
+    # Report IDs shared across submissions
+    shared = index.shared()
+    report_path = duplicates_report_path(output_csv)
+    if not shared:
+        report_path.unlink(missing_ok=True)
+        print("Shared IDs: none")
+        return
+    with open(report_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=DUPLICATE_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(shared)
+    print(f"Shared IDs: {len(shared)} (details in '{report_path}')")
+    for row in shared[:10]:
+        print(
+            f"  {row['kind']}: {row['field']}={row['value']} "
+            f"shared by {row['count']} submissions"
+        )
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: python grade_json_assignment.py <input_dir> <output_csv>")
-        print("\nExamples:")
-        print("  python grade_json_assignment.py data/cs490-hw1 results/cs490-hw1.csv")
-        print("  python grade_json_assignment.py data/cs684-hw1 results/cs684-hw1.csv")
-        sys.exit(1)
 
-    input_dir = sys.argv[1]
-    output_csv = sys.argv[2]
+def main():
+    parser = argparse.ArgumentParser(
+        description="Grade JSON assignment submissions against a YAML rubric.",
+        epilog="Examples:\n"
+        "  python grade_json_assignment.py data/cs490-hw1 results/cs490-hw1.csv\n"
+        "  python grade_json_assignment.py data/cs684-hw1 results/cs684-hw1.csv",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("input_dir", help="Directory containing student submissions")
+    parser.add_argument("output_csv", help="Path to output CSV file")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for validation (default: CPU count; 1 runs in-process).",
+    )
+    parser.add_argument(
+        "--rubric",
+        default=str(DEFAULT_RUBRIC),
+        help="YAML rubric to grade against (default: the 5-point Discord/GitHub rubric).",
+    )
+    args = parser.parse_args()
 
-    grade_assignment(input_dir, output_csv)
+    grade_assignment(
+        args.input_dir, args.output_csv, workers=args.workers, rubric_path=args.rubric
+    )
 
 
 if __name__ == "__main__":
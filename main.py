@@ -1,13 +1,55 @@
 # main.py
 
 import argparse
-import os
+import asyncio
 import json
+import time
 from pathlib import Path
-import csv
-from app.parser import extract_text
-from app.grader import grade_with_prompt
+from typing import Callable
+from app.batch import (
+    build_batch_requests,
+    collect_batch_results,
+    submit_batch,
+    wait_for_batch,
+    write_batch_file,
+)
+from app.cache import ExtractionCache, GradingCache
+from app.parser import (
+    TRUNCATION_MARKER,
+    collect_input_files,
+    extract_text,
+    iter_extracted_texts,
+)
+from app.backends import BACKEND_NAMES, make_backend
+from app.grader import (
+    get_backend,
+    get_cascade_model,
+    get_model,
+    grade_with_prompt,
+    grade_with_prompt_async,
+    grading_cache_key,
+    load_prompt,
+    load_prompt_template,
+    model_label,
+    set_backend,
+    set_cascade_model,
+    set_response_format,
+)
+from app.estimate import estimate_run
 from app.feedback import analyze_professor_feedback, build_instructor_brief_markdown
+from app.feedback_store import DEFAULT_STORE_PATH, FeedbackStore
+from app import metrics
+from app.journal import RunJournal
+from app.packing import (
+    DEFAULT_PACK_SIZE,
+    DEFAULT_PACK_TOKENS,
+    grade_pack_async,
+    pack_submissions,
+)
+from app.output import ResultStreamWriter, expected_output_fields
+from app.ratelimit import AdaptiveLimiter
+from app.sections import condense
+from app.structured import RESPONSE_FORMATS
 from app.utils import log_cli_command
 from rich import print
 
@@ -40,85 +82,421 @@ def resolve_prompt_path(prompt_arg: str) -> str:
     )
 
 
-def process_file(filepath: str, prompt_path: str) -> dict:
-    print(f"[bold cyan]Reading:[/bold cyan] {filepath}")
-    try:
-        text = extract_text(filepath)
-        print("[bold cyan]Grading...[/bold cyan]")
-        result = grade_with_prompt(text, prompt_path)
+def _finish_result(result: dict, filepath: str) -> dict:
+    # Dynamically attach filename
+    result["filename"] = Path(filepath).name
+
+    # Safe, dynamic summary for console
+    student = result.get("student_name", "Unknown")
+    score = result.get("score", "?")
+    print(f"[bold green]Graded: {student} — Score: {score}[/bold green]")
+
+    return result
+
+
+def extract_files(
+    files: list[Path],
+    workers: int | None = None,
+    extraction_cache: ExtractionCache | None = None,
+) -> dict[Path, str]:
+    """Extract all files in parallel, reporting any that cannot be read."""
+    texts = {}
+    for file, outcome in iter_extracted_texts(
+        files, workers=workers, cache=extraction_cache
+    ):
+        if isinstance(outcome, Exception):
+            print(f"[bold red]Error processing {file}:[/bold red] {outcome}")
+        else:
+            print(f"[bold cyan]Read:[/bold cyan] {file}")
+            if TRUNCATION_MARKER in outcome:
+                print(
+                    f"[bold yellow]Truncated:[/bold yellow] {file.name} is longer than "
+                    "PDF_MAX_PAGES / PDF_MAX_CHARS; only the start is graded"
+                )
+            texts[file] = outcome
+    return texts
+
+
+def condense_texts(texts: dict[Path, str], prompt_template: str) -> dict[Path, str]:
+    """Keep only the sections `prompt_template` grades (see app.sections).
+
+    Files whose sections cannot be told apart confidently keep their full text.
+    """
+    condensed = {}
+    trimmed = 0
+    before = after = 0
+    for file, text in texts.items():
+        with metrics.span("sections", file=file.name) as span:
+            condensed[file], summary = condense(text, prompt_template)
+            span.update(summary)
+        trimmed += summary["confident"]
+        before += summary["chars_before"]
+        after += summary["chars_after"]
+    if texts:
+        saved = 100 * (before - after) / before if before else 0
+        print(
+            f"[bold cyan]Sections:[/bold cyan] {trimmed} of {len(texts)} files trimmed "
+            f"to their graded sections ({saved:.0f}% fewer characters); "
+            "the rest are sent in full"
+        )
+    return condensed
+
+
+def process_file(
+    filepath: str,
+    prompt_path: str,
+    cache: GradingCache | None = None,
+    extraction_cache: ExtractionCache | None = None,
+    text: str | None = None,
+) -> dict:
+    with metrics.file_context(filepath), metrics.span("file") as span:
+        try:
+            if text is None:
+                print(f"[bold cyan]Reading:[/bold cyan] {filepath}")
+                text = extract_text(filepath, cache=extraction_cache)
+            print("[bold cyan]Grading...[/bold cyan]")
+            result = grade_with_prompt(text, prompt_path, cache=cache)
+            return _finish_result(result, filepath)
 
-        # Dynamically attach filename
-        result["filename"] = Path(filepath).name
+        except Exception as e:
+            span["error"] = type(e).__name__
+            print(f"[bold red]Error processing {filepath}:[/bold red] {e}")
+            return None
 
-        # Safe, dynamic summary for console
-        student = result.get("student_name", "Unknown")
-        score = result.get("score", "?")
-        print(f"[bold green]Graded: {student} — Score: {score}[/bold green]")
 
+async def process_file_async(
+    filepath: str,
+    prompt_path: str,
+    limiter: AdaptiveLimiter,
+    cache: GradingCache | None = None,
+    extraction_cache: ExtractionCache | None = None,
+    text: str | None = None,
+) -> dict | None:
+    with metrics.file_context(filepath), metrics.span("file") as span:
+        try:
+            if text is None:
+                print(f"[bold cyan]Reading:[/bold cyan] {filepath}")
+                text = await asyncio.to_thread(
+                    extract_text, filepath, cache=extraction_cache
+                )
+            print(f"[bold cyan]Grading...[/bold cyan] {Path(filepath).name}")
+            result = await grade_with_prompt_async(
+                text, prompt_path, cache=cache, limiter=limiter
+            )
+            return _finish_result(result, filepath)
+
+        except Exception as e:
+            span["error"] = type(e).__name__
+            print(f"[bold red]Error processing {filepath}:[/bold red] {e}")
+            return None
+
+
+async def grade_files_concurrently(
+    files: list[Path],
+    prompt_path: str,
+    concurrency: int,
+    cache: GradingCache | None = None,
+    extraction_cache: ExtractionCache | None = None,
+    texts: dict[Path, str] | None = None,
+    on_result: Callable[[Path, dict | None], None] | None = None,
+    max_concurrency: int | None = None,
+) -> list[dict | None]:
+    """Grade files starting with up to `concurrency` model requests in flight.
+
+    The in-flight limit then adapts to the API: it grows while requests succeed
+    (up to `max_concurrency`) and is halved when the API answers with 429.
+    Results are returned in the same order as `files`; a failed file yields
+    None in its slot instead of aborting the rest of the batch. Files missing
+    from `texts` are extracted on demand. `on_result` is called as soon as
+    each file finishes, in completion order.
+    """
+    texts = texts or {}
+    limiter = AdaptiveLimiter(concurrency, maximum=max_concurrency)
+
+    async def grade(file: Path) -> dict | None:
+        result = await process_file_async(
+            str(file),
+            prompt_path,
+            limiter,
+            cache=cache,
+            extraction_cache=extraction_cache,
+            text=texts.get(file),
+        )
+        if on_result is not None:
+            on_result(file, result)
         return result
 
-    except Exception as e:
-        print(f"[bold red]Error processing {filepath}:[/bold red] {e}")
-        return None
-
-
-def write_results_to_csv(results: list[dict], output_file: str):
-    os.makedirs(Path(output_file).parent, exist_ok=True)
-    # Collect all unique fieldnames from all results
-    fieldnames = set()
-    for result in results:
-        fieldnames.update(result.keys())
-    ordered_hw2 = [
-        "filename",
-        "claims",
-        "assumptions",
-        "refused",
-        "oracles",
-        "confidence",
-        "score",
-        "feedback",
-    ]
-    ordered_retro = [
-        "filename",
-        "student_name",
-        "score",
-        "overall_thoughts",
-        "personal_contributions",
-        "things_that_went_well",
-        "things_that_could_be_improved",
-        "teammate_ratings",
-        "breakdown",
-        "students_with_poor_ratings",
-    ]
+    return await asyncio.gather(*(grade(file) for file in files))
 
-    if set(ordered_hw2).issubset(fieldnames):
-        extra = sorted(fieldnames - set(ordered_hw2))
-        fieldnames = ordered_hw2 + extra
-    elif {"filename", "student_name", "score"}.issubset(fieldnames):
-        base = [name for name in ordered_retro if name in fieldnames]
-        extra = sorted(fieldnames - set(base))
-        fieldnames = base + extra
-    else:
-        fieldnames = sorted(fieldnames)  # Sort for consistent column order
 
-    with open(output_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-    print(f"\n[bold green]Results saved to:[/bold green] {output_file}")
+async def grade_files_packed(
+    files: list[Path],
+    prompt_path: str,
+    concurrency: int,
+    texts: dict[Path, str],
+    cache: GradingCache | None = None,
+    on_result: Callable[[Path, dict | None], None] | None = None,
+    max_concurrency: int | None = None,
+    max_tokens: int = DEFAULT_PACK_TOKENS,
+    max_size: int = DEFAULT_PACK_SIZE,
+) -> list[dict | None]:
+    """Grade extracted files several to a request (see app.packing).
+
+    Files are packed in order under `max_tokens` prompt tokens and `max_size`
+    submissions per request, with packs sent through the same adaptive
+    limiter as `grade_files_concurrently`. A file whose grade does not come
+    back from its pack (or whose pack fails) is graded on its own. Results
+    are returned in the same order as `files`.
+    """
+    prompt = load_prompt(prompt_path)
+    limiter = AdaptiveLimiter(concurrency, maximum=max_concurrency)
+    by_name = {file.name: file for file in files}
+    packs = pack_submissions(
+        {file.name: texts[file] for file in files},
+        prompt,
+        get_model(),
+        max_tokens=max_tokens,
+        max_size=max_size,
+    )
+    results: dict[Path, dict | None] = {}
+
+    def finished(file: Path, result: dict | None) -> None:
+        results[file] = result
+        if on_result is not None:
+            on_result(file, result)
+
+    async def grade_alone(file: Path) -> None:
+        result = await process_file_async(
+            str(file), prompt_path, limiter, cache=cache, text=texts[file]
+        )
+        finished(file, result)
+
+    async def grade_pack(names: list[str]) -> None:
+        if len(names) == 1:
+            return await grade_alone(by_name[names[0]])
+        print(f"[bold cyan]Grading {len(names)} files in one request...[/bold cyan]")
+        start = time.perf_counter()
+        try:
+            grades = await grade_pack_async(
+                {name: texts[by_name[name]] for name in names},
+                prompt,
+                cache=cache,
+                limiter=limiter,
+            )
+        except Exception as e:
+            print(f"[bold red]Packed request failed:[/bold red] {e}")
+            grades = {}
+        seconds = time.perf_counter() - start
+        missing = []
+        for name in names:
+            if name not in grades:
+                missing.append(by_name[name])
+                continue
+            metrics.record("file", seconds, file=name, packed=True)
+            finished(by_name[name], _finish_result(grades[name], str(by_name[name])))
+        if missing:
+            print(
+                f"[bold yellow]{len(missing)} of {len(names)} packed grades missing; "
+                "grading them individually.[/bold yellow]"
+            )
+            await asyncio.gather(*(grade_alone(file) for file in missing))
+
+    await asyncio.gather(*(grade_pack(names) for names in packs))
+    return [results.get(file) for file in files]
+
+
+def run_batch_grading(
+    files: list[Path],
+    prompt_path: str,
+    batch_file: str,
+    texts: dict[Path, str],
+    submit: bool = True,
+    batch_id: str | None = None,
+    poll_interval: float = 30,
+    cache: GradingCache | None = None,
+    timeout: float | None = None,
+) -> list[dict | None] | None:
+    """Grade extracted files through one Batch API job instead of per-file requests.
+
+    Cached results are reused and left out of the batch. With `submit=False`
+    only the JSONL request file is written and None is returned; passing a
+    `batch_id` ignores `texts` and collects an already submitted batch. If
+    submitting or collecting fails, or the batch is still running after
+    `timeout` seconds, the error is printed (with the batch id to collect
+    later) and None is returned.
+    """
+    from openai import APIError
+
+    outcomes: dict[str, dict | str] = {}
+    cache_keys = {}
+    prompt_template = load_prompt_template(prompt_path)
+
+    if batch_id is None:
+        pending = {}
+        for file in files:
+            if file not in texts:
+                continue
+            key = grading_cache_key(texts[file], prompt_template)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                outcomes[file.name] = cached
+            else:
+                pending[file.name] = texts[file]
+                cache_keys[file.name] = key
+
+        requests = build_batch_requests(pending, prompt_path)
+        write_batch_file(requests, batch_file)
+        print(
+            f"[bold green]Batch request file written:[/bold green] {batch_file} "
+            f"({len(requests)} requests, {len(outcomes)} cached)"
+        )
+        if not submit:
+            return None
+        if requests:
+            try:
+                batch_id = submit_batch(batch_file)
+            except APIError as e:
+                print(
+                    f"[bold red]Could not submit batch:[/bold red] {e}\n"
+                    f"The request file is kept at {batch_file}; rerun to try again."
+                )
+                return None
+            print(f"[bold cyan]Submitted batch:[/bold cyan] {batch_id}")
+
+    if batch_id is not None:
+        print(f"[bold cyan]Waiting for batch {batch_id}...[/bold cyan]")
+        try:
+            batch = wait_for_batch(
+                batch_id, poll_interval=poll_interval, timeout=timeout
+            )
+            collected = collect_batch_results(batch, prompt_template)
+        except TimeoutError as e:
+            print(
+                f"[bold red]{e}.[/bold red] Collect it later with --batch-id {batch_id}"
+            )
+            return None
+        except (RuntimeError, APIError) as e:
+            print(
+                f"[bold red]Batch {batch_id} could not be collected:[/bold red] {e}\n"
+                f"Retry with --batch-id {batch_id}, or rerun with --batch to resubmit."
+            )
+            return None
+        for filename, outcome in collected.items():
+            outcomes[filename] = outcome
+            if cache is not None and isinstance(outcome, dict) and filename in cache_keys:
+                cache.put(cache_keys[filename], outcome)
+
+    results = []
+    for file in files:
+        outcome = outcomes.get(file.name)
+        if isinstance(outcome, dict):
+            results.append(_finish_result(outcome, str(file)))
+        else:
+            if outcome is not None:
+                print(f"[bold red]Error processing {file}:[/bold red] {outcome}")
+            results.append(None)
+    return results
 
 
-def write_results_to_json(results: list[dict], output_file: str):
-    os.makedirs(Path(output_file).parent, exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2)
-    print(f"\n[bold green]Results saved to:[/bold green] {output_file}")
+def print_dry_run_report(estimate: dict):
+    from rich.table import Table
+
+    table = Table(title=f"Dry run: {estimate['model']}")
+    table.add_column("File")
+    table.add_column("Prompt tokens", justify="right")
+    table.add_column("Notes")
+    for row in estimate["files"]:
+        notes = ["cached"] if row["cached"] else []
+        notes.extend(row["flags"])
+        style = "yellow" if row["flags"] else None
+        table.add_row(
+            row["filename"], f"{row['prompt_tokens']:,}", "; ".join(notes), style=style
+        )
+    for error in estimate["parse_errors"]:
+        table.add_row(error["filename"], "-", f"unparseable: {error['error']}", style="red")
+    print(table)
+
+    approx = "" if estimate["exact_token_counts"] else " (approx.; tiktoken encoding unavailable)"
+    cost = estimate["estimated_cost_usd"]
+    minutes, seconds = divmod(round(estimate["estimated_seconds"]), 60)
+    print(
+        f"[bold]Requests:[/bold] {estimate['requests']} of {estimate['total_files']} files "
+        f"({estimate['cached_files']} cached, {len(estimate['parse_errors'])} unparseable)"
+    )
+    print(
+        f"[bold]Tokens:[/bold] {estimate['input_tokens']:,} input{approx}, "
+        f"~{estimate['output_tokens']:,} output; "
+        f"median prompt {estimate['median_prompt_tokens']:,}, max {estimate['max_prompt_tokens']:,}"
+    )
+    print(
+        "[bold]Estimated cost:[/bold] "
+        + (f"${cost:.2f}" if cost is not None else f"unknown (no pricing for {estimate['model']})")
+    )
+    print(
+        f"[bold]Estimated wall clock:[/bold] {minutes}m {seconds:02d}s "
+        f"at concurrency {estimate['concurrency']}"
+    )
+    if estimate["outliers"]:
+        print(
+            f"[bold yellow]{len(estimate['outliers'])} outlier file(s) flagged above.[/bold yellow]"
+        )
+
+
+def print_run_metrics(summary: dict):
+    from rich.table import Table
+
+    table = Table(title=f"Run metrics: {summary['files']} files in {summary['wall_s']:.1f}s")
+    table.add_column("Stage")
+    table.add_column("Count", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Mean", justify="right")
+    table.add_column("p95", justify="right")
+    table.add_column("Max", justify="right")
+    for stage, row in summary["stages"].items():
+        table.add_row(
+            stage,
+            str(row["count"]),
+            f"{row['total_s']:.2f}s",
+            f"{row['mean_s'] * 1000:.0f} ms",
+            f"{row['p95_s'] * 1000:.0f} ms",
+            f"{row['max_s'] * 1000:.0f} ms",
+        )
+    print(table)
+    tokens = summary["tokens"]
+    print(
+        f"[bold]Model calls:[/bold] {summary['model_calls']} "
+        f"({summary['retries']} retries); "
+        f"tokens {tokens['prompt_tokens']:,} prompt + "
+        f"{tokens['completion_tokens']:,} completion; "
+        f"cache hits: {summary['cache_hits']['cache']} grading, "
+        f"{summary['cache_hits']['extract']} extraction"
+    )
+    if summary["repairs"] or summary["reasks"]:
+        print(
+            f"[bold]Malformed responses:[/bold] {summary['repairs']} repaired locally, "
+            f"{summary['reasks']} re-asked"
+        )
+    if summary["escalations"]:
+        reasons = ", ".join(
+            f"{count} {reason}" for reason, count in summary["escalations"].items()
+        )
+        print(f"[bold]Escalated to the primary model:[/bold] {reasons}")
+    if summary["slowest_files"]:
+        slowest = ", ".join(
+            f"{row['file']} ({row['duration_s']:.2f}s)"
+            for row in summary["slowest_files"][:3]
+        )
+        print(f"[bold]Slowest files:[/bold] {slowest}")
 
 
 def slugify(value: str) -> str:
     return "".join(ch if ch.isalnum() or ch in "-_" else "-" for ch in value).strip("-")
 
 
+def default_batch_file_path(path_arg: str) -> str:
+    return f"results/batch/{slugify(Path(path_arg).name) or 'batch'}-requests.jsonl"
+
+
 def default_feedback_output_path(path_arg: str, term: str | None) -> str:
     cohort = term if term else Path(path_arg).name
     cohort_slug = slugify(cohort) if cohort else "cohort"
@@ -126,11 +504,25 @@ def default_feedback_output_path(path_arg: str, term: str | None) -> str:
 
 
 def run_feedback_summary(
-    path_arg: str, term: str | None, save_path: str, json_path: str | None
+    path_arg: str,
+    term: str | None,
+    save_path: str,
+    json_path: str | None,
+    extraction_cache: ExtractionCache | None = None,
+    workers: int | None = None,
+    store_path: str | Path = DEFAULT_STORE_PATH,
 ):
     print(f"[bold cyan]Scanning feedback in:[/bold cyan] {path_arg}")
-    analysis = analyze_professor_feedback(path_arg)
+    analysis = analyze_professor_feedback(
+        path_arg, cache=extraction_cache, workers=workers
+    )
     label = term if term else Path(path_arg).name
+    with FeedbackStore(store_path) as store:
+        indexed = store.ingest(analysis, label)
+    print(
+        f"[bold cyan]Indexed {indexed} feedback lines as term[/bold cyan] {label} "
+        f"[bold cyan]in[/bold cyan] {store_path}"
+    )
     markdown = build_instructor_brief_markdown(analysis, cohort_label=label)
 
     save_file = Path(save_path)
@@ -145,6 +537,68 @@ def run_feedback_summary(
         print(f"[bold green]Analysis JSON saved to:[/bold green] {json_path}")
 
 
+def run_feedback_query(
+    store_path: str | Path,
+    query: str | None,
+    theme: str | None = None,
+    sentiment: str | None = None,
+    term: str | None = None,
+    limit: int = 20,
+):
+    """Print per-term counts and the best matching lines from the feedback store."""
+    from rich.markup import escape
+    from rich.table import Table
+
+    with FeedbackStore(store_path) as store:
+        counts = store.count_by_term(query, theme, sentiment, term)
+        lines = store.search(query, theme, sentiment, term, limit=limit)
+
+    table = Table(title="Matching feedback per term")
+    table.add_column("Term")
+    table.add_column("Lines", justify="right")
+    table.add_column("Students", justify="right")
+    table.add_column("Submissions", justify="right")
+    for row in counts:
+        table.add_row(
+            row["term"],
+            str(row["lines"]),
+            str(row["students"]),
+            str(row["total_files"]),
+        )
+    print(table)
+    for line in lines:
+        print(
+            escape(
+                f"- [{line['sentiment']}] \"{line['text']}\" "
+                f"({line['term']}, {line['filename']})"
+            )
+        )
+
+
+def run_feedback_theme_comparison(
+    store_path: str | Path, term_groups: list[str] | None = None, top: int = 8
+):
+    """Print the most frequent themes side by side for each term (group)."""
+    from rich.table import Table
+
+    with FeedbackStore(store_path) as store:
+        counts = store.theme_counts(term_groups)
+
+    table = Table(title="Top themes by number of students")
+    table.add_column("Theme")
+    for group in counts:
+        table.add_column(group, justify="right")
+    by_group = [
+        {row["theme"]: row["file_count"] for row in rows} for rows in counts.values()
+    ]
+    themes = dict.fromkeys(
+        row["theme"] for rows in counts.values() for row in rows[:top]
+    )
+    for theme in themes:
+        table.add_row(theme, *(str(group.get(theme, 0)) for group in by_group))
+    print(table)
+
+
 def main():
     try:
         log_cli_command()
@@ -154,7 +608,11 @@ def main():
     parser = argparse.ArgumentParser(
         description="Grade student assignments and summarize professor feedback."
     )
-    parser.add_argument("path", help="Path to a file or folder")
+    parser.add_argument(
+        "path",
+        nargs="?",
+        help="Path to a file or folder (not needed for --feedback-query/--feedback-themes)",
+    )
     parser.add_argument(
         "--prompt",
         required=False,
@@ -167,7 +625,48 @@ def main():
     )
     parser.add_argument(
         "--term",
-        help="Optional cohort/semester label for the brief title and default output filename.",
+        help="Optional cohort/semester label for the brief title and default output filename. "
+        "With --feedback-query, only terms whose label contains this text.",
+    )
+    parser.add_argument(
+        "--feedback-store",
+        default=str(DEFAULT_STORE_PATH),
+        help=f"Cross-term feedback index that summaries are added to (default: {DEFAULT_STORE_PATH}).",
+    )
+    parser.add_argument(
+        "--feedback-query",
+        nargs="?",
+        const="",
+        metavar="TEXT",
+        help="Search indexed feedback across terms (FTS5 syntax, e.g. 'deadline OR rushed'); "
+        "prints matches per term. Combine with --theme, --sentiment and --term.",
+    )
+    parser.add_argument(
+        "--feedback-themes",
+        action="store_true",
+        help="Compare the most frequent feedback themes across indexed terms.",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs="+",
+        metavar="TERM",
+        help="With --feedback-themes, one column per group of terms whose label "
+        "contains each value (e.g. --compare 2025 2026).",
+    )
+    parser.add_argument(
+        "--theme",
+        help="With --feedback-query, only lines tagged with a matching theme (e.g. timing).",
+    )
+    parser.add_argument(
+        "--sentiment",
+        choices=["like", "improve"],
+        help="With --feedback-query, only liked or improvement lines.",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=20,
+        help="With --feedback-query, number of matching lines to show (default: 20).",
     )
     parser.add_argument(
         "--save",
@@ -181,13 +680,189 @@ def main():
         const="results/grading_results.json",
         help="Optional output JSON path",
     )
+    parser.add_argument(
+        "--jsonl",
+        help="Optional JSON Lines path that receives each row as it is graded "
+        "(default: next to the --save/--json output).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of grading requests to keep in flight for folder runs (default: 1). "
+        "With more than one, the limit adapts to the API's rate limits.",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        help="Upper bound the adaptive in-flight limit may grow to "
+        "(default: 4x --concurrency).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for document extraction (default: CPU count).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip files already graded by an earlier run of the same folder, prompt and model.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the grading and text-extraction caches.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Re-grade every file and overwrite its cached result.",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Grade a folder through the OpenAI Batch API instead of one request per file.",
+    )
+    parser.add_argument(
+        "--batch-file",
+        help="Path for the JSONL batch request file (default: results/batch/<folder>-requests.jsonl).",
+    )
+    parser.add_argument(
+        "--batch-write-only",
+        action="store_true",
+        help="With --batch, only write the request file for later submission.",
+    )
+    parser.add_argument(
+        "--batch-id",
+        help="Collect results from an already submitted batch instead of creating one.",
+    )
+    parser.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        default=30,
+        help="Seconds between batch status checks (default: 30).",
+    )
+    parser.add_argument(
+        "--batch-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Stop waiting for the batch after this long and print its id for "
+        "--batch-id (default: wait until it finishes).",
+    )
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="Grade several short submissions per request, sending the rubric once; "
+        "files missing from a packed reply are re-graded individually.",
+    )
+    parser.add_argument(
+        "--pack-tokens",
+        type=int,
+        default=DEFAULT_PACK_TOKENS,
+        help=f"With --pack, prompt-token budget per request (default: {DEFAULT_PACK_TOKENS:,}).",
+    )
+    parser.add_argument(
+        "--pack-size",
+        type=int,
+        default=DEFAULT_PACK_SIZE,
+        help=f"With --pack, most submissions per request (default: {DEFAULT_PACK_SIZE}).",
+    )
+    parser.add_argument(
+        "--sections",
+        action="store_true",
+        help="Send only the sections the prompt grades (header, overall thoughts, "
+        "went well, ...), dropping pasted assignment instructions; files without "
+        "clearly headed sections are sent in full.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKEND_NAMES,
+        help="Where grading requests go: the OpenAI API (default) or an "
+        "in-process fake that returns a fixed grade (env: GRADER_BACKEND).",
+    )
+    parser.add_argument(
+        "--base-url",
+        help="Send requests to this OpenAI-compatible server instead, e.g. "
+        "http://127.0.0.1:8089/v1 for `python -m app.mock_server`.",
+    )
+    parser.add_argument(
+        "--cascade-model",
+        metavar="MODEL",
+        help="Grade with this cheaper model first and re-grade with OPENAI_MODEL only "
+        "when its answer is unparseable, incomplete, borderline or low-confidence; "
+        "adds a graded_by column (env: CASCADE_MODEL).",
+    )
+    parser.add_argument(
+        "--response-format",
+        choices=RESPONSE_FORMATS,
+        help="How to ask for JSON output: JSON mode (default), a JSON schema built "
+        "from the keys the prompt asks for (needs a model with structured "
+        "outputs), or not at all (env: RESPONSE_FORMAT).",
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        metavar="PATH",
+        help="Write per-file stage spans and the run summary as JSON Lines.",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        metavar="PATH",
+        help="Write run metrics in Prometheus textfile format "
+        "(for node_exporter's textfile collector).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Extract and render every file and report token, cost and time estimates without calling the model.",
+    )
     args = parser.parse_args()
 
+    if args.concurrency < 1:
+        print("[bold red]--concurrency must be at least 1.[/bold red]")
+        return
+
+    if args.feedback_query is not None or args.feedback_themes:
+        if not Path(args.feedback_store).exists():
+            print(
+                f"[bold red]No feedback store at {args.feedback_store}; "
+                "run --feedback-summary first.[/bold red]"
+            )
+            return
+        try:
+            if args.feedback_query is not None:
+                run_feedback_query(
+                    args.feedback_store,
+                    args.feedback_query,
+                    theme=args.theme,
+                    sentiment=args.sentiment,
+                    term=args.term,
+                    limit=args.limit,
+                )
+            else:
+                run_feedback_theme_comparison(args.feedback_store, args.compare)
+        except ValueError as e:
+            print(f"[bold red]{e}[/bold red]")
+        return
+
+    if not args.path:
+        print("[bold red]A file or folder path is required.[/bold red]")
+        return
+
+    extraction_cache = None if args.no_cache else ExtractionCache()
+
     if args.feedback_summary:
         save_path = args.save
         if not save_path or save_path == "results/grading_results.csv":
             save_path = default_feedback_output_path(args.path, args.term)
-        run_feedback_summary(args.path, args.term, save_path, args.json)
+        run_feedback_summary(
+            args.path,
+            args.term,
+            save_path,
+            args.json,
+            extraction_cache,
+            args.workers,
+            store_path=args.feedback_store,
+        )
         return
 
     if not args.prompt:
@@ -196,42 +871,198 @@ def main():
         )
         return
 
+    try:
+        if args.backend or args.base_url:
+            set_backend(make_backend(args.backend, args.base_url))
+        backend = get_backend()
+    except ValueError as e:
+        print(f"[bold red]{e}[/bold red]")
+        return
+    if (args.batch or args.batch_id) and backend.name == "fake":
+        print(
+            "[bold red]--batch needs the Batch API; use --base-url with "
+            "`python -m app.mock_server` to try it offline.[/bold red]"
+        )
+        return
+    if args.cascade_model:
+        set_cascade_model(args.cascade_model)
+    if args.response_format:
+        set_response_format(args.response_format)
+    cascade = get_cascade_model()
+    if cascade and (args.batch or args.batch_id):
+        print(
+            "[bold red]Cascade grading needs a second request for escalated files "
+            "and cannot run through --batch.[/bold red]"
+        )
+        return
+    if args.pack and (args.batch or args.batch_id or cascade):
+        print("[bold red]--pack cannot be combined with --batch or cascade grading.[/bold red]")
+        return
+
     try:
         prompt_path = resolve_prompt_path(args.prompt)
-    except FileNotFoundError as e:
+        # Read and validate the template once; every request reuses it.
+        prompt_template = load_prompt(prompt_path).source
+    except (FileNotFoundError, ValueError) as e:
         print(f"[bold red]{e}[/bold red]")
         return
 
+    cache = None if args.no_cache else GradingCache(refresh=args.refresh)
+
     path = Path(args.path)
-    all_results = []
-
-    if path.is_file():
-        result = process_file(str(path), prompt_path)
-        if result and args.save:
-            all_results.append(result)
-    elif path.is_dir():
-        files = (
-            list(path.glob("*.docx"))
-            + list(path.glob("*.pdf"))
-            + list(path.glob("*.txt"))
-        )
+    if path.is_file() or path.is_dir():
+        files = collect_input_files(path)
         if not files:
             print(
                 f"[bold yellow]No .docx, .pdf, or .txt files found in {path}[/bold yellow]"
             )
             return
-        for file in files:
-            result = process_file(str(file), prompt_path)
-            if result:
-                all_results.append(result)
     else:
         print(f"[bold red]Invalid path:[/bold red] {args.path}")
         return
 
-    if args.save and all_results:
-        write_results_to_csv(all_results, args.save)
-    if args.json and all_results:
-        write_results_to_json(all_results, args.json)
+    if args.dry_run:
+        estimate = estimate_run(
+            files,
+            prompt_path,
+            get_model(),
+            concurrency=args.concurrency,
+            cache=cache,
+            extraction_cache=extraction_cache,
+            workers=args.workers,
+            sections=args.sections,
+        )
+        print_dry_run_report(estimate)
+        return
+
+    writer = None
+    if args.save or args.json or args.jsonl:
+        writer = ResultStreamWriter(
+            expected_output_fields(prompt_template) + (["graded_by"] if cascade else []),
+            csv_path=args.save,
+            jsonl_path=args.jsonl,
+            json_path=args.json,
+        )
+    positions = {file: index for index, file in enumerate(files)}
+    journal = RunJournal(path, prompt_template, model_label(), resume=args.resume)
+    run_metrics = metrics.RunMetrics()
+    metrics.set_collector(run_metrics)
+
+    def record(file: Path, result: dict | None):
+        with metrics.span("write", file=file.name):
+            if result is not None:
+                journal.record(file, result)
+            if writer is not None:
+                writer.add(positions[file], result)
+
+    try:
+        resumed = {}
+        for file in files:
+            stored = journal.completed(file) if args.resume else None
+            if stored is not None:
+                resumed[file] = stored
+                if writer is not None:
+                    writer.add(positions[file], stored)
+        if resumed:
+            print(
+                f"[bold cyan]Resuming:[/bold cyan] {len(resumed)} of {len(files)} files "
+                f"already graded ({journal.path})"
+            )
+        todo = [file for file in files if file not in resumed]
+
+        texts = (
+            {} if args.batch_id else extract_files(todo, args.workers, extraction_cache)
+        )
+        if args.sections:
+            texts = condense_texts(texts, prompt_template)
+        gradable = [file for file in todo if file in texts]
+        if not args.batch_id:
+            for file in todo:
+                if file not in texts:
+                    record(file, None)
+
+        if args.batch or args.batch_id:
+            results = run_batch_grading(
+                todo,
+                prompt_path,
+                args.batch_file or default_batch_file_path(args.path),
+                texts,
+                submit=not args.batch_write_only,
+                batch_id=args.batch_id,
+                poll_interval=args.batch_poll_interval,
+                cache=cache,
+                timeout=args.batch_timeout,
+            )
+            if results is None:
+                return
+            for file, result in zip(todo, results):
+                if args.batch_id or file in texts:
+                    record(file, result)
+            graded_by_file = dict(zip(todo, results))
+        else:
+            if args.pack:
+                graded = asyncio.run(
+                    grade_files_packed(
+                        gradable,
+                        prompt_path,
+                        args.concurrency,
+                        texts,
+                        cache=cache,
+                        on_result=record,
+                        max_concurrency=args.max_concurrency
+                        or 4 * args.concurrency,
+                        max_tokens=args.pack_tokens,
+                        max_size=args.pack_size,
+                    )
+                )
+            elif args.concurrency > 1:
+                graded = asyncio.run(
+                    grade_files_concurrently(
+                        gradable,
+                        prompt_path,
+                        args.concurrency,
+                        cache=cache,
+                        texts=texts,
+                        on_result=record,
+                        max_concurrency=args.max_concurrency
+                        or 4 * args.concurrency,
+                    )
+                )
+            else:
+                graded = []
+                for file in gradable:
+                    result = process_file(
+                        str(file), prompt_path, cache=cache, text=texts[file]
+                    )
+                    record(file, result)
+                    graded.append(result)
+            graded_by_file = dict(zip(gradable, graded))
+        results = [resumed.get(file) or graded_by_file.get(file) for file in files]
+    finally:
+        journal.close()
+        if writer is not None:
+            with metrics.span("write", file=None, final=True):
+                writer.close()
+            if writer.rows_written:
+                for output in (args.save, args.jsonl or writer.jsonl_path, args.json):
+                    if output:
+                        print(f"[bold green]Results saved to:[/bold green] {output}")
+        metrics.set_collector(None)
+        run_metrics.finish()
+        print_run_metrics(run_metrics.summary())
+        if args.metrics_jsonl:
+            run_metrics.write_jsonl(args.metrics_jsonl)
+            print(f"[bold green]Metrics saved to:[/bold green] {args.metrics_jsonl}")
+        if args.metrics_prom:
+            run_metrics.write_prometheus(args.metrics_prom)
+            print(f"[bold green]Metrics saved to:[/bold green] {args.metrics_prom}")
+
+    failed = [file.name for file, result in zip(files, results) if not result]
+    if failed:
+        print(
+            f"\n[bold yellow]{len(failed)} of {len(files)} files could not be graded:[/bold yellow] "
+            + ", ".join(failed)
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import random
+from pathlib import Path
+
+import openai
+import pytest
+
+import app.grader as grader
+from app.backends import FakeBackend, OpenAIBackend, make_backend
+from app.cache import GradingCache
+from app.mock_server import MockOpenAIServer, parse_latency
+from app.ratelimit import AdaptiveLimiter
+
+
+def _prompt(tmp_path: Path) -> str:
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text('Return {{"score": 0}} for:\n{text}', encoding="utf-8")
+    return str(prompt)
+
+
+def _echo_name(body: dict) -> str:
+    text = body["messages"][-1]["content"]
+    return json.dumps({"student_name": text, "score": len(text) % 6})
+
+
+def test_fake_backend_grades_in_process_and_keeps_its_own_cache_keys(
+    tmp_path: Path, monkeypatch
+):
+    fake = FakeBackend(_echo_name)
+    cache = GradingCache(tmp_path / "grading.sqlite")
+    prompt = _prompt(tmp_path)
+
+    first = grader.grade_with_prompt("Ada", prompt, cache=cache, backend=fake)
+    again = asyncio.run(grader.grade_with_prompt_async("Ada", prompt, backend=fake))
+
+    assert first == again == {"student_name": "Ada", "score": 3}
+    assert fake.calls == 2
+
+    monkeypatch.setattr(grader, "backend", fake)
+    fake_key = grader.grading_cache_key("Ada", "p")
+    monkeypatch.setattr(grader, "backend", OpenAIBackend())
+    assert grader.grading_cache_key("Ada", "p") != fake_key
+
+    with pytest.raises(ValueError, match="Unknown grader backend"):
+        make_backend("anthropic")
+
+
+def test_openai_backend_against_mock_server_retries_injected_failures(tmp_path: Path):
+    prompt = _prompt(tmp_path)
+    with MockOpenAIServer(
+        responder=_echo_name, latency=0.01, rate_limit_rate=0.3, error_rate=0.1, seed=3
+    ) as server:
+        backend = OpenAIBackend(base_url=server.base_url, api_key="sk-test")
+        limiter = AdaptiveLimiter(3)
+
+        async def grade_all():
+            return await asyncio.gather(
+                *(
+                    grader.grade_with_prompt_async(
+                        f"student {i}", prompt, limiter=limiter, backend=backend
+                    )
+                    for i in range(6)
+                )
+            )
+
+        results = asyncio.run(grade_all())
+
+    assert [r["student_name"] for r in results] == [f"student {i}" for i in range(6)]
+    assert server.stats["completed"] == 6
+    assert server.stats["rate_limited"] + server.stats["server_errors"] > 0
+    assert server.stats["requests"] == 6 + (
+        server.stats["rate_limited"] + server.stats["server_errors"]
+    )
+
+
+def test_mock_server_enforces_request_limits_and_malformed_content():
+    with MockOpenAIServer(requests_per_minute=2, malformed_rate=1.0) as server:
+        client = openai.OpenAI(api_key="sk-test", base_url=server.base_url, max_retries=0)
+        body = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+
+        raw = client.chat.completions.with_raw_response.create(**body)
+        assert raw.headers["x-ratelimit-remaining-requests"] == "1"
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(raw.parse().choices[0].message.content)
+
+        client.chat.completions.create(**body)
+        with pytest.raises(openai.RateLimitError) as excinfo:
+            client.chat.completions.create(**body)
+
+    headers = excinfo.value.response.headers
+    assert headers["x-ratelimit-remaining-requests"] == "0"
+    assert 0 < float(headers["retry-after-ms"]) <= 60_000
+
+
+def test_parse_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency("0.25")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("normal:0,1")(rng) >= 0
+    assert parse_latency(None)(rng) == 0
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1,2")
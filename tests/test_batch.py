@@ -0,0 +1,126 @@
+import json
+from pathlib import Path
+
+from openai import OpenAI
+
+import app.grader as grader
+import main
+from app.batch import build_batch_requests
+from app.cache import GradingCache
+from app.mock_server import MockOpenAIServer
+
+
+def _write_submissions(folder: Path) -> list[Path]:
+    files = []
+    for name in ["brown-amy.txt", "lee-sam.txt", "ortiz-jo.txt"]:
+        file = folder / name
+        file.write_text(f"Retrospective by {name}", encoding="utf-8")
+        files.append(file)
+    return files
+
+
+def _texts(files: list[Path]) -> dict[Path, str]:
+    return {file: file.read_text(encoding="utf-8") for file in files}
+
+
+def _prompt(tmp_path: Path) -> str:
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text('Return {{\n  "score": 0\n}} for:\n{text}', encoding="utf-8")
+    return str(prompt)
+
+
+def test_build_batch_requests_renders_prompt_per_file(tmp_path: Path):
+    requests = build_batch_requests({"lee-sam.txt": "hello"}, _prompt(tmp_path))
+
+    assert requests[0]["custom_id"] == "lee-sam.txt"
+    assert requests[0]["url"] == "/v1/chat/completions"
+    assert requests[0]["body"]["messages"][-1]["content"].endswith("hello")
+
+
+def test_run_batch_grading_against_local_server(tmp_path: Path, monkeypatch):
+    files = _write_submissions(tmp_path)
+
+    def responder(body: dict) -> str:
+        text = body["messages"][-1]["content"]
+        return json.dumps({"student_name": text.rsplit(" ", 1)[-1], "score": 4})
+
+    def missing_score(body: dict) -> str:
+        return json.dumps({"student_name": "someone"})
+
+    with MockOpenAIServer(responder=responder, polls_to_complete=2) as server:
+        monkeypatch.setattr(
+            grader, "client", OpenAI(api_key="sk-test", base_url=server.base_url)
+        )
+        cache = GradingCache(tmp_path / "grading.sqlite")
+        texts = _texts(files)
+        results = main.run_batch_grading(
+            files,
+            _prompt(tmp_path),
+            str(tmp_path / "requests.jsonl"),
+            texts,
+            poll_interval=0,
+            cache=cache,
+        )
+        rerun = main.run_batch_grading(
+            files,
+            _prompt(tmp_path),
+            str(tmp_path / "rerun.jsonl"),
+            texts,
+            poll_interval=0,
+            cache=cache,
+        )
+
+    assert [r["filename"] for r in results] == [f.name for f in files]
+    assert [r["student_name"] for r in results] == [f.name for f in files]
+    assert rerun == results
+    assert (tmp_path / "rerun.jsonl").read_text(encoding="utf-8") == ""
+
+    # Replies missing rubric keys fail the file instead of being kept.
+    with MockOpenAIServer(responder=missing_score, polls_to_complete=1) as server:
+        monkeypatch.setattr(
+            grader, "client", OpenAI(api_key="sk-test", base_url=server.base_url)
+        )
+        incomplete = main.run_batch_grading(
+            files[:1],
+            _prompt(tmp_path),
+            str(tmp_path / "incomplete.jsonl"),
+            {files[0]: "another retrospective"},
+            poll_interval=0,
+            cache=cache,
+        )
+    assert incomplete == [None]
+
+
+def test_run_batch_grading_write_only(tmp_path: Path):
+    files = _write_submissions(tmp_path)
+    batch_file = tmp_path / "batch" / "requests.jsonl"
+
+    result = main.run_batch_grading(
+        files, _prompt(tmp_path), str(batch_file), _texts(files), submit=False
+    )
+
+    assert result is None
+    lines = batch_file.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["custom_id"] for line in lines] == [f.name for f in files]
+
+
+def test_run_batch_grading_reports_a_stuck_batch(tmp_path: Path, monkeypatch, capsys):
+    files = _write_submissions(tmp_path)
+
+    with MockOpenAIServer(polls_to_complete=1000) as server:
+        monkeypatch.setattr(
+            grader, "client", OpenAI(api_key="sk-test", base_url=server.base_url)
+        )
+        result = main.run_batch_grading(
+            files,
+            _prompt(tmp_path),
+            str(tmp_path / "requests.jsonl"),
+            _texts(files),
+            poll_interval=0,
+            timeout=0,
+        )
+
+    assert result is None
+    out = " ".join(capsys.readouterr().out.split())
+    assert "still 'in_progress'" in out
+    assert "Collect it later with --batch-id batch-mock-" in out
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus, submission_text
+from benchmarks.run import compare_results, run_benchmarks
+
+
+def test_generate_corpus_is_deterministic_and_reused(tmp_path: Path):
+    manifest = generate_corpus(tmp_path / "a", docx=1, pdf=1, txt=2, sizes=("small",))
+    again = generate_corpus(tmp_path / "b", docx=1, pdf=1, txt=2, sizes=("small",))
+
+    assert [f["filename"] for f in manifest["files"]] == [
+        "student-0000-small.docx",
+        "student-0001-small.pdf",
+        "student-0002-small.txt",
+        "student-0003-small.txt",
+    ]
+    assert (tmp_path / "a/student-0002-small.txt").read_text() == (
+        tmp_path / "b/student-0002-small.txt"
+    ).read_text()
+    assert submission_text(2, "small") != submission_text(2, "small", seed=1)
+
+    stamp = (tmp_path / "a/student-0000-small.docx").stat().st_mtime_ns
+    generate_corpus(tmp_path / "a", docx=1, pdf=1, txt=2, sizes=("small",))
+    assert (tmp_path / "a/student-0000-small.docx").stat().st_mtime_ns == stamp
+
+
+def test_run_benchmarks_covers_every_stage_against_the_mock_model(tmp_path: Path):
+    results = run_benchmarks(
+        tmp_path / "corpus", docx=1, pdf=1, txt=1, sizes=("small",), repeat=1,
+        mock_latency=0,
+    )
+
+    stages = results["benchmarks"]
+    assert set(stages) == {
+        "extract_text",
+        "analyze_professor_feedback",
+        "build_instructor_brief",
+        "write_results",
+        "grade_end_to_end",
+    }
+    assert stages["grade_end_to_end"]["model_calls"] == 3
+    assert stages["extract_text"]["items"] == 3
+    assert "latency_p95_ms" in stages["extract_text"]
+
+
+def test_compare_results_flags_slowdowns_beyond_threshold():
+    def doc(**medians):
+        return {"benchmarks": {k: {"median_s": v} for k, v in medians.items()}}
+
+    rows = compare_results(
+        doc(extract=0.5, brief=0.0002, grade=0.2, new=1.0),
+        doc(extract=0.3, brief=0.0001, grade=0.4, gone=1.0),
+        threshold=0.25,
+    )
+
+    assert {row["name"]: row["status"] for row in rows} == {
+        "extract": "regression",
+        "brief": "ok",
+        "grade": "improved",
+        "new": "new",
+        "gone": "missing",
+    }
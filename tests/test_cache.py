@@ -0,0 +1,140 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import app.grader as grader
+import app.parser as parser
+from app.cache import ExtractionCache, GradingCache
+from app.parser import extract_text
+
+
+def test_grading_cache_key_covers_text_prompt_model_and_temperature():
+    base = GradingCache.make_key("essay", "rubric {text}", "gpt-4-turbo", 0.2)
+
+    assert base == GradingCache.make_key("essay", "rubric {text}", "gpt-4-turbo", 0.2)
+    assert base != GradingCache.make_key("essay!", "rubric {text}", "gpt-4-turbo", 0.2)
+    assert base != GradingCache.make_key("essay", "rubric2 {text}", "gpt-4-turbo", 0.2)
+    assert base != GradingCache.make_key("essay", "rubric {text}", "gpt-4o", 0.2)
+    assert base != GradingCache.make_key("essay", "rubric {text}", "gpt-4-turbo", 0.0)
+
+
+def test_grading_cache_round_trip_and_refresh(tmp_path: Path):
+    path = tmp_path / "grading.sqlite"
+    cache = GradingCache(path)
+    cache.put("k", {"score": 5})
+    assert cache.get("k") == {"score": 5}
+    cache.close()
+
+    reopened = GradingCache(path, refresh=True)
+    assert reopened.get("k") is None
+
+
+def test_grading_cache_evicts_expired_and_least_recently_used(tmp_path: Path):
+    cache = GradingCache(tmp_path / "grading.sqlite", max_bytes=60)
+    cache.put("old", {"feedback": "a" * 10})
+    cache.put("new", {"feedback": "b" * 10})
+    cache.get("old")
+    cache.put("newest", {"feedback": "c" * 10})
+
+    assert cache.get("new") is None
+    assert cache.get("old") is not None
+    assert cache.get("newest") is not None
+
+    cache.max_age_seconds = -1
+    assert cache.get("newest") is None
+
+
+def test_grade_with_prompt_uses_cache_before_calling_model(tmp_path: Path, monkeypatch):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("Grade this: {text}", encoding="utf-8")
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content='```json\n{"score": 4}\n```')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    fake_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    monkeypatch.setattr(grader, "client", fake_client)
+    cache = GradingCache(tmp_path / "grading.sqlite")
+
+    first = grader.grade_with_prompt("my retro", str(prompt), cache=cache)
+    second = grader.grade_with_prompt("my retro", str(prompt), cache=cache)
+
+    assert first == second == {"score": 4}
+    assert len(calls) == 1
+
+
+def test_extraction_cache_invalidates_on_change_and_hits_on_copies(tmp_path: Path):
+    cache = ExtractionCache(tmp_path / "extraction.sqlite")
+    submission = tmp_path / "smith-retro.docx"
+    submission.write_bytes(b"original bytes")
+
+    assert cache.lookup(submission) is None
+    cache.store(submission, "Retrospective text")
+    assert cache.lookup(submission) == "Retrospective text"
+    assert cache.lookup(submission, variant="other-extractor") is None
+
+    copy = tmp_path / "smith-retro-resubmitted.docx"
+    copy.write_bytes(b"original bytes")
+    assert cache.lookup(copy) == "Retrospective text"
+
+    submission.write_bytes(b"edited bytes, different size")
+    assert cache.lookup(submission) is None
+
+
+def test_extraction_cache_forgets_hashes_of_hits(tmp_path: Path):
+    cache = ExtractionCache(tmp_path / "extraction.sqlite")
+    submission = tmp_path / "smith-retro.docx"
+    submission.write_bytes(b"original bytes")
+
+    assert cache.lookup(submission) is None
+    cache.store(submission, "Retrospective text")
+    for _ in range(3):
+        assert cache.lookup(submission) == "Retrospective text"
+
+    assert cache._hashes == {}
+
+
+def test_extraction_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = ExtractionCache(tmp_path / "extraction.sqlite", max_bytes=25)
+    first = tmp_path / "a.pdf"
+    second = tmp_path / "b.pdf"
+    first.write_bytes(b"a")
+    second.write_bytes(b"b")
+
+    cache.store(first, "first text")
+    cache.store(second, "second text")
+
+    assert cache.lookup(first) is None
+    assert cache.lookup(second) == "second text"
+
+
+def test_extraction_cache_prunes_file_index_with_evicted_texts(tmp_path: Path):
+    cache = ExtractionCache(tmp_path / "extraction.sqlite", max_bytes=25)
+    first = tmp_path / "a.pdf"
+    renamed = tmp_path / "b.pdf"
+    first.write_bytes(b"a")
+    cache.store(first, "first text")
+    first.rename(renamed)
+    cache.lookup(renamed)
+    kept = tmp_path / "c.pdf"
+    kept.write_bytes(b"c")
+
+    cache.store(kept, "third text")
+
+    indexed = [path for (path,) in cache._conn.execute("SELECT path FROM file_index")]
+    assert indexed == [str(kept.resolve())]
+
+
+def test_extract_text_reuses_cached_docx_text(tmp_path: Path, monkeypatch):
+    cache = ExtractionCache(tmp_path / "extraction.sqlite")
+    first = extract_text("tests/fixtures/sample.docx", cache=cache)
+
+    def fail(file_path: str) -> str:
+        raise AssertionError("docx should not be reparsed on a cache hit")
+
+    monkeypatch.setattr(parser, "extract_text_from_docx", fail)
+
+    assert extract_text("tests/fixtures/sample.docx", cache=cache) == first
@@ -0,0 +1,89 @@
+import asyncio
+import json
+from pathlib import Path
+
+import app.grader as grader
+from app import metrics
+from app.backends import FakeBackend
+
+
+def _prompt(tmp_path: Path) -> str:
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text(
+        "Return JSON with:\n- student_name (string)\n- score (integer)\n{text}",
+        encoding="utf-8",
+    )
+    return str(prompt)
+
+
+def _answers(first_pass: dict[str, str]):
+    # The cheap model answers from `first_pass` by student; the primary model
+    # always returns a careful 3.
+    def respond(body: dict) -> str:
+        text = body["messages"][-1]["content"].split("\n")[-1]
+        if body["model"] == "cheap":
+            assert grader.CONFIDENCE_KEY in body["messages"][1]["content"]
+            return first_pass[text]
+        return json.dumps({"student_name": text, "score": 3})
+
+    return respond
+
+
+def test_cascade_keeps_clear_first_passes_and_escalates_the_rest(
+    tmp_path: Path, monkeypatch
+):
+    monkeypatch.setattr(grader, "cascade_model", "cheap")
+    monkeypatch.setenv("OPENAI_MODEL", "primary")
+    first_pass = {
+        "clear": json.dumps({"student_name": "clear", "score": 5, "grading_confidence": 0.9}),
+        "blank": json.dumps({"student_name": "blank", "score": 0}),
+        "middling": json.dumps({"student_name": "middling", "score": 3}),
+        "unsure": json.dumps({"student_name": "unsure", "score": 5, "grading_confidence": 0.4}),
+        "partial": json.dumps({"score": 5}),
+        "garbled": "I would give this a five.",
+    }
+    backend = FakeBackend(_answers(first_pass))
+    prompt = _prompt(tmp_path)
+    collector = metrics.RunMetrics()
+    metrics.set_collector(collector)
+    try:
+        results = {
+            name: grader.grade_with_prompt(name, prompt, backend=backend)
+            for name in first_pass
+        }
+        results["async"] = asyncio.run(
+            grader.grade_with_prompt_async("middling", prompt, backend=backend)
+        )
+    finally:
+        metrics.set_collector(None)
+
+    assert {name: r["graded_by"] for name, r in results.items()} == {
+        "clear": "cheap",
+        "blank": "cheap",
+        "middling": "primary",
+        "unsure": "primary",
+        "partial": "primary",
+        "garbled": "primary",
+        "async": "primary",
+    }
+    assert results["clear"] == {"student_name": "clear", "score": 5, "graded_by": "cheap"}
+    assert backend.calls == 12
+    assert collector.summary()["escalations"] == {
+        "borderline_score": 2,
+        "low_confidence": 1,
+        "missing_keys": 1,
+        "unparseable": 1,
+    }
+
+
+def test_cascade_has_its_own_cache_keys(monkeypatch):
+    monkeypatch.setattr(grader, "backend", FakeBackend())
+    single = grader.grading_cache_key("text", "prompt")
+    monkeypatch.setattr(grader, "cascade_model", "cheap")
+
+    assert grader.model_label().startswith("fake:cheap>")
+    cascade = grader.grading_cache_key("text", "prompt")
+    assert cascade != single
+
+    monkeypatch.setenv("CASCADE_MIN_CONFIDENCE", "0.9")
+    assert grader.grading_cache_key("text", "prompt") != cascade
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+
+import app.estimate as estimate
+from app.cache import GradingCache
+from app.grader import grading_cache_key, load_prompt_template
+
+
+@pytest.fixture(autouse=True)
+def offline_tokenizer(monkeypatch):
+    # Keep counts deterministic whether or not tiktoken encodings are cached locally.
+    monkeypatch.setattr(estimate, "_encoding_for", lambda model: None)
+
+
+def test_count_tokens_falls_back_to_character_estimate():
+    assert estimate.count_tokens("a" * 40, "gpt-4-turbo") == (10, False)
+
+
+def test_estimate_run_flags_outliers_errors_and_cached_files(tmp_path: Path):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("Rubric goes here.\n{text}", encoding="utf-8")
+    files = []
+    for name, size in [("a.txt", 1200), ("b.txt", 1000), ("c.txt", 1100), ("d.txt", 20000)]:
+        file = tmp_path / name
+        file.write_text("word " * (size // 5), encoding="utf-8")
+        files.append(file)
+    broken = tmp_path / "e.docx"
+    broken.write_bytes(b"not a zip file")
+    files.append(broken)
+
+    cache = GradingCache(tmp_path / "grading.sqlite")
+    template = load_prompt_template(str(prompt))
+    cache.put(grading_cache_key(files[0].read_text(encoding="utf-8"), template), {"score": 5})
+
+    result = estimate.estimate_run(
+        files, str(prompt), "gpt-4-turbo", concurrency=2, cache=cache
+    )
+
+    assert result["total_files"] == 5
+    assert result["cached_files"] == 1
+    assert result["requests"] == 3
+    assert [e["filename"] for e in result["parse_errors"]] == ["e.docx"]
+    assert [o["filename"] for o in result["outliers"]] == ["d.txt"]
+    assert result["exact_token_counts"] is False
+    expected_input = sum(r["prompt_tokens"] for r in result["files"][1:])
+    assert result["input_tokens"] == expected_input
+    assert result["estimated_cost_usd"] == pytest.approx(
+        (expected_input * 10 + 3 * estimate.DEFAULT_OUTPUT_TOKENS * 30) / 1_000_000
+    )
+    assert 0 < result["estimated_seconds"] < 3 * 15
+
+
+def test_estimate_run_reports_unknown_model_cost_as_none(tmp_path: Path):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("{text}", encoding="utf-8")
+    file = tmp_path / "a.txt"
+    file.write_text("hello " * 100, encoding="utf-8")
+
+    result = estimate.estimate_run([file], str(prompt), "local-llama")
+
+    assert result["estimated_cost_usd"] is None
+    assert result["requests"] == 1
+
+
+def test_estimate_run_counts_condensed_sections(tmp_path: Path):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("Grade overall thoughts, went well, improve.\n{text}", encoding="utf-8")
+    file = tmp_path / "a.txt"
+    file.write_text(
+        "1. Overall thoughts\nFine.\n2. Things that went well\nTests.\n"
+        "3. Things that could be improved\nReviews.\n4. Professor feedback\n"
+        + "More labs please. " * 200,
+        encoding="utf-8",
+    )
+
+    full = estimate.estimate_run([file], str(prompt), "gpt-4o")
+    condensed = estimate.estimate_run([file], str(prompt), "gpt-4o", sections=True)
+
+    assert condensed["files"][0]["prompt_tokens"] < full["files"][0]["prompt_tokens"] / 5
@@ -0,0 +1,111 @@
+import re
+from pathlib import Path
+
+import pytest
+
+import app.feedback as feedback
+from app.cache import ExtractionCache
+from app.feedback import (
+    EXCLUDE_LINE,
+    IMPROVE_PATTERNS,
+    LIKE_PATTERNS,
+    THEME_KEYWORDS,
+    analyze_professor_feedback,
+    classify_feedback_line,
+    feedback_line_themes,
+)
+
+LINES = [
+    "I liked that the project felt real-world and looks good on a resume",
+    "I wish we had more direction on the demo and a clearer checklist",
+    "Sometimes the deadlines felt rushed near finals",
+    "My teammate did great, 4.5/5 and I liked working with them",
+    "The workload was overwhelming with too many features per ticket",
+    "Prof Bill gave helpful guidance on setup and the api key",
+    "I lıke the class but the ſcope should be smaller",
+    "We met every week and worked through the backlog together",
+    "I appreciated the refactor but the technical debt from vibe coding was messy",
+    "What could make the class better: longer sprints and fewer points-based demos",
+]
+
+
+def _reference(line_lower: str):
+    """The per-pattern checks the compiled scanner replaces."""
+    if EXCLUDE_LINE.search(line_lower):
+        return None
+    liked = bool(re.search("|".join(LIKE_PATTERNS), line_lower, re.IGNORECASE))
+    improve = bool(re.search("|".join(IMPROVE_PATTERNS), line_lower, re.IGNORECASE))
+    themes = [
+        theme
+        for theme, keywords in THEME_KEYWORDS.items()
+        if any(keyword in line_lower for keyword in keywords)
+    ]
+    return liked, improve, themes
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_compiled_matcher_agrees_with_individual_patterns(line: str):
+    line_lower = line.lower()
+    classified = classify_feedback_line(line_lower)
+    expected = _reference(line_lower)
+
+    if expected is None:
+        assert classified is None
+    else:
+        assert (*classified, feedback_line_themes(line_lower)) == expected
+
+
+def test_analyze_professor_feedback_counts_themes_per_student(tmp_path: Path):
+    (tmp_path / "a.txt").write_text(
+        "I liked the real-world project a lot\n"
+        "I wish the deadline had been a bit later\n"
+        "My teammate rating is 5 stars, I liked them\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "b.txt").write_text(
+        "I wish the deadline had been a bit later\nshort line\n", encoding="utf-8"
+    )
+
+    analysis = analyze_professor_feedback(str(tmp_path), workers=1)
+
+    assert analysis["like_line_count"] == 1
+    assert analysis["improve_line_count"] == 1
+    assert analysis["files_with_feedback_signal"] == 2
+    assert analysis["themes"] == [
+        {"theme": "Real-world/recruiter value", "file_count": 1},
+        {"theme": "Timing/deadline pressure", "file_count": 1},
+    ]
+
+
+def test_analyze_professor_feedback_only_scans_new_or_changed_files(
+    tmp_path: Path, monkeypatch
+):
+    folder = tmp_path / "cohort"
+    folder.mkdir()
+    for name in ("a", "b"):
+        (folder / f"{name}.txt").write_text(
+            f"I liked the practical project, student {name}\n", encoding="utf-8"
+        )
+    scanned = []
+    real_analyze = feedback.analyze_feedback_text
+
+    def counting_analyze(text: str) -> dict:
+        scanned.append(text)
+        return real_analyze(text)
+
+    monkeypatch.setattr(feedback, "analyze_feedback_text", counting_analyze)
+    cache = ExtractionCache(tmp_path / "extraction.sqlite")
+
+    first = analyze_professor_feedback(str(folder), cache=cache, workers=1)
+    (folder / "c.txt").write_text(
+        "I wish the demo deadline were clearer\n", encoding="utf-8"
+    )
+    (folder / "a.txt").write_text(
+        "I liked the practical project, student a (edited)\n", encoding="utf-8"
+    )
+    second = analyze_professor_feedback(str(folder), cache=cache, workers=1)
+
+    assert len(scanned) == 4
+    assert first["like_line_count"] == 2
+    assert second == analyze_professor_feedback(str(folder), workers=1)
+    assert second["files_with_feedback_signal"] == 3
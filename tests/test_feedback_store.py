@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import pytest
+
+from app.feedback_store import FeedbackStore
+
+
+def _analysis(folder: str, likes: list[tuple], improvements: list[tuple]) -> dict:
+    files = {filename for filename, _ in likes + improvements}
+    return {
+        "input_path": folder,
+        "total_files": len(files) + 1,
+        "files_with_feedback_signal": len(files),
+        "likes": [{"filename": f, "text": t} for f, t in likes],
+        "improvements": [{"filename": f, "text": t} for f, t in improvements],
+    }
+
+
+@pytest.fixture
+def store(tmp_path: Path):
+    store = FeedbackStore(tmp_path / "feedback.sqlite")
+    store.ingest(
+        _analysis(
+            "data/fall-2025",
+            [("a.docx", "I liked the real-world project")],
+            [
+                ("a.docx", "The deadlines felt rushed before finals"),
+                ("b.docx", "I wish the demo checklist were clearer"),
+            ],
+        ),
+        "cs490-fall-2025",
+    )
+    store.ingest(
+        _analysis(
+            "data/spring-2026",
+            [("c.docx", "Helpful feedback on the resume project")],
+            [("c.docx", "More time for the final deadline would help")],
+        ),
+        "cs490-spring-2026",
+    )
+    yield store
+    store.close()
+
+
+def test_search_uses_full_text_index_with_stemming_and_filters(store: FeedbackStore):
+    matches = store.search("deadline")
+    assert {m["term"] for m in matches} == {"cs490-fall-2025", "cs490-spring-2026"}
+
+    spring = store.search("deadline", term="2026", sentiment="improve")
+    assert [m["filename"] for m in spring] == ["c.docx"]
+
+    assert store.count_by_term(theme="timing", sentiment="improve") == [
+        {"term": "cs490-fall-2025", "lines": 1, "students": 1, "total_files": 3},
+        {"term": "cs490-spring-2026", "lines": 1, "students": 1, "total_files": 2},
+    ]
+
+    with pytest.raises(ValueError, match="Invalid feedback query"):
+        store.search('"unterminated')
+
+
+def test_reingesting_a_term_replaces_only_that_term(store: FeedbackStore):
+    store.ingest(
+        _analysis("data/fall-2025", [], [("z.docx", "Too many tickets per sprint")]),
+        "cs490-fall-2025",
+    )
+
+    assert store.search("deadline", term="fall") == []
+    assert [row["term"] for row in store.terms()] == [
+        "cs490-fall-2025",
+        "cs490-spring-2026",
+    ]
+    counts = store.theme_counts(["2025", "2026"])
+    assert counts["2025"] == [{"theme": "Workload/scope pressure", "file_count": 1}]
+    assert {"theme": "Timing/deadline pressure", "file_count": 1} in counts["2026"]
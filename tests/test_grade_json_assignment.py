@@ -0,0 +1,66 @@
+import csv
+import json
+import math
+from pathlib import Path
+
+import grade_json_assignment as gja
+from app.rubric import load_json
+
+
+def _write(folder: Path, name: str, content: str | dict) -> None:
+    text = content if isinstance(content, str) else json.dumps(content)
+    (folder / name).write_text(text, encoding="utf-8", newline="")
+
+
+def _student(i: int, **overrides) -> dict:
+    return {
+        "name": f"Student {i}",
+        "ucid": f"ab{i}",
+        "discordId": f"disc{i}",
+        "githubId": f"gh{i}",
+        **overrides,
+    }
+
+
+def test_load_json_falls_back_to_json_module_messages(tmp_path: Path):
+    broken = tmp_path / "doe-jane.json"
+    broken.write_bytes(b'{"name": "x",\r\n "ucid": }')
+    lenient = tmp_path / "doe-john.json"
+    lenient.write_bytes(b'{"name": NaN}')
+
+    result = gja.grade_submission(broken)
+    try:
+        json.loads('{"name": "x",\n "ucid": }')
+    except json.JSONDecodeError as e:
+        expected = f"Invalid JSON: {e}"
+    assert result["feedback"] == expected
+    assert result["score"] == 1
+    assert math.isnan(load_json(lenient)["name"])
+
+
+def test_grade_assignment_streams_rows_and_reports_shared_ids(tmp_path: Path):
+    submissions = tmp_path / "hw1"
+    submissions.mkdir()
+    _write(submissions, "smith-ann.json", _student(1))
+    _write(submissions, "smith-ann2.json", _student(1))  # resubmitted copy
+    _write(submissions, "jones-bob.json", _student(2, githubId="GH1 "))
+    _write(submissions, "lee-cy.json", _student(3, ucid=""))
+    _write(submissions, "broken.json", '{"name": ')
+    output = tmp_path / "out" / "hw1.csv"
+
+    gja.grade_assignment(str(submissions), str(output), workers=2)
+
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["filename"] for row in rows] == sorted(
+        p.name for p in submissions.iterdir()
+    )
+    assert {row["filename"]: row["score"] for row in rows}["lee-cy.json"] == "4"
+
+    with open(gja.duplicates_report_path(str(output)), newline="") as f:
+        shared = list(csv.DictReader(f))
+    assert [(r["field"], r["value"], r["kind"], r["count"]) for r in shared] == [
+        ("discordId", "disc1", "duplicate", "2"),
+        ("githubId", "gh1", "collision", "3"),
+        ("ucid", "ab1", "duplicate", "2"),
+    ]
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from app.journal import RunJournal
+
+
+def test_journal_resumes_unchanged_files_only(tmp_path: Path):
+    folder = tmp_path / "sprint-3"
+    folder.mkdir()
+    done = folder / "a.txt"
+    changed = folder / "b.txt"
+    done.write_text("alpha", encoding="utf-8")
+    changed.write_text("beta", encoding="utf-8")
+    journal_dir = tmp_path / "journal"
+
+    journal = RunJournal(folder, "prompt {text}", "gpt-4-turbo", directory=journal_dir)
+    journal.record(done, {"filename": "a.txt", "score": 5})
+    journal.record(changed, {"filename": "b.txt", "score": 3})
+    journal.close()
+    changed.write_text("beta, edited after grading", encoding="utf-8")
+
+    resumed = RunJournal(
+        folder, "prompt {text}", "gpt-4-turbo", resume=True, directory=journal_dir
+    )
+    assert resumed.completed(done) == {"filename": "a.txt", "score": 5}
+    assert resumed.completed(changed) is None
+    resumed.close()
+
+    other_model = RunJournal(
+        folder, "prompt {text}", "gpt-4o", resume=True, directory=journal_dir
+    )
+    assert other_model.completed(done) is None
+    other_model.close()
+
+    fresh = RunJournal(folder, "prompt {text}", "gpt-4-turbo", directory=journal_dir)
+    assert fresh.completed(done) is None
+    fresh.close()
+
+
+def test_journal_tolerates_truncated_last_line(tmp_path: Path):
+    submission = tmp_path / "a.txt"
+    submission.write_text("alpha", encoding="utf-8")
+    journal = RunJournal(tmp_path, "p", "m", directory=tmp_path / "journal")
+    journal.record(submission, {"score": 5})
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"filename": "b.txt", "content_ha')
+
+    resumed = RunJournal(tmp_path, "p", "m", resume=True, directory=tmp_path / "journal")
+    resumed.record(submission, {"score": 4})
+    resumed.close()
+
+    again = RunJournal(tmp_path, "p", "m", resume=True, directory=tmp_path / "journal")
+    assert again.completed(submission) == {"score": 4}
+    again.close()
@@ -0,0 +1,120 @@
+import asyncio
+import json
+from pathlib import Path
+
+import main
+
+
+def test_grade_files_concurrently_preserves_order_and_limits_in_flight(
+    tmp_path: Path, monkeypatch
+):
+    files = [tmp_path / f"student-{i}.txt" for i in range(6)]
+    for index, file in enumerate(files):
+        file.write_text(f"submission {index}", encoding="utf-8")
+
+    in_flight = 0
+    peak = 0
+
+    async def fake_grade(text: str, prompt_path: str, cache=None, limiter=None) -> dict:
+        nonlocal in_flight, peak
+        index = int(text.split()[-1])
+        async with limiter:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            # Later files finish first so completion order differs from input order.
+            await asyncio.sleep(0.01 * (len(files) - index))
+            in_flight -= 1
+        if index == 2:
+            raise ValueError("bad model output")
+        return {"student_name": f"Student {index}", "score": index % 6}
+
+    monkeypatch.setattr(main, "grade_with_prompt_async", fake_grade)
+
+    results = asyncio.run(main.grade_files_concurrently(files, "prompt.txt", 3))
+
+    assert peak == 3
+    assert results[2] is None
+    assert [r["filename"] for r in results if r] == [
+        "student-0.txt",
+        "student-1.txt",
+        "student-3.txt",
+        "student-4.txt",
+        "student-5.txt",
+    ]
+
+
+def test_main_streams_folder_results_to_csv_and_json(tmp_path: Path, monkeypatch):
+    folder = tmp_path / "sprint-1"
+    folder.mkdir()
+    for name in ["b.txt", "a.txt", "c.txt"]:
+        (folder / name).write_text(name, encoding="utf-8")
+
+    def fake_grade(text: str, prompt_path: str, cache=None) -> dict:
+        if text == "b.txt":
+            raise ValueError("bad model output")
+        return {"student_name": text.upper(), "score": 5, "breakdown": []}
+
+    monkeypatch.setattr(main, "grade_with_prompt", fake_grade)
+    monkeypatch.setattr(main, "log_cli_command", lambda: None)
+    prompt = str(Path(main.__file__).parent / "app/prompts/early_sprint_retro.txt")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "main.py",
+            str(folder),
+            "--prompt",
+            prompt,
+            "--save",
+            str(tmp_path / "out.csv"),
+            "--json",
+            str(tmp_path / "out.json"),
+            "--no-cache",
+            "--workers",
+            "1",
+        ],
+    )
+
+    main.main()
+
+    header, *rows = (tmp_path / "out.csv").read_text(encoding="utf-8").splitlines()
+    assert header == "filename,student_name,score,breakdown,students_with_poor_ratings"
+    assert [row.split(",")[0] for row in rows] == ["a.txt", "c.txt"]
+    results = json.loads((tmp_path / "out.json").read_text(encoding="utf-8"))
+    assert [r["student_name"] for r in results] == ["A.TXT", "C.TXT"]
+    assert (tmp_path / "out.jsonl").exists()
+
+
+def test_main_resume_skips_files_already_in_the_journal(tmp_path: Path, monkeypatch):
+    folder = tmp_path / "sprint-2"
+    folder.mkdir()
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (folder / name).write_text(name, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "log_cli_command", lambda: None)
+    prompt = str(Path(main.__file__).parent / "app/prompts/early_sprint_retro.txt")
+    argv = ["main.py", str(folder), "--prompt", prompt, "--save", "out.csv", "--no-cache"]
+    graded = []
+
+    def flaky_grade(text: str, prompt_path: str, cache=None) -> dict:
+        if text == "c.txt":
+            raise RuntimeError("rate limited")
+        graded.append(text)
+        return {"student_name": text, "score": 4}
+
+    monkeypatch.setattr(main, "grade_with_prompt", flaky_grade)
+    monkeypatch.setattr("sys.argv", argv)
+    main.main()
+    assert graded == ["a.txt", "b.txt"]
+
+    def grade(text: str, prompt_path: str, cache=None) -> dict:
+        graded.append(text)
+        return {"student_name": text, "score": 5}
+
+    monkeypatch.setattr(main, "grade_with_prompt", grade)
+    monkeypatch.setattr("sys.argv", argv + ["--resume"])
+    main.main()
+
+    assert graded == ["a.txt", "b.txt", "c.txt"]
+    rows = (tmp_path / "out.csv").read_text(encoding="utf-8").splitlines()[1:]
+    assert [row.split(",")[0] for row in rows] == ["a.txt", "b.txt", "c.txt"]
@@ -0,0 +1,72 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+import app.grader as grader
+import main
+from app import metrics
+from app.backends import FakeBackend
+from app.cache import GradingCache
+
+
+@pytest.fixture
+def run_metrics():
+    collector = metrics.RunMetrics()
+    metrics.set_collector(collector)
+    yield collector
+    metrics.set_collector(None)
+
+
+def test_grading_run_records_spans_per_file(tmp_path: Path, monkeypatch, run_metrics):
+    files = []
+    for name in ("a.txt", "b.txt"):
+        files.append(tmp_path / name)
+        files[-1].write_text(f"retro {name}", encoding="utf-8")
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("Grade: {text}", encoding="utf-8")
+    monkeypatch.setattr(grader, "backend", FakeBackend())
+    cache = GradingCache(tmp_path / "grading.sqlite")
+
+    asyncio.run(main.grade_files_concurrently(files, str(prompt), 2, cache=cache))
+    main.process_file(str(files[0]), str(prompt), cache=cache)
+
+    by_stage = {}
+    for span in run_metrics.spans:
+        by_stage.setdefault(span["stage"], []).append(span)
+    assert {s["file"] for s in by_stage["model_call"]} == {"a.txt", "b.txt"}
+    assert all(s["attempts"] == 1 and s["prompt_tokens"] for s in by_stage["model_call"])
+    assert [s["hit"] for s in by_stage["cache"]] == [False, False, True]
+    assert len(by_stage["extract"]) == len(by_stage["file"]) == 3
+
+    summary = run_metrics.summary()
+    assert summary["files"] == 3
+    assert summary["model_calls"] == 2
+    assert summary["cache_hits"]["cache"] == 1
+    assert summary["tokens"]["total_tokens"] == sum(
+        s["total_tokens"] for s in by_stage["model_call"]
+    )
+
+
+def test_exports_jsonl_and_prometheus_textfile(tmp_path: Path, run_metrics):
+    run_metrics.record("model_call", 1.5, file="a.txt", attempts=3, prompt_tokens=100)
+    run_metrics.record("model_call", 0.5, file="b.txt", attempts=1, prompt_tokens=50)
+    with metrics.file_context("c.txt"):
+        with pytest.raises(ValueError):
+            with metrics.span("parse"):
+                raise ValueError("not JSON")
+    run_metrics.finish()
+
+    run_metrics.write_jsonl(tmp_path / "run.jsonl")
+    run_metrics.write_prometheus(tmp_path / "grader.prom")
+
+    lines = [json.loads(line) for line in (tmp_path / "run.jsonl").read_text().splitlines()]
+    assert lines[2]["file"] == "c.txt" and lines[2]["error"] == "ValueError"
+    assert lines[-1]["summary"]["retries"] == 2
+
+    prom = (tmp_path / "grader.prom").read_text().splitlines()
+    assert 'retro_grader_stage_seconds_sum{stage="model_call"} 2.0' in prom
+    assert 'retro_grader_stage_seconds{stage="model_call",quantile="0.95"} 1.5' in prom
+    assert 'retro_grader_tokens_total{kind="prompt"} 150' in prom
+    assert "retro_grader_retries_total 2" in prom
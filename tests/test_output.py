@@ -0,0 +1,74 @@
+import csv
+import json
+from pathlib import Path
+
+from app.output import ResultStreamWriter, expected_output_fields
+
+
+def _read_csv(path: Path) -> list[dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_expected_output_fields_from_bundled_prompts():
+    hw2 = Path("app/prompts/cs684_hw2_quality_claim.txt").read_text(encoding="utf-8")
+    retro = Path("app/prompts/final_retro.txt").read_text(encoding="utf-8")
+
+    assert expected_output_fields(hw2) == [
+        "claims",
+        "assumptions",
+        "refused",
+        "oracles",
+        "confidence",
+        "score",
+        "feedback",
+    ]
+    assert expected_output_fields(retro) == [
+        "student_name",
+        "score",
+        "breakdown",
+        "students_with_poor_ratings",
+    ]
+
+
+def test_stream_writer_releases_rows_in_input_order_and_flushes(tmp_path: Path):
+    csv_path = tmp_path / "out.csv"
+    writer = ResultStreamWriter(
+        ["student_name", "score"], csv_path=str(csv_path), json_path=str(tmp_path / "out.json")
+    )
+
+    writer.add(1, {"filename": "b.docx", "student_name": "B", "score": 3})
+    assert _read_csv(csv_path) == []
+    assert csv_path.read_text(encoding="utf-8").startswith("filename,student_name,score")
+
+    writer.add(0, {"filename": "a.docx", "student_name": "A", "score": 5})
+    assert [row["filename"] for row in _read_csv(csv_path)] == ["a.docx", "b.docx"]
+
+    writer.add(3, {"filename": "d.docx", "student_name": "D", "score": 4})
+    writer.add(2, None)
+    writer.close()
+
+    assert [row["filename"] for row in _read_csv(csv_path)] == ["a.docx", "b.docx", "d.docx"]
+    lines = (tmp_path / "out.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["student_name"] for line in lines] == ["A", "B", "D"]
+    rows = [json.loads(line) for line in lines]
+    assert (tmp_path / "out.json").read_text(encoding="utf-8") == json.dumps(rows, indent=2)
+
+
+def test_stream_writer_widens_csv_for_unexpected_keys(tmp_path: Path):
+    csv_path = tmp_path / "out.csv"
+    with ResultStreamWriter(["student_name", "score"], csv_path=str(csv_path)) as writer:
+        writer.add(0, {"filename": "a.docx", "student_name": "A", "score": 5})
+        writer.add(1, {"filename": "b.docx", "student_name": "B", "score": 2, "breakdown": ["x"]})
+
+    rows = _read_csv(csv_path)
+    assert list(rows[0]) == ["filename", "student_name", "score", "breakdown"]
+    assert rows[1]["breakdown"] == "['x']"
+
+
+def test_stream_writer_removes_outputs_when_nothing_was_graded(tmp_path: Path):
+    writer = ResultStreamWriter(["score"], csv_path=str(tmp_path / "out.csv"))
+    writer.add(0, None)
+    writer.close()
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,89 @@
+import asyncio
+import json
+from pathlib import Path
+
+import app.grader as grader
+import main
+from app.backends import FakeBackend
+from app.cache import GradingCache
+from app.grader import PromptTemplate
+from app.packing import pack_submissions, parse_packed_response
+
+PROMPT = "Return JSON with:\n- score (integer from 0 to 5)\n{text}"
+
+
+def test_pack_submissions_respects_token_budget_and_size():
+    prompt = PromptTemplate(PROMPT)
+    texts = {f"s{i}.txt": "word " * 100 for i in range(5)}
+    texts["long.txt"] = "word " * 5_000
+
+    assert pack_submissions(texts, prompt, "gpt-4o", max_tokens=400, max_size=8) == [
+        ["s0.txt", "s1.txt"],
+        ["s2.txt", "s3.txt"],
+        ["s4.txt"],
+        ["long.txt"],
+    ]
+    assert [len(p) for p in pack_submissions(texts, prompt, "gpt-4o", 10_000, 2)] == [
+        2, 2, 2
+    ]
+
+
+def test_parse_packed_response_keeps_only_valid_expected_grades():
+    prompt = PromptTemplate(PROMPT)
+    content = json.dumps(
+        {
+            "grades": [
+                {"filename": "a.txt", "score": 5},
+                {"filename": "b.txt"},
+                {"filename": "stranger.txt", "score": 1},
+                {"filename": "a.txt", "score": 0},
+            ]
+        }
+    )
+
+    assert parse_packed_response(content, ["a.txt", "b.txt", "c.txt"], prompt) == {
+        "a.txt": {"score": 5}
+    }
+    assert parse_packed_response('[{"filename": "c.txt", "score": 2}]', ["c.txt"], prompt)
+
+
+def test_packed_run_regrades_missing_files_individually(tmp_path: Path, monkeypatch):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text(PROMPT, encoding="utf-8")
+    files = [tmp_path / f"s{i}.txt" for i in range(5)]
+    texts = {file: f"essay {file.stem}" for file in files}
+
+    def respond(body: dict) -> str:
+        submissions = body["messages"][-1]["content"]
+        if "<submission" not in submissions:
+            return json.dumps({"score": 1})
+        # Drops the last submission of every pack.
+        names = [f.name for f in files if f'filename="{f.name}"' in submissions]
+        return json.dumps({"grades": [{"filename": n, "score": 4} for n in names[:-1]]})
+
+    backend = FakeBackend(respond)
+    monkeypatch.setattr(grader, "backend", backend)
+    cache = GradingCache(tmp_path / "grading.sqlite")
+    finished = []
+
+    results = asyncio.run(
+        main.grade_files_packed(
+            files,
+            str(prompt),
+            2,
+            texts,
+            cache=cache,
+            on_result=lambda file, result: finished.append(file),
+            max_size=3,
+        )
+    )
+
+    assert [r["score"] for r in results] == [4, 4, 1, 4, 1]
+    assert [r["filename"] for r in results] == [f.name for f in files]
+    assert sorted(finished) == files
+    assert backend.calls == 4
+
+    again = asyncio.run(
+        main.grade_files_packed(files, str(prompt), 2, texts, cache=cache, max_size=3)
+    )
+    assert again == results and backend.calls == 4
@@ -1,8 +1,12 @@
 # tests/test_parser.py
 
 import os
+from pathlib import Path
+
 import pytest
-from app.parser import extract_text
+from app.cache import ExtractionCache
+import app.parser as parser
+from app.parser import extract_text, iter_extracted_texts
 
 
 def test_extract_docx_text():
@@ -22,3 +26,148 @@ def test_extract_pdf_text():
 def test_unsupported_file_type():
     with pytest.raises(ValueError):
         extract_text("tests/fixtures/sample.txt")
+
+
+def test_iter_extracted_texts_uses_process_pool_and_reports_errors(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    unsupported = tmp_path / "notes.md"
+    unsupported.write_text("# notes", encoding="utf-8")
+    paths = [
+        "tests/fixtures/sample.docx",
+        "tests/fixtures/sample.pdf",
+        str(broken),
+        str(unsupported),
+    ]
+
+    results = dict(iter_extracted_texts(paths, workers=2))
+
+    assert set(results) == {Path(p) for p in paths}
+    assert results[Path("tests/fixtures/sample.docx")] == extract_text(
+        "tests/fixtures/sample.docx"
+    )
+    assert "Sprint" in results[Path("tests/fixtures/sample.pdf")]
+    assert isinstance(results[broken], Exception)
+    assert isinstance(results[unsupported], ValueError)
+
+
+def test_iter_extracted_texts_serves_cache_hits_without_extracting(
+    tmp_path, monkeypatch
+):
+    cache = ExtractionCache(tmp_path / "extraction.sqlite")
+    first = dict(iter_extracted_texts(["tests/fixtures/sample.docx"], cache=cache))
+    monkeypatch.setattr(parser, "extract_text_from_docx", None)
+
+    second = dict(
+        iter_extracted_texts(["tests/fixtures/sample.docx"], workers=4, cache=cache)
+    )
+
+    assert second == first
+
+
+def _write_pdf(path: Path, pages: int, image_only=()) -> Path:
+    import fitz
+
+    doc = fitz.open()
+    for number in range(1, pages + 1):
+        page = doc.new_page()
+        if number in image_only:
+            page.draw_rect(fitz.Rect(50, 50, 200, 200), fill=(0, 0, 0))
+        else:
+            page.insert_text((72, 72), f"Sprint notes page {number} " + "x" * 200)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_extract_pdf_stops_at_page_and_char_limits(tmp_path):
+    pdf = _write_pdf(tmp_path / "long.pdf", 12, image_only={2, 3})
+
+    text, details = parser.extract_pdf(str(pdf), max_pages=5)
+    assert "page 5 " in text and "page 6 " not in text
+    assert text.endswith("[... truncated after page 5 of 12 ...]")
+    assert details["pages"] == 12 and details["image_only_pages"] == 2
+    assert len(details["page_s"]) == 5
+
+    text, details = parser.extract_pdf(str(pdf), max_chars=500)
+    assert details["truncated"]
+    assert text.endswith("of 12 ...]")
+    assert len(text.split("\n[...")[0]) <= 500
+
+    text, details = parser.extract_pdf(str(pdf))
+    assert not details["truncated"] and text.count("Sprint notes") == 10
+
+
+def test_pdf_limits_from_the_environment(monkeypatch):
+    monkeypatch.setenv("PDF_MAX_PAGES", "0")
+    assert parser._env_limit("PDF_MAX_PAGES", 100) is None
+    monkeypatch.setenv("PDF_MAX_PAGES", "40")
+    assert parser._env_limit("PDF_MAX_PAGES", 100) == 40
+    monkeypatch.setenv("PDF_MAX_PAGES", "forty")
+    with pytest.warns(UserWarning, match="PDF_MAX_PAGES='forty'"):
+        assert parser._env_limit("PDF_MAX_PAGES", 100) == 100
+
+
+def test_iter_pdf_pages_closes_the_document_when_abandoned(tmp_path, monkeypatch):
+    import fitz
+
+    pdf = _write_pdf(tmp_path / "doc.pdf", 3)
+    opened = []
+    real_open = fitz.open
+
+    def tracking_open(*args):
+        opened.append(real_open(*args))
+        return opened[-1]
+
+    monkeypatch.setattr(fitz, "open", tracking_open)
+
+    pages = parser.iter_pdf_pages(str(pdf))
+    assert next(pages)[:2] == (1, 3)
+    pages.close()
+
+    assert opened[0].is_closed
+
+
+def test_pdf_extraction_memory_does_not_grow_with_page_count(tmp_path):
+    import tracemalloc
+
+    small = _write_pdf(tmp_path / "small.pdf", 20)
+    large = _write_pdf(tmp_path / "large.pdf", 400)
+
+    def peak(pdf):
+        tracemalloc.start()
+        parser.extract_pdf(str(pdf), max_chars=2_000)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    peak(small)
+    assert peak(large) < 2 * peak(small) + 64 * 1024
+
+
+def test_docx_fast_path_keeps_paragraphs_and_adds_tables_in_order(tmp_path):
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph("Teammate ratings")
+    table = doc.add_table(rows=2, cols=2)
+    for row, cells in zip(table.rows, [("Teammate", "Stars"), ("Ada", "5")]):
+        for cell, text in zip(row.cells, cells):
+            cell.text = text
+    doc.add_paragraph("Went well:\tdemos")
+    path = tmp_path / "ratings.docx"
+    doc.save(path)
+
+    text = extract_text(str(path))
+
+    assert text == "Teammate ratings\nTeammate | Stars\nAda | 5\nWent well:\tdemos"
+    old_lines = parser._extract_docx_with_python_docx(str(path)).splitlines()
+    assert set(old_lines) <= set(text.splitlines())
+
+
+def test_docx_falls_back_to_python_docx(monkeypatch):
+    monkeypatch.setattr(parser, "_DOCX_BODY", "word/missing.xml")
+
+    assert extract_text("tests/fixtures/sample.docx") == (
+        parser._extract_docx_with_python_docx("tests/fixtures/sample.docx")
+    )
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+
+import app.grader as grader
+from app.grader import PromptTemplate, build_chat_request, load_prompt
+
+PROMPTS_DIR = Path(grader.__file__).parent / "prompts"
+
+
+@pytest.mark.parametrize("prompt_file", sorted(PROMPTS_DIR.glob("*.txt")), ids=str)
+def test_shipped_prompts_split_into_stable_prefix(prompt_file: Path):
+    source = prompt_file.read_text(encoding="utf-8")
+    prompt = PromptTemplate(source)
+
+    assert prompt.render("STUDENT") == source.format(text="STUDENT")
+    first = build_chat_request("one essay", prompt)["messages"]
+    second = build_chat_request("another essay", prompt)["messages"]
+    assert first[0] == second[0] == {"role": "system", "content": prompt.prefix}
+    assert first[1]["content"].startswith("one essay")
+
+
+def test_prompt_template_rejects_missing_or_unknown_placeholders():
+    with pytest.raises(ValueError, match="exactly one"):
+        PromptTemplate("Grade this essay.")
+    with pytest.raises(ValueError, match="exactly one"):
+        PromptTemplate("{text} and again {text}")
+    with pytest.raises(ValueError, match="unsupported placeholder"):
+        PromptTemplate('Return {"score": 1} for {text}')
+    with pytest.raises(ValueError, match="not a valid template"):
+        PromptTemplate("Unbalanced { brace {text}")
+
+
+def test_load_prompt_reads_file_once_until_it_changes(tmp_path: Path, monkeypatch):
+    path = tmp_path / "prompt.txt"
+    path.write_text("Rubric v1\n{text}", encoding="utf-8")
+    reads = []
+    real_open = open
+
+    def counting_open(file, *args, **kwargs):
+        reads.append(file)
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    assert load_prompt(str(path)) is load_prompt(str(path))
+    assert len(reads) == 1
+
+    path.write_text("Rubric v2 with more detail\n{text}", encoding="utf-8")
+    assert load_prompt(str(path)).prefix == "Rubric v2 with more detail\n"
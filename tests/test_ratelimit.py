@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import app.ratelimit as ratelimit
+from app.ratelimit import (
+    AdaptiveLimiter,
+    call_with_retry,
+    call_with_retry_async,
+    parse_duration,
+    retry_after_seconds,
+)
+
+
+def _status_error(status: int, headers: dict | None = None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    error_class = openai.RateLimitError if status == 429 else openai.APIStatusError
+    return error_class("error", response=response, body=None)
+
+
+def test_retry_after_prefers_server_headers():
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert retry_after_seconds(httpx.Headers({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(httpx.Headers({"retry-after": "3"})) == 3
+    assert (
+        retry_after_seconds(
+            httpx.Headers(
+                {
+                    "x-ratelimit-remaining-requests": "5",
+                    "x-ratelimit-reset-requests": "1s",
+                    "x-ratelimit-remaining-tokens": "0",
+                    "x-ratelimit-reset-tokens": "2.5s",
+                }
+            )
+        )
+        == 2.5
+    )
+    assert retry_after_seconds(httpx.Headers({})) is None
+
+
+def test_call_with_retry_waits_for_retry_after_then_succeeds(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ratelimit.random, "uniform", lambda a, b: 0)
+    monkeypatch.setattr("tenacity.nap.time.sleep", sleeps.append)
+    outcomes = [_status_error(429, {"retry-after-ms": "250"}), _status_error(503)]
+
+    def call():
+        if outcomes:
+            raise outcomes.pop(0)
+        return "ok"
+
+    assert call_with_retry(call) == "ok"
+    assert sleeps[0] == 0.25
+    assert len(sleeps) == 2
+
+
+def test_call_with_retry_does_not_retry_client_errors():
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise _status_error(400)
+
+    with pytest.raises(openai.APIStatusError):
+        call_with_retry(call)
+    assert len(calls) == 1
+
+
+def test_adaptive_limiter_grows_additively_and_halves_on_429():
+    limiter = AdaptiveLimiter(4, maximum=8, cooldown=60)
+    # About one extra slot per round of `limit` successes.
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.limit == 5
+
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()  # Same round: only one decrease.
+    assert limiter.limit == 2
+
+    near_budget = {
+        "x-ratelimit-remaining-tokens": "100",
+        "x-ratelimit-limit-tokens": "10000",
+    }
+    for _ in range(10):
+        limiter.on_success(near_budget)
+    assert limiter.limit == 2
+
+
+def test_call_with_retry_async_holds_limiter_slot_per_attempt(monkeypatch):
+    async def no_sleep(seconds):
+        return None
+
+    monkeypatch.setattr("tenacity.asyncio._portable_async_sleep", no_sleep, raising=False)
+    limiter = AdaptiveLimiter(2, maximum=2, cooldown=0)
+    in_flight = 0
+    peak = 0
+    failures = {0: 1}
+
+    async def request(index: int):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if failures.get(index):
+            failures[index] -= 1
+            raise _status_error(429, {"retry-after-ms": "1"})
+        return index
+
+    async def run():
+        return await asyncio.gather(
+            *(
+                call_with_retry_async(lambda i=i: request(i), limiter=limiter)
+                for i in range(6)
+            )
+        )
+
+    assert asyncio.run(run()) == list(range(6))
+    assert peak == 2
+    assert limiter.in_flight == 0
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+
+from app.rubric import compile_rubric, load_rubric
+
+VALID = {"name": "Ann Smith", "ucid": "as1", "discordId": "ann#1", "githubId": "ann"}
+
+
+@pytest.mark.parametrize(
+    "filename, content, score, feedback",
+    [
+        ("smith-ann.json", VALID, 5, "Perfect!"),
+        (
+            "smithann.json",
+            VALID,
+            4,
+            "Filename: Filename does not follow [lastname]-[firstname] pattern",
+        ),
+        (
+            "smith-ann.json",
+            {**VALID, "ucid": " ", "githubid": "ann"},
+            3,
+            "Keys: Extra keys: githubid; Values: Empty or missing values: ucid",
+        ),
+        (
+            "smith-ann-b.json",
+            {"name": ""},
+            1,
+            "Filename: Filename should have exactly one dash between lastname and "
+            "firstname; Keys: Missing keys: discordId, githubId, ucid; "
+            "Values: Empty or missing values: name, ucid, discordId, githubId",
+        ),
+        ("-ann.json", ["not", "an", "object"], 1, None),
+        ("smith-ann.json", '{"name": ', 1, "Invalid JSON: "),
+    ],
+)
+def test_default_rubric_scores_match_the_five_point_assignment(
+    tmp_path: Path, filename, content, score, feedback
+):
+    path = tmp_path / filename
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+
+    result = load_rubric().grade(path)
+
+    assert result["score"] == score
+    if feedback is not None:
+        assert result["feedback"].startswith(feedback)
+    assert load_rubric().max_points == 5
+
+
+def test_custom_rubric_checks_types_and_patterns(tmp_path: Path):
+    spec = yaml.safe_load(
+        """
+        name: Repo link
+        columns: [ucid, repo]
+        unique: [repo]
+        checks:
+          - check: json
+          - check: field
+            label: UCID
+            key: ucid
+            type: string
+            pattern: "[a-z]{2,3}[0-9]+"
+            points: 2
+          - check: field
+            label: Repo
+            key: repo
+            pattern: "https://github\\\\.com/[^/]+/[^/]+"
+            message: must be a GitHub repository URL
+            points: 2
+          - check: field
+            label: Stars
+            key: stars
+            type: integer
+        """
+    )
+    rubric = compile_rubric(spec)
+    path = tmp_path / "doe-jane.json"
+    path.write_text(
+        json.dumps({"ucid": "jd42", "repo": "gitlab.com/jd/x", "stars": True})
+    )
+
+    result = rubric.grade(path)
+
+    assert rubric.max_points == 6
+    assert rubric.fieldnames == ["filename", "ucid", "repo", "score", "feedback"]
+    assert result["score"] == 3
+    assert result["repo"] == "gitlab.com/jd/x"
+    assert result["feedback"] == (
+        "Repo: must be a GitHub repository URL; Stars: stars should be of type integer"
+    )
+
+    with pytest.raises(ValueError, match="Unknown rubric check"):
+        compile_rubric({"checks": [{"check": "spelling"}]})
+    with pytest.raises(ValueError, match="not columns: githubId"):
+        compile_rubric(
+            {"columns": ["ucid"], "unique": ["ucid", "githubId"], "checks": []}
+        )
@@ -0,0 +1,146 @@
+from pathlib import Path
+
+import main
+from app.parser import extract_text
+from app.sections import condense, heading_label, segment
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PROMPTS = Path(__file__).parents[1] / "app" / "prompts"
+
+SUBMISSION = """Hana Ortiz
+2026-03-03
+Team 12
+Sprint 1
+1. Overall thoughts
+We shipped the login page and most of the API on time.
+2. Personal contributions:
+I wrote the session middleware and its tests.
+3. Things that went well
+Daily check-ins kept everyone unblocked.
+4. What didn't go well –
+Code review piled up before the demo.
+5. Professor feedback
+More time on Git workflows in lecture would help.
+Ben – 5 stars, carried the frontend
+Chloe – 4/5, solid tests
+"""
+
+
+def test_headings_and_rating_lines_split_sections():
+    assert heading_label("4. What didn't go well –") == "could_be_improved"
+    assert heading_label("Things that went well") == "went_well"
+    assert heading_label("Overall, a good sprint.") is None
+    assert heading_label("- Name the teammates who helped") is None
+
+    labels = [label for label, _, _ in segment(SUBMISSION)]
+    assert labels == [
+        "header",
+        "overall_thoughts",
+        "personal_contributions",
+        "went_well",
+        "could_be_improved",
+        "professor_feedback",
+        "teammate_ratings",
+    ]
+    sections = {label: (heading, body) for label, heading, body in segment(SUBMISSION)}
+    assert sections["header"] == (None, "Hana Ortiz\n2026-03-03\nTeam 12\nSprint 1")
+    assert sections["went_well"][0] == "3. Things that went well"
+    assert sections["teammate_ratings"] == (
+        None,
+        "Ben – 5 stars, carried the frontend\nChloe – 4/5, solid tests",
+    )
+
+
+def test_rating_sentences_are_not_headings():
+    text = (
+        "5. Teammate ratings\n"
+        "I would rate Bo a 2\n"
+        "Chris was great overall\n"
+        "Dana never showed up\n"
+        "Eve had some improvement ideas\n"
+    )
+
+    assert heading_label("I would rate Bo a 2") is None
+    assert heading_label("Chris was great overall") is None
+    assert segment(text) == [
+        (
+            "teammate_ratings",
+            "5. Teammate ratings",
+            "I would rate Bo a 2\nChris was great overall\nDana never showed up\n"
+            "Eve had some improvement ideas",
+        )
+    ]
+
+
+def test_inline_rating_line_does_not_capture_following_content():
+    text = (
+        "1. Overall thoughts\nSolid sprint.\n"
+        "What went well:\n"
+        "Rating: Bo 4/5\n"
+        "Pairing on the API saved us days.\n"
+        "3. Things that could be improved\nReviews piled up.\n"
+    )
+    prompt = "Grade overall thoughts, what went well and what to improve.\n{text}"
+
+    assert [(label, body) for label, _, body in segment(text)][1:4] == [
+        ("went_well", ""),
+        ("teammate_ratings", "Rating: Bo 4/5"),
+        ("went_well", "Pairing on the API saved us days."),
+    ]
+    condensed, summary = condense(text, prompt)
+    assert summary["confident"]
+    assert "Pairing on the API saved us days." in condensed
+    assert "Bo 4/5" not in condensed
+
+
+def test_condense_keeps_only_graded_sections():
+    prompt = "Grade overall thoughts, what went well and what to improve.\n{text}"
+
+    text, summary = condense(SUBMISSION, prompt)
+
+    assert summary["confident"]
+    assert summary["chars_after"] < summary["chars_before"]
+    assert text.startswith("## Header\nHana Ortiz")
+    assert "## 4. What didn't go well –\nCode review piled up" in text
+    assert "session middleware" not in text
+    assert "Git workflows" not in text
+    assert "4 stars" not in text
+
+
+def test_condense_drops_pasted_assignment_instructions():
+    prompt_source = (PROMPTS / "early_sprint_retro.txt").read_text(encoding="utf-8")
+    text = extract_text(str(FIXTURES / "sample.pdf"))
+
+    condensed, summary = condense(text, prompt_source)
+
+    assert summary["confident"]
+    assert (
+        "## 6. Providing a rating (1 to five stars) for each of your teammates.\n"
+        "Sree (4/5)"
+    ) in condensed
+    assert "I was able to learn a lot about web development" in condensed
+    assert "Give credit to teammates" in text
+    assert "Give credit to teammates" not in condensed
+
+
+def test_condense_falls_back_to_full_text():
+    retro = (PROMPTS / "early_sprint_retro.txt").read_text(encoding="utf-8")
+    hw2 = (PROMPTS / "cs684_hw2_quality_claim.txt").read_text(encoding="utf-8")
+    # Paragraphs without headings: too few sections to trust.
+    docx_text = extract_text(str(FIXTURES / "sample.docx"))
+
+    text, summary = condense(docx_text, retro)
+    assert text == docx_text and not summary["confident"]
+    # Not a section-based prompt.
+    text, summary = condense(SUBMISSION, hw2)
+    assert text == SUBMISSION and summary["sections"] == []
+
+
+def test_condense_texts_replaces_only_confident_files():
+    texts = {Path("a.txt"): SUBMISSION, Path("b.txt"): "Just one paragraph."}
+    prompt = "Grade overall thoughts, what went well and what to improve.\n{text}"
+
+    condensed = main.condense_texts(texts, prompt)
+
+    assert condensed[Path("a.txt")].startswith("## Header")
+    assert condensed[Path("b.txt")] == "Just one paragraph."
@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Imported on first use only; none of them may load for `--help` or `import main`.
+HEAVY_MODULES = {"openai", "docx", "fitz", "pymupdf", "tiktoken", "tenacity", "dotenv"}
+
+# `main.py --help`, without appending to logs/commands.txt.
+HELP_SCRIPT = (
+    "import sys, main; main.log_cli_command = lambda: None; "
+    "sys.argv = ['main.py', '--help']; main.main()"
+)
+
+# Cumulative import time of `main`, in microseconds. Roughly 5x what a cold
+# import takes today, so only a newly eager heavy import should trip it.
+MAIN_IMPORT_BUDGET_US = 400_000
+
+
+def _import_times(*args: str) -> dict[str, int]:
+    """Run Python with -X importtime and return cumulative microseconds per module."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line.split("|"))
+        if cumulative.isdigit():
+            times[name] = int(cumulative)
+    return times
+
+
+def _report(times: dict[str, int]) -> str:
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:10]
+    return "\n".join(f"{us / 1000:8.1f} ms  {name}" for name, us in slowest)
+
+
+@pytest.mark.parametrize(
+    "args", [("-c", "import main"), ("-c", HELP_SCRIPT)], ids=["import", "help"]
+)
+def test_cli_startup_skips_heavy_dependencies(args):
+    times = _import_times(*args)
+    loaded = {name.split(".")[0] for name in times} & HEAVY_MODULES
+
+    assert not loaded, f"eagerly imported {sorted(loaded)}:\n{_report(times)}"
+
+
+def test_main_import_time_within_budget():
+    # Take the best of a few runs to ride out a noisy machine.
+    runs = [_import_times("-c", "import main") for _ in range(3)]
+    best = min(runs, key=lambda times: times["main"])
+
+    assert best["main"] < MAIN_IMPORT_BUDGET_US, _report(best)
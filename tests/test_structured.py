@@ -0,0 +1,127 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import app.grader as grader
+from app.backends import FakeBackend
+from app.structured import (
+    ResponseError,
+    output_schema,
+    repair_json,
+    response_format,
+    validate_result,
+)
+
+GRADE = {"student_name": "Ada", "score": 4, "breakdown": ["late"]}
+PROMPT = (
+    "Return JSON with:\n- student_name (string)\n- score (integer from 0 to 5)\n"
+    "- breakdown (list of reasons)\n{text}"
+)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "```json\n" + json.dumps(GRADE) + "\n```",
+        "Sure! Here is the grade:\n" + json.dumps(GRADE) + "\nHope that helps.",
+        '{"student_name": "Ada", "score": 4, "breakdown": ["late",],}',
+        '{"student_name": "Ada", "score": 4, "breakdown": ["late"], "feedback": "Go',
+        '{"student_name": "Ada", "score": 4, "breakdown": ["late"], "feed',
+        '{"student_name": "Ada", "score": 4, "breakdown": ["late"], "rank": 12',
+    ],
+)
+def test_repair_json_fixes_near_json(content):
+    result, repaired = repair_json(content)
+
+    assert repaired
+    # Cut-off values are dropped with their key, not closed and kept.
+    assert result == GRADE
+
+
+def test_repair_json_keeps_only_complete_members():
+    assert repair_json('{"score": 4, "feedback": "Good work"')[0] == {
+        "score": 4,
+        "feedback": "Good work",
+    }
+    assert repair_json('{"score": 4, "breakdown": ["late", "sho')[0] == {"score": 4}
+    packed = '{"grades": [{"filename": "a", "score": 4}, {"filename": "b", "sc'
+    assert repair_json(packed, max_cut_depth=2)[0] == {
+        "grades": [{"filename": "a", "score": 4}]
+    }
+    with pytest.raises(ResponseError, match="missing keys: feedback"):
+        result, _ = repair_json('{"score": 4, "feedback": "Go')
+        validate_result(result, "- score (integer)\n- feedback (string)\n{text}")
+
+
+def test_repair_json_gives_up_on_prose():
+    assert repair_json(json.dumps(GRADE)) == (GRADE, False)
+    with pytest.raises(ResponseError) as excinfo:
+        repair_json("I would give this a 4.")
+    assert excinfo.value.kind == "unparseable"
+
+
+def test_schema_comes_from_the_prompt_and_validates_results():
+    template = Path("app/prompts/cs684_hw2_quality_claim.txt").read_text()
+    assert output_schema(template)["score"] is int
+    assert output_schema(template)["feedback"] is str
+    assert output_schema(PROMPT) == {"student_name": str, "score": int, "breakdown": list}
+    schema = response_format(PROMPT, "json_schema")["json_schema"]["schema"]
+    assert schema["required"] == ["student_name", "score", "breakdown"]
+
+    validate_result({**GRADE, "score": "4", "extra": 1}, PROMPT)
+    with pytest.raises(ResponseError, match="missing keys: breakdown") as excinfo:
+        validate_result({"student_name": "Ada", "score": 4}, PROMPT)
+    assert excinfo.value.kind == "missing_keys"
+    with pytest.raises(ResponseError) as excinfo:
+        validate_result({**GRADE, "score": "four"}, PROMPT)
+    assert excinfo.value.kind == "invalid_types"
+
+
+def test_grader_requests_json_and_re_asks_only_when_repair_fails(tmp_path: Path):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text(PROMPT, encoding="utf-8")
+    replies = {
+        "fenced": ["```json\n" + json.dumps(GRADE) + "\n```"],
+        "truncated": ['{"student_name": "Ada", "score": 4, "brea', json.dumps(GRADE)],
+        "hopeless": ["Four out of five.", "Still four."],
+    }
+    bodies = []
+
+    def respond(body: dict) -> str:
+        bodies.append(body)
+        student = body["messages"][1]["content"].split("\n")[-1]
+        return replies[student].pop(0)
+
+    backend = FakeBackend(respond)
+    assert grader.grade_with_prompt("fenced", str(prompt), backend=backend) == GRADE
+    assert backend.calls == 1
+    assert bodies[0]["response_format"] == {"type": "json_object"}
+
+    assert grader.grade_with_prompt("truncated", str(prompt), backend=backend) == GRADE
+    reask = bodies[-1]["messages"]
+    assert backend.calls == 3
+    assert reask[-2]["role"] == "assistant"
+    assert "missing the keys breakdown" in reask[-1]["content"]
+
+    with pytest.raises(ResponseError):
+        grader.grade_with_prompt("hopeless", str(prompt), backend=backend)
+    assert backend.calls == 5
+
+
+def test_json_mode_mentions_json_and_keys_the_cache(monkeypatch):
+    prompt = grader.PromptTemplate("Give a score from 1 to 5.\n{text}")
+    monkeypatch.setattr(grader, "backend", FakeBackend())
+
+    body = grader.build_chat_request("essay", prompt)
+    assert body["messages"][1] == {
+        "role": "system",
+        "content": grader.JSON_INSTRUCTION,
+    }
+    json_key = grader.grading_cache_key("essay", prompt.source)
+
+    monkeypatch.setattr(grader, "response_format_mode", "none")
+    body = grader.build_chat_request("essay", prompt)
+    assert "response_format" not in body
+    assert [m["role"] for m in body["messages"]] == ["system", "user"]
+    assert grader.grading_cache_key("essay", prompt.source) != json_key